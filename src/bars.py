@@ -0,0 +1,582 @@
+"""Persistent columnar OHLCV store behind ``get_time_series``.
+
+A finished bar never changes, yet research agents fetch the same daily
+histories over and over. This store keeps every finished bar it has seen, per
+(entitlement scope, symbol, exchange, mic_code, country, interval, prepost),
+and records which datetime ranges it covers completely. A ``get_time_series``
+call with a ``start_date`` then only asks the upstream for the ranges that are
+missing — typically just the recent tail — and answers the window locally.
+
+Layout (one directory per series under MCP_BARS_DIR)::
+
+    <sha1(key)>/meta.json   key, columns, decimals, coverage [[start, end), …]
+    <sha1(key)>/ts.q        int64 timestamps, ascending
+    <sha1(key)>/<col>.d     float64 per value column (open, high, low, close, volume)
+
+Reads memory-map the column files and bisect the timestamp column, so a
+window costs only the pages it touches. Bars newer than the stored ones are
+appended to the column files; anything else merges in memory and replaces
+them. Nothing is written unless bars or coverage changed, and the writing runs
+in a worker thread. A series whose files disagree with its meta is dropped and
+refetched.
+
+A bar counts as finished once it ended more than a day ago (Twelve Data's
+datetimes are exchange-local, so a day absorbs any timezone); anything newer
+is fetched live on every call and never stored. Keys carry the entitlement
+scope so keys on different plans never see each other's data.
+
+Finished is not final, though: the upstream's prices are split-adjusted, so a
+split rewrites the whole history. Every extension of a stored series fetches
+one stored bar again (the range is widened to the nearest stored bar, which
+costs no extra call); if the upstream now disagrees with it, the stored series
+is dropped and the window refetched. Coverage of a range without any bars is
+recorded with no columns at all, so whatever the upstream's columns turn out
+to be (forex has no volume), they merge with it.
+
+A single upstream call returns at most 5000 bars, so any range is fetched in
+windows, concurrently, and stitched together; a window that comes back full is
+paged again below its oldest bar. Daily and coarser windows span 5000 bar
+lengths (they can never hold more). Sessions leave most of an intraday clock
+empty, so an intraday range fetches its newest page first and cuts the rest
+into windows of the span that page took. Every answer is stored as it
+arrives, so one failing window loses nothing the others fetched. Ranges by
+FIGI/ISIN/CUSIP, or with the store disabled, go through the same windowing,
+just without being kept.
+
+A coarser interval is derived locally (resample.py) wherever a finer series
+of the same instrument is stored: 1h from stored 1min bars, 1week / 1month
+from stored 1day bars. Only the part past the finer coverage is fetched.
+
+  MCP_BARS_STORE=0      disable (get_time_series always goes upstream)
+  MCP_BARS_DIR          location (default ~/.twelvedata_mcp/bars)
+  MCP_BARS_MAX_CHUNKS   most upstream calls one range may take (default 250)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import time
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Optional
+
+import resample
+from auth import CONFIG_DIR
+from instruments import canonical, resolver
+from series import INTERVAL_SECONDS, Bars, format_dt, is_intraday, merge, parse_csv, parse_dt
+
+log = logging.getLogger("bars")
+
+ENABLED = os.environ.get("MCP_BARS_STORE", "1") not in ("0", "false", "no")
+ROOT    = Path(os.environ.get("MCP_BARS_DIR", "") or CONFIG_DIR / "bars")
+
+MAX_OUTPUTSIZE = 5000  # upstream cap per time_series call
+MAX_CHUNKS     = int(os.environ.get("MCP_BARS_MAX_CHUNKS", "250"))
+
+_KEY_PARAMS = ("symbol", "exchange", "mic_code", "country", "interval", "prepost")
+
+
+def finished_before(interval: str, now: Optional[float] = None) -> int:
+    """Bars starting before this timestamp are final (day-aligned, conservative)."""
+    now = time.time() if now is None else now
+    edge = int(now) - 86400 - INTERVAL_SECONDS.get(interval, 86400)
+    return edge - edge % 86400
+
+
+def gaps(coverage: list[list[int]], start: int, end: int) -> list[tuple[int, int]]:
+    """Sub-ranges of [start, end) not covered by the (sorted, disjoint) coverage."""
+    out: list[tuple[int, int]] = []
+    cur = start
+    for a, b in coverage:
+        if b <= cur:
+            continue
+        if a >= end:
+            break
+        if a > cur:
+            out.append((cur, a))
+        cur = max(cur, b)
+    if cur < end:
+        out.append((cur, end))
+    return out
+
+
+def add_coverage(coverage: list[list[int]], start: int, end: int) -> list[list[int]]:
+    spans = sorted([*coverage, [start, end]])
+    merged: list[list[int]] = []
+    for a, b in spans:
+        if merged and a <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], b)
+        else:
+            merged.append([a, b])
+    return merged
+
+
+def _anchor(ts, ranges: list[tuple[int, Optional[int]]]) -> "tuple[list[tuple[int, Optional[int]]], int] | None":
+    """``ranges`` widened to take in one stored bar (of timestamps ``ts``), and that bar's timestamp."""
+    for i, (a, b) in enumerate(ranges):
+        n = bisect_left(ts, a)
+        if n:  # a stored bar right before this range
+            return [*ranges[:i], (ts[n - 1], b), *ranges[i + 1:]], ts[n - 1]
+    a, b = ranges[-1]
+    n = bisect_left(ts, b) if b is not None else len(ts)
+    if n < len(ts):  # every range lies before the stored bars: reach the first one after
+        return [*ranges[:-1], (a, ts[n] + 1)], ts[n]
+    return None
+
+
+def _same_bar(stored: Optional[Bars], fetched: Bars, ts: int) -> bool:
+    """Whether ``fetched`` still has the stored bar at ``ts`` with the same values."""
+    if stored is None:
+        return False
+    i, j = bisect_left(stored.ts, ts), bisect_left(fetched.ts, ts)
+    if i == len(stored.ts) or j == len(fetched.ts) or fetched.ts[j] != ts:
+        return False
+    for col in stored.columns:
+        if col not in fetched.values:
+            return False
+        x, y = stored.values[col][i], fetched.values[col][j]
+        if (x == x or y == y) and not math.isclose(x, y, rel_tol=1e-9, abs_tol=1e-12):
+            return False
+    return True
+
+
+def _mapped(path: Path, typecode: str) -> memoryview:
+    if path.stat().st_size == 0:
+        return memoryview(array(typecode))
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mm).cast(typecode)
+
+
+class BarStore:
+    def __init__(self, root: Path = ROOT) -> None:
+        self.root = root
+        self._locks: dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def key(scope: str, params: dict) -> tuple:
+        params = canonical({k: str(v) for k, v in params.items() if v})
+        return (scope, *(str(params.get(k) or "") for k in _KEY_PARAMS))
+
+    def _dir(self, key: tuple) -> Path:
+        return self.root / hashlib.sha1(json.dumps(key).encode()).hexdigest()[:24]
+
+    def lock(self, key: tuple) -> asyncio.Lock:
+        name = self._dir(key).name
+        if name not in self._locks:
+            self._locks[name] = asyncio.Lock()
+        return self._locks[name]
+
+    def meta(self, key: tuple) -> Optional[dict]:
+        try:
+            meta = json.loads((self._dir(key) / "meta.json").read_text())
+        except (OSError, ValueError):
+            return None
+        return meta if meta.get("key") == list(key) else None
+
+    def timestamps(self, key: tuple):
+        """The stored timestamps, memory-mapped (None when there are none)."""
+        try:
+            return _mapped(self._dir(key) / "ts.q", "q")
+        except (OSError, ValueError):
+            return None
+
+    def read(self, key: tuple, start: Optional[int] = None, end: Optional[int] = None) -> Optional[Bars]:
+        """Bars in [start, end) straight from the memory-mapped columns."""
+        meta = self.meta(key)
+        if meta is None:
+            return None
+        d = self._dir(key)
+        try:
+            ts = _mapped(d / "ts.q", "q")
+            cols = {c: _mapped(d / f"{c}.d", "d") for c in meta["columns"]}
+        except (OSError, ValueError):
+            return None
+        if any(len(v) != len(ts) for v in cols.values()) or len(ts) != meta.get("rows"):
+            log.warning("bars: %s is inconsistent — dropping", d.name)
+            return None
+        bars = Bars(meta["columns"], meta.get("intraday", False), decimals=meta.get("decimals", {}))
+        lo = bisect_left(ts, start) if start is not None else 0
+        hi = bisect_left(ts, end) if end is not None else len(ts)
+        bars.ts = array("q", ts[lo:hi])
+        bars.values = {c: array("d", v[lo:hi]) for c, v in cols.items()}
+        return bars
+
+    def write(self, key: tuple, bars: Bars, coverage: list[list[int]]) -> None:
+        d = self._dir(key)
+        try:
+            d.mkdir(parents=True, exist_ok=True)
+            files = {"ts.q": bars.ts, **{f"{c}.d": bars.values[c] for c in bars.columns}}
+            for name, arr in files.items():
+                tmp = d / f".{name}.tmp"
+                with open(tmp, "wb") as f:
+                    arr.tofile(f)
+                os.replace(tmp, d / name)
+            self._write_meta(d, {
+                "key": list(key),
+                "columns": bars.columns,
+                "decimals": bars.decimals,
+                "intraday": bars.intraday,
+                "coverage": coverage,
+                "rows": len(bars),
+            })
+        except OSError as exc:  # pragma: no cover - depends on environment
+            log.warning("bars: write %s failed (%s)", d.name, exc)
+
+    @staticmethod
+    def _write_meta(d: Path, meta: dict) -> None:
+        tmp = d / ".meta.json.tmp"
+        tmp.write_text(json.dumps({**meta, "updated": int(time.time())}))
+        os.replace(tmp, d / "meta.json")
+
+    def save(self, key: tuple, new: Optional[Bars], coverage: list[list[int]], intraday: bool,
+             replace: bool = False) -> None:
+        """Record ``new`` bars (None: none) and the series' ``coverage``.
+
+        Bars that all follow the stored ones are appended to the column files;
+        anything else is merged with the stored series and rewritten, and
+        ``replace`` drops the stored series first. Blocking: call it off the
+        event loop.
+        """
+        meta = None if replace else self.meta(key)
+        d = self._dir(key)
+        if meta is not None and (new is None or not len(new)):
+            try:
+                self._write_meta(d, {**meta, "coverage": coverage})
+            except OSError as exc:  # pragma: no cover - depends on environment
+                log.warning("bars: write %s failed (%s)", d.name, exc)
+            return
+        if meta is not None and meta.get("rows") and meta["columns"] == new.columns:
+            ts = self.timestamps(key)
+            last = ts[-1] if ts is not None and len(ts) == meta["rows"] else None
+            del ts
+            if last is not None and last < new.ts[0]:
+                try:
+                    files = {"ts.q": new.ts, **{f"{c}.d": new.values[c] for c in new.columns}}
+                    for name, arr in files.items():
+                        with open(d / name, "ab") as f:
+                            arr.tofile(f)
+                    decimals = meta.get("decimals", {})
+                    self._write_meta(d, {
+                        **meta,
+                        "decimals": {c: max(decimals.get(c, 0), new.decimals.get(c, 0)) for c in new.columns},
+                        "coverage": coverage,
+                        "rows": meta["rows"] + len(new),
+                    })
+                except OSError as exc:  # pragma: no cover - a torn append reads as inconsistent
+                    log.warning("bars: append %s failed (%s)", d.name, exc)
+                return
+        stored = self.read(key) if meta is not None else None
+        bars = merge(*(p for p in (stored, new) if p is not None)) if new is not None else Bars([], intraday)
+        bars.intraday = intraday
+        self.write(key, bars, coverage)
+
+
+store = BarStore()
+
+
+def ranged(params: dict) -> bool:
+    """A single instrument over an explicit start_date: fetchable in windows."""
+    ident = params.get("symbol") or params.get("figi") or params.get("isin") or params.get("cusip") or ""
+    return (
+        bool(ident) and "," not in ident
+        and params.get("interval") in INTERVAL_SECONDS
+        and bool(params.get("start_date"))
+    )
+
+
+def applicable(params: dict) -> bool:
+    """Ranged calls by symbol are served from the store (FIGI & co. are not keyed).
+
+    An exchange without a mic_code is only keyed once the instrument table is
+    ready, since it will resolve to a MIC from then on.
+    """
+    return (
+        ENABLED and ranged(params)
+        and bool(params.get("symbol"))
+        and not any(params.get(k) for k in ("figi", "isin", "cusip"))
+        and (not params.get("exchange") or bool(params.get("mic_code")) or resolver.ready)
+    )
+
+
+def chunked(params: dict) -> bool:
+    """True when the call's range cannot come back from a single upstream call."""
+    if not ranged(params):
+        return False
+    try:
+        start = parse_dt(params["start_date"])
+        end = parse_dt(params["end_date"]) if params.get("end_date") else None
+    except ValueError:
+        return False
+    return len(_windows(params["interval"], start, end)) > 1 or int(params.get("outputsize") or 30) > MAX_OUTPUTSIZE
+
+
+def _no_data() -> dict:
+    return {
+        "status": "error",
+        "code": 400,
+        "message": "No data is available on the specified dates. Try setting different start/end dates.",
+    }
+
+
+async def _fetch_range(client, params: dict, start: int, end: Optional[int]) -> "Bars | dict | None":
+    """One upstream call for [start, end); None when the range has no bars."""
+    intraday = is_intraday(params["interval"])
+    data = await client.get(
+        "time_series",
+        **{**params, "outputsize": MAX_OUTPUTSIZE},
+        start_date=format_dt(start, intraday),
+        end_date=format_dt(end, intraday) if end is not None else None,
+    )
+    if isinstance(data, dict):
+        if "no data is available" in str(data.get("message", "")).lower():
+            return None
+        return data
+    bars = parse_csv(data)
+    if bars is None:
+        return {"status": "error", "message": "Unexpected time_series response format"}
+    bars.intraday = intraday
+    return bars.window(start, end)
+
+
+def _windows(
+    interval: str, start: int, end: Optional[int], step: Optional[int] = None,
+) -> list[tuple[int, Optional[int]]]:
+    """[start, end) cut into spans of ``step`` (default: too short to hold more than MAX_OUTPUTSIZE bars)."""
+    step = step or MAX_OUTPUTSIZE * INTERVAL_SECONDS[interval]
+    stop = end if end is not None else int(time.time()) + 86400
+    out: list[tuple[int, Optional[int]]] = []
+    a = start
+    while a < stop:
+        b = a + step
+        out.append((a, b if b < stop else end))
+        a = b
+    return out or [(start, end)]
+
+
+async def _fetch_span(
+    client, params: dict, start: int, end: Optional[int], limit: asyncio.Semaphore, keep=None,
+) -> "Bars | dict | None":
+    """All bars of [start, end), fetched in windows; None when there are none.
+
+    Each window is paged from its newest bar back: a full answer is followed
+    by a call below its oldest bar. Intraday ranges fetch one page first and
+    cut the rest into windows of the clock span it took, since sessions leave
+    most of the clock empty. ``keep(a, b, bars)`` is awaited with every answer
+    as it arrives, [a, b) being what it covers, so a failing window loses
+    nothing the others fetched.
+    """
+    interval = params["interval"]
+    parts: list[Bars] = []
+
+    async def fetch(a: int, b: Optional[int]) -> "tuple[dict | None, Optional[int]]":
+        """One call; its error, or where a full answer stopped."""
+        async with limit:
+            part = await _fetch_range(client, params, a, b)
+        if isinstance(part, dict):
+            return part, None
+        full = part is not None and len(part) >= MAX_OUTPUTSIZE and part.ts[0] > a
+        if part is not None and len(part):
+            parts.append(part)
+        if keep is not None:
+            await keep(part.ts[0] if full else a, b, part)
+        return None, part.ts[0] if full else None
+
+    async def page(a: int, b: Optional[int]) -> "dict | None":
+        while True:
+            err, b = await fetch(a, b)
+            if err is not None or b is None:
+                return err
+
+    windows = _windows(interval, start, end)
+    if is_intraday(interval) and len(windows) > 1:
+        err, oldest = await fetch(start, end)
+        if err is not None:
+            return err
+        newest = max(parts[-1].ts[-1] + INTERVAL_SECONDS[interval], oldest + 1) if oldest is not None else None
+        windows = _windows(interval, start, oldest, newest - oldest) if oldest is not None else []
+    if len(windows) > MAX_CHUNKS:
+        return {
+            "status": "error",
+            "message": (
+                f"The range needs {len(windows)} upstream calls of {MAX_OUTPUTSIZE} bars "
+                f"(limit {MAX_CHUNKS}). Narrow start_date/end_date or use a coarser interval."
+            ),
+        }
+    for err in await asyncio.gather(*(page(a, b) for a, b in windows)):
+        if err is not None:
+            return err
+    return merge(*parts) if parts else None
+
+
+async def _derive(scope: str, params: dict, start: int, end: Optional[int]) -> "tuple[Bars, int] | None":
+    """Leading bars of the window resampled from a finer stored series.
+
+    Returns the derived bars and where they stop (the rest of the window
+    starts there), or None when no finer series covers the window's start.
+    """
+    interval = params["interval"]
+    # Intraday buckets are anchored at the session open: read from midnight.
+    need = start - start % 86400 if is_intraday(interval) else start
+    for source in resample.sources(interval):
+        key = store.key(scope, {**params, "interval": source})
+        async with store.lock(key):
+            meta = store.meta(key)
+            if not meta:
+                continue
+            span = next(((a, b) for a, b in meta.get("coverage", []) if a <= need < b), None)
+            if span is None:
+                continue
+            upto = span[1] if end is None else min(span[1], resample.bucket_end(interval, end))
+            finer = store.read(key, need, upto)
+            # The open shows in the whole stored series, not just this window's days.
+            stamps = store.timestamps(key) if finer is not None and is_intraday(interval) else None
+            open_at = resample.session_open(stamps) if stamps is not None else 0
+            del stamps
+        if finer is None or open_at is None:
+            continue
+        if is_intraday(interval) and min(resample.first_of_day(finer.ts), default=open_at) < open_at:
+            continue  # a day opens early (a special session, pre-market bars): its buckets are unknown
+        done, open_label = resample.complete(resample.resample(finer, interval, open_at), interval, span[1])
+        cut = span[1] if open_label is None else open_label
+        if end is not None:
+            cut = min(cut, end)
+        if cut <= start:
+            continue
+        log.debug("bars: %s %s derived from %s up to %s", params.get("symbol"), interval, source, cut)
+        return done.window(start, cut), cut
+    return None
+
+
+async def window(client, params: dict, concurrency: int = 1, derive: bool = True) -> "Bars | dict":
+    """Every bar of the call's [start_date, end_date) window, oldest first.
+
+    Finished bars come from the store when ``applicable`` — resampled from a
+    finer stored series when one covers the window (``derive``); whatever is
+    missing is fetched in <= MAX_OUTPUTSIZE-bar windows, ``concurrency`` at a
+    time. Raises ValueError on dates this module cannot read.
+    """
+    interval = params["interval"]
+    base = {k: v for k, v in params.items() if k not in ("start_date", "end_date", "outputsize")}
+    start = parse_dt(params["start_date"])
+    end = parse_dt(params["end_date"]) if params.get("end_date") else None
+    limit = asyncio.Semaphore(max(1, concurrency))
+
+    derived = await _derive(client.scope, params, start, end) if derive and applicable(params) else None
+    if derived is not None:
+        head, cut = derived
+        if end is not None and cut >= end:
+            return head if len(head) else _no_data()
+        rest = await window(
+            client, {**params, "start_date": format_dt(cut, is_intraday(interval))}, concurrency, derive=False,
+        )
+        if isinstance(rest, dict):
+            return rest if rest != _no_data() or not len(head) else head
+        return merge(head, rest) if len(head) else rest
+
+    final = finished_before(interval)
+    stored_end = final if end is None else min(end, final)
+    if not applicable(params) or start >= stored_end:  # nothing to keep
+        got = await _fetch_span(client, base, start, end, limit)
+        if isinstance(got, dict):
+            return got
+        got = got.window(start, end) if got is not None else None
+        return got if got is not None and len(got) else _no_data()
+
+    def missing(coverage: list[list[int]]) -> list[tuple[int, Optional[int]]]:
+        ranges: list[tuple[int, Optional[int]]] = list(gaps(coverage, start, stored_end))
+        if end is None or end > stored_end:
+            # The unfinished tail rides along with a trailing gap when contiguous.
+            if ranges and ranges[-1][1] == stored_end:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((stored_end, end))
+        return ranges
+
+    key = store.key(client.scope, params)
+    async with store.lock(key):
+        meta = store.meta(key) or {}
+        coverage = meta.get("coverage", [])
+        ranges = missing(coverage)
+        held = None
+        if meta:
+            held = store.read(key, start, stored_end)
+            if held is None:  # files were inconsistent: rebuild from upstream
+                meta, coverage = {}, []
+                ranges = missing(coverage)
+
+        stamps = store.timestamps(key) if ranges and meta.get("rows") else None
+        anchor = _anchor(stamps, ranges) if stamps is not None and len(stamps) else None
+        del stamps  # unmap before any rewrite
+        check = None
+        if anchor is not None:
+            ranges, check = anchor
+        replace = False
+        saving = asyncio.Lock()
+        held_back: list[tuple[int, Optional[int], Optional[Bars]]] = []
+
+        async def keep(a: int, b: Optional[int], part: Optional[Bars]) -> None:
+            """Store one answer covering [a, b) as soon as it arrives."""
+            nonlocal coverage, check, replace
+            pieces = [(a, b, part)]
+            if check is not None:
+                # Nothing is stored before the anchor bar proved the history unchanged.
+                if not (a <= check and (b is None or check < b)):
+                    held_back.append((a, b, part))
+                    return
+                if part is None or not _same_bar(store.read(key, check, check + 1), part, check):
+                    return
+                pieces = [(a, b, merge(part.window(None, check), part.window(check + 1, None))), *held_back]
+                held_back.clear()
+                check = None
+            async with saving:
+                before = coverage
+                for a, b, part in pieces:
+                    cover_end = stored_end if b is None else min(b, stored_end)
+                    if a < cover_end:
+                        coverage = add_coverage(coverage, a, cover_end)
+                done = [p.window(None, stored_end) for _, _, p in pieces if p is not None]
+                new = merge(*done) if any(len(p) for p in done) else None
+                if replace or new is not None or coverage != before:
+                    await asyncio.to_thread(store.save, key, new, coverage, is_intraday(interval), replace)
+                    replace = False
+
+        results = await asyncio.gather(*(_fetch_span(client, base, a, b, limit, keep) for a, b in ranges))
+        if anchor is not None and check is not None and not any(isinstance(res, dict) for res in results):
+            # Prices were adjusted (a split or a correction): start the series over.
+            log.info("bars: %s %s changed upstream — refetching", params.get("symbol"), interval)
+            held, coverage, replace, check = None, [], True, None
+            ranges = missing(coverage)
+            results = await asyncio.gather(*(_fetch_span(client, base, a, b, limit, keep) for a, b in ranges))
+        for res in results:
+            if isinstance(res, dict):
+                return res
+
+        fresh = [p for p in results if p is not None]
+        tail = [p.window(stored_end, None) for p in fresh]
+        fresh = [p.window(None, stored_end) for p in fresh]
+
+    parts = [p for p in (held, *fresh, *tail) if p is not None]
+    got = merge(*parts).window(start, end) if any(len(p) for p in parts) else None
+    return got if got is not None and len(got) else _no_data()
+
+
+async def time_series(client, params: dict, concurrency: int = 1) -> "dict | str":
+    """Answer a ranged get_time_series call: CSV in the upstream's shape.
+
+    Newest first, at most ``outputsize`` rows of the window.
+    """
+    try:
+        bars = await window(client, params, concurrency)
+    except ValueError:
+        return await client.get("time_series", **params)
+    if isinstance(bars, dict):
+        return bars
+    return bars.tail(int(params.get("outputsize") or 30)).to_csv()
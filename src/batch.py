@@ -0,0 +1,101 @@
+"""Micro-batching of concurrent upstream GETs onto Twelve Data's ``/batch``.
+
+Twelve Data can run many sub-requests in one HTTP call: ``POST /batch`` with
+``{"req_0": {"url": "/quote?symbol=AAPL&…"}, …}`` answers with one envelope per
+sub-request. When enabled, calls for the same api_token that arrive within a
+short window — from any tool or session of that user — are gathered and sent
+as one batch, and each sub-response is routed back to its caller. An agent
+calling ``get_statistics`` on ten tickers back to back then pays one round trip
+instead of ten. Credits are unchanged: each sub-request is still charged (and
+scheduled) individually before it joins a batch.
+
+Off by default, since the window adds up to its length in latency to a lone
+call:
+  MCP_BATCH_WINDOW_MS   gathering window; 0 disables batching (default 0)
+  MCP_BATCH_MAX         sub-requests per batch; a full batch is sent at once (default 100)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+WINDOW   = int(os.environ.get("MCP_BATCH_WINDOW_MS", "0")) / 1000
+MAX_SIZE = max(1, int(os.environ.get("MCP_BATCH_MAX", "100")))
+ENABLED  = WINDOW > 0
+
+# Endpoints that must keep going out on their own.
+_NEVER = {"batch", "api_usage"}
+
+# (endpoint, params) sub-requests → one response per sub-request, in order.
+SendBatch = Callable[[str, list[tuple[str, dict]]], Awaitable[list]]
+
+
+def batchable(endpoint: str) -> bool:
+    return ENABLED and endpoint not in _NEVER
+
+
+@dataclass
+class _Window:
+    items: list[tuple[str, dict, asyncio.Future]] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+class Batcher:
+    def __init__(self, send: SendBatch, window: float = WINDOW, max_size: int = MAX_SIZE) -> None:
+        self._send = send
+        self.window = window
+        self.max_size = max_size
+        self._open: dict[str, _Window] = {}  # api_token → window being filled
+        self._tasks: set[asyncio.Task] = set()
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(self, api_key: str, endpoint: str, params: dict) -> Any:
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+        win = self._open.get(api_key)
+        if win is None:
+            win = self._open[api_key] = _Window()
+            win.timer = loop.call_later(self.window, self._flush, api_key)
+        win.items.append((endpoint, params, fut))
+        if len(win.items) >= self.max_size:
+            self._flush(api_key)
+        return await fut
+
+    def _flush(self, api_key: str) -> None:
+        win = self._open.pop(api_key, None)
+        if win is None:
+            return
+        if win.timer is not None:
+            win.timer.cancel()
+        task = asyncio.get_running_loop().create_task(self._run(api_key, win.items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, api_key: str, items: list[tuple[str, dict, asyncio.Future]]) -> None:
+        self.batches += 1
+        self.requests += len(items)
+        try:
+            results = await self._send(api_key, [(ep, p) for ep, p, _ in items])
+        except BaseException as exc:
+            for _, _, fut in items:
+                if not fut.done():
+                    fut.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for (_, _, fut), result in zip(items, results):
+            if not fut.done():
+                fut.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ENABLED,
+            "window_ms": int(self.window * 1000),
+            "batches": self.batches,
+            "requests": self.requests,
+            "avg_size": round(self.requests / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,333 @@
+"""Response cache in front of ``TwelveDataClient.get`` (in-process, optionally Redis-backed).
+
+Most Twelve Data answers are only as fresh as their endpoint needs them to be:
+a quote moves every second, market movers every few minutes, fundamentals a few
+times a day, and reference lists (countries, exchanges, instrument types)
+almost never. Each endpoint maps to a TTL *class*; endpoints without one are
+not cached at all (time series, indicators, calendars, …).
+
+Eviction is LRU, bounded by the approximate byte size of the cached bodies
+rather than an entry count, so a handful of 100k-character payloads cannot
+push the process over its memory budget. Hit/miss counters are kept per TTL
+class (and per entry) and surfaced via ``stats()`` on the ``/stats`` route.
+
+Replicas behind a load balancer each have their own LRU, so when REDIS_URL is
+set a second tier lives in the Redis that store.py already uses
+(``td:cache:<scope>:<endpoint>:<params-hash>``, see its key layout). Bodies
+are zlib-compressed and expire with their TTL class. The in-process LRU then
+becomes a small L1 in front of it (8 MiB by default): a Redis hit is copied
+into L1 for the rest of the entry's lifetime. Redis trouble never fails a
+call — the tier is skipped for a few seconds and the upstream answers.
+
+The hottest endpoints (price, quote, market movers) may also be served
+*stale*: for a bounded time past its TTL an entry is still returned at once —
+with its age — while a background refresh replaces it. The bound is per
+endpoint; 0 turns stale serving off for it.
+
+Tuning (env):
+  MCP_CACHE=0                   disable the cache entirely
+  MCP_CACHE_MAX_BYTES           in-process budget (default 64 MiB, 8 MiB with Redis)
+  MCP_CACHE_TTL_<CLASS>         override one TTL class, e.g. MCP_CACHE_TTL_REALTIME=10
+  MCP_CACHE_STALE_<ENDPOINT>    stale bound in seconds: PRICE / QUOTE (15), MARKET_MOVERS (300)
+  MCP_CACHE_REDIS=0             keep the cache in-process even when REDIS_URL is set
+  MCP_CACHE_REDIS_TIMEOUT       per-operation Redis timeout in seconds (default 0.25)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Optional
+
+log = logging.getLogger("cache")
+
+ENABLED       = os.environ.get("MCP_CACHE", "1") not in ("0", "false", "no")
+REDIS_URL     = os.environ.get("REDIS_URL", "").strip()
+REDIS_ENABLED = ENABLED and bool(REDIS_URL) and os.environ.get("MCP_CACHE_REDIS", "1") not in ("0", "false", "no")
+REDIS_TIMEOUT = float(os.environ.get("MCP_CACHE_REDIS_TIMEOUT", "0.25"))
+MAX_BYTES     = int(os.environ.get(
+    "MCP_CACHE_MAX_BYTES", str((8 if REDIS_ENABLED else 64) * 1024 * 1024)))
+
+# TTL class → seconds.
+TTL_CLASSES: dict[str, int] = {
+    name: int(os.environ.get(f"MCP_CACHE_TTL_{name.upper()}", default))
+    for name, default in (
+        ("realtime",     5),           # price / quote / fx rate
+        ("movers",       120),         # market_movers/*
+        ("fundamentals", 6 * 3600),    # statistics, profile, statements, …
+        ("reference",    24 * 3600),   # countries, exchanges, instrument types, …
+    )
+}
+
+# Seconds an entry may be served past its TTL, per endpoint family.
+STALE_BOUNDS: dict[str, int] = {
+    name: int(os.environ.get(f"MCP_CACHE_STALE_{name.upper()}", default))
+    for name, default in (
+        ("price",         15),
+        ("quote",         15),
+        ("market_movers", 300),
+    )
+}
+
+_ENDPOINT_CLASS = {
+    "price":                    "realtime",
+    "quote":                    "realtime",
+    "exchange_rate":            "realtime",
+    "currency_conversion":      "realtime",
+    "statistics":               "fundamentals",
+    "profile":                  "fundamentals",
+    "key_executives":           "fundamentals",
+    "logo":                     "fundamentals",
+    "income_statement":         "fundamentals",
+    "balance_sheet":            "fundamentals",
+    "cash_flow":                "fundamentals",
+    "earnings":                 "fundamentals",
+    "dividends":                "fundamentals",
+    "splits":                   "fundamentals",
+    "countries":                "reference",
+    "exchanges":                "reference",
+    "cryptocurrency_exchanges": "reference",
+    "instrument_type":          "reference",
+    "etfs/type":                "reference",
+    "mutual_funds/type":        "reference",
+}
+_PREFIX_CLASS = (
+    ("market_movers/",      "movers"),
+    ("etfs/world/",         "fundamentals"),
+    ("mutual_funds/world/", "fundamentals"),
+)
+
+# Rough per-entry bookkeeping cost on top of the body itself.
+_ENTRY_OVERHEAD = 256
+
+
+def ttl_class(endpoint: str) -> Optional[str]:
+    """TTL class for an endpoint, or None if it must not be cached."""
+    cls = _ENDPOINT_CLASS.get(endpoint)
+    if cls is None:
+        cls = next((c for p, c in _PREFIX_CLASS if endpoint.startswith(p)), None)
+    return cls
+
+
+def stale_bound(endpoint: str) -> int:
+    """Seconds past its TTL an answer of this endpoint may still be served."""
+    return STALE_BOUNDS.get(endpoint.split("/", 1)[0], 0)
+
+
+def make_key(scope: str, endpoint: str, params: dict[str, str]) -> tuple:
+    """Cache key: entitlement scope + endpoint + order-independent params."""
+    return (scope, endpoint, tuple(sorted(params.items())))
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    ttl_class: str
+    stored_at: float
+    expires_at: float
+    stale_until: float
+    hits: int = 0
+
+
+class ResponseCache:
+    def __init__(self, max_bytes: int = MAX_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._evictions = 0
+        self._counters: dict[str, dict[str, int]] = {
+            cls: {"hits": 0, "misses": 0, "stale_hits": 0} for cls in TTL_CLASSES
+        }
+
+    def _live(self, key: tuple, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.stale_until <= now:
+            self._drop(key)
+            entry = None
+        return entry
+
+    def get(self, key: tuple, cls: str) -> Optional[Any]:
+        entry = self._live(key, time.monotonic())
+        if entry is not None and entry.expires_at <= time.monotonic():
+            entry = None
+        if entry is None:
+            self._counters[cls]["misses"] += 1
+            return None
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self._counters[cls]["hits"] += 1
+        return entry.value
+
+    def get_stale(self, key: tuple, cls: str) -> Optional[tuple[Any, float]]:
+        """An expired entry still within its stale bound, and its age in seconds."""
+        now = time.monotonic()
+        entry = self._live(key, now)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self._counters[cls]["stale_hits"] += 1
+        return entry.value, now - entry.stored_at
+
+    def put(
+        self, key: tuple, value: Any, size: int, cls: str,
+        ttl: Optional[float] = None, stale: float = 0,
+    ) -> None:
+        """Store ``value`` for its class TTL (or the ``ttl`` left of a shared entry).
+
+        ``stale`` keeps the entry around that much longer for get_stale().
+        """
+        full = TTL_CLASSES[cls]
+        ttl = full if ttl is None else min(ttl, full)
+        size += _ENTRY_OVERHEAD
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        now = time.monotonic()
+        # stored_at is when the body was fetched, also for entries copied from Redis.
+        self._entries[key] = _Entry(value, size, cls, now - (full - ttl), now + ttl, now + ttl + stale)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _drop(self, key: tuple) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ENABLED,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self._evictions,
+            "classes": {
+                cls: {"ttl": TTL_CLASSES[cls], **counts}
+                for cls, counts in self._counters.items()
+            },
+        }
+
+
+response_cache = ResponseCache()
+
+
+# How long the Redis tier is skipped after an error.
+_REDIS_BACKOFF = 5.0
+
+_K_CACHE = "td:cache:{scope}:{endpoint}:{digest}"
+
+
+class SharedCache:
+    """Redis tier shared by all replicas: compressed bodies with per-class TTLs.
+
+    Stores only ``(content_type, text)`` of successful answers; the caller
+    rebuilds its response object from them.
+    """
+
+    def __init__(self, url: str = REDIS_URL, enabled: bool = REDIS_ENABLED) -> None:
+        self.url = url
+        self.enabled = enabled
+        self._r = None
+        self._down_until = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.writes = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    @staticmethod
+    def redis_key(key: tuple) -> str:
+        scope, endpoint, params = key
+        digest = hashlib.sha1(json.dumps(params, separators=(",", ":")).encode()).hexdigest()[:20]
+        return _K_CACHE.format(scope=scope, endpoint=endpoint, digest=digest)
+
+    def _client(self):
+        if not self.enabled or time.monotonic() < self._down_until:
+            return None
+        if self._r is None:
+            try:
+                import redis.asyncio as aioredis
+            except ImportError:  # pragma: no cover - redis is a hard dependency
+                self.enabled = False
+                return None
+            self._r = aioredis.Redis.from_url(
+                self.url, socket_timeout=REDIS_TIMEOUT, socket_connect_timeout=REDIS_TIMEOUT,
+            )
+        return self._r
+
+    def _failed(self, op: str, exc: Exception) -> None:
+        self.errors += 1
+        self._down_until = time.monotonic() + _REDIS_BACKOFF
+        log.warning("cache: Redis %s failed (%s) — skipping the shared tier for %.0fs", op, exc, _REDIS_BACKOFF)
+
+    async def get(self, key: tuple) -> Optional[tuple[str, str, float]]:
+        """(content_type, text, seconds left) or None on a miss."""
+        r = self._client()
+        if r is None:
+            return None
+        try:
+            async with r.pipeline(transaction=False) as pipe:
+                blob, pttl = await pipe.get(self.redis_key(key)).pttl(self.redis_key(key)).execute()
+        except Exception as exc:
+            self._failed("get", exc)
+            return None
+        if blob is None:
+            self.misses += 1
+            return None
+        try:
+            content_type, _, text = zlib.decompress(blob).decode().partition("\n")
+        except (zlib.error, UnicodeDecodeError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return content_type, text, (pttl / 1000 if pttl and pttl > 0 else 0.0)
+
+    async def put(self, key: tuple, content_type: str, text: str, cls: str) -> None:
+        ttl = TTL_CLASSES[cls]
+        r = self._client()
+        if r is None or ttl <= 0:
+            return
+        raw = f"{content_type}\n{text}".encode()
+        blob = zlib.compress(raw)
+        try:
+            await r.set(self.redis_key(key), blob, ex=ttl)
+        except Exception as exc:
+            self._failed("set", exc)
+            return
+        self.writes += 1
+        self.raw_bytes += len(raw)
+        self.stored_bytes += len(blob)
+
+    async def close(self) -> None:
+        if self._r is not None:
+            await self._r.aclose()
+            self._r = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "writes": self.writes,
+            "compression_ratio": round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else 0.0,
+        }
+
+
+shared_cache = SharedCache()
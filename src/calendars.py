@@ -0,0 +1,372 @@
+"""Date-partitioned store for the market-wide calendars.
+
+``earnings_calendar`` lists every company reporting worldwide — 1000+ rows
+for a single day — and the tools used to download it per call only to keep
+the first 50 rows, losing any country or exchange the caller asked for.
+``dividends_calendar``, ``splits_calendar`` and ``ipo_calendar`` have the same
+shape. Here each answer is ingested once, split into one partition per date
+(the row's ``date`` / ``ex_date`` column), and indexed per partition by
+symbol, exchange, mic_code and country. A call then
+
+    1. fetches only the dates of its window not held yet (or gone stale),
+    2. filters the held rows locally — case-insensitive, ISO country codes
+       translated through the countries list (refdata.py),
+    3. returns one page of ``outputsize`` rows, date-ordered, with a footer
+       saying how many rows matched and how to get the next page.
+
+A call without dates gets the upstream's default window; which dates that
+covered is remembered, so later undated calls are served from the same
+partitions. An answer only creates partitions up to the last date it has
+rows for: a long answer may have been cut off, so the dates after it stay
+unknown and are fetched again. A partition with rows is final once it was
+fetched more than a day after its date ended — by then reported earnings
+carry ``eps_actual`` and late dividend or split announcements are in; any
+other (today's, future ones, empty ones, and past ones fetched too early)
+expires after MCP_CALENDAR_TTL. An expired partition is still served while a
+background refetch replaces it. Partitions are per entitlement scope.
+
+A wide window is one slow upstream call (and a long one is truncated), so a
+range to fetch longer than MCP_CALENDAR_SPLIT_ABOVE days is split into
+sub-ranges of MCP_CALENDAR_SPLIT_DAYS (longer ones if that would make more
+than MCP_CALENDAR_MAX_SPLITS), fetched concurrently, at most
+MCP_CALENDAR_CONCURRENCY at once. Every sub-range is billed as a full
+calendar call (40 credits), so a split window costs up to MAX_SPLITS times as
+much. When the key's credits do not cover every sub-range right now
+(client.parallelism), only the first sub-ranges it can pay for are fetched —
+never one wide call, which the upstream would cut off — and the answer names
+the dates not loaded yet; asking again fetches them. Each sub-range replaces
+its own date partitions, so the merged answer holds every row once; rows the
+upstream repeats within a day are dropped as well.
+
+An answer without a recognizable date column, or a filter on a column the
+calendar does not carry, bypasses the store: the upstream answers as before.
+
+  MCP_CALENDAR_STORE=0       disable
+  MCP_CALENDAR_TTL           lifetime of today's and future partitions, seconds (default 21600)
+  MCP_CALENDAR_MAX_DAYS      partitions kept per calendar (default 730)
+  MCP_CALENDAR_SPLIT_ABOVE   split ranges longer than this many days (default 31)
+  MCP_CALENDAR_SPLIT_DAYS    shortest sub-range, days (default 7; 0 = never split)
+  MCP_CALENDAR_MAX_SPLITS    most sub-ranges per range (default 4)
+  MCP_CALENDAR_CONCURRENCY   sub-range calls in flight at once (default 4)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import calendar
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Optional
+
+from client import _spawn
+from refdata import refdata
+from series import SEP
+
+log = logging.getLogger("calendars")
+
+ENABLED     = os.environ.get("MCP_CALENDAR_STORE", "1") not in ("0", "false", "no")
+TTL         = float(os.environ.get("MCP_CALENDAR_TTL", str(6 * 3600)))
+MAX_DAYS    = int(os.environ.get("MCP_CALENDAR_MAX_DAYS", "730"))
+SPLIT_ABOVE = int(os.environ.get("MCP_CALENDAR_SPLIT_ABOVE", "31"))
+SPLIT_DAYS  = int(os.environ.get("MCP_CALENDAR_SPLIT_DAYS", "7"))
+MAX_SPLITS  = max(1, int(os.environ.get("MCP_CALENDAR_MAX_SPLITS", "4")))
+CONCURRENCY = max(1, int(os.environ.get("MCP_CALENDAR_CONCURRENCY", "4")))
+
+ENDPOINTS = ("earnings_calendar", "dividends_calendar", "splits_calendar", "ipo_calendar")
+
+# A partition fetched this long after its date ended no longer changes
+# (covers exchange time zones and late-filled actuals).
+_SETTLE = 86400
+
+_DATE_COLUMNS = ("date", "ex_date", "payment_date")
+_INDEXED = ("symbol", "exchange", "mic_code", "country")
+
+
+@dataclass
+class _Day:
+    rows: list[str]
+    fetched_at: float
+    index: dict[str, dict[str, list[int]]] = field(default_factory=dict)
+
+
+class Calendar:
+    """Partitions of one calendar endpoint for one entitlement scope."""
+
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self.header: Optional[str] = None
+        self.columns: list[str] = []
+        self.days: dict[str, _Day] = {}
+        self.default: Optional[tuple[float, str, str]] = None  # fetched_at, first, last
+        self._refreshing: set[tuple[str, str]] = set()
+
+    def date_column(self) -> Optional[int]:
+        return next((self.columns.index(c) for c in _DATE_COLUMNS if c in self.columns), None)
+
+    def has(self, name: str) -> bool:
+        return name in self.columns
+
+    def fresh(self, day: str, now: float) -> bool:
+        held = self.days.get(day)
+        if held is None:
+            return False
+        if not held.rows:  # "nothing that day" is never final: events get announced late
+            return now - held.fetched_at < TTL
+        ends = calendar.timegm(date.fromisoformat(day).timetuple()) + 86400
+        return held.fetched_at >= ends + _SETTLE or now - held.fetched_at < TTL
+
+    def ingest(self, text: str, start: Optional[str], end: Optional[str]) -> "tuple[str, str] | tuple[()] | None":
+        """Split an answer into partitions.
+
+        Returns the dates it covers — from ``start`` to the last date it has
+        rows for, as a long answer may have been cut off — ``()`` when it
+        covers none, and None when it has no date column.
+        """
+        lines = [ln for ln in text.splitlines() if ln.strip()]
+        if not lines:
+            return None
+        header = lines[0]
+        if header != self.header:  # first answer, or the upstream changed its columns
+            self.header = header
+            self.columns = [c.strip().lower() for c in header.split(SEP)]
+            self.days.clear()
+            self.default = None
+        col = self.date_column()
+        if col is None:
+            return None
+        by_day: dict[str, list[str]] = {}
+        for line in lines[1:]:
+            cells = line.split(SEP)
+            if len(cells) > col:
+                by_day.setdefault(cells[col].strip()[:10], []).append(line)
+        seen = sorted(d for d in by_day if (not start or d >= start) and (not end or d <= end))
+        if not seen:
+            return () if start and end else None
+        # Dates past the last one with rows are not known to be empty: leave them absent.
+        start, end = start or seen[0], seen[-1]
+        now = time.time()
+        day = date.fromisoformat(start)
+        stop = date.fromisoformat(end)
+        while day <= stop:
+            key = day.isoformat()
+            self.days[key] = self._partition(by_day.get(key, []), now)
+            day += timedelta(days=1)
+        if len(self.days) > MAX_DAYS:
+            for key in sorted(self.days, key=lambda k: self.days[k].fetched_at)[:len(self.days) - MAX_DAYS]:
+                del self.days[key]
+        return start, end
+
+    def _partition(self, rows: list[str], now: float) -> _Day:
+        held = _Day(list(dict.fromkeys(rows)), now)
+        rows = held.rows
+        for name in _INDEXED:
+            if name in self.columns:
+                i = self.columns.index(name)
+                idx: dict[str, list[int]] = {}
+                for n, line in enumerate(rows):
+                    cells = line.split(SEP)
+                    if len(cells) > i:
+                        idx.setdefault(cells[i].strip().lower(), []).append(n)
+                held.index[name] = idx
+        return held
+
+    def select(self, start: str, end: str, filters: dict[str, str]) -> list[str]:
+        out: list[str] = []
+        for key in sorted(k for k in self.days if start <= k <= end):
+            held = self.days[key]
+            rows: Optional[set[int]] = None
+            for name, value in filters.items():
+                hits = set(held.index.get(name, {}).get(value.lower(), ()))
+                rows = hits if rows is None else rows & hits
+            out.extend(held.rows[n] for n in (range(len(held.rows)) if rows is None else sorted(rows)))
+        return out
+
+
+def missing(cal: Calendar, start: str, end: str, now: float) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    """Contiguous date ranges of [start, end] that are absent, and ones only stale."""
+    absent: list[tuple[str, str]] = []
+    stale: list[tuple[str, str]] = []
+    day, stop = date.fromisoformat(start), date.fromisoformat(end)
+    while day <= stop:
+        key = day.isoformat()
+        bucket = absent if key not in cal.days else stale if not cal.fresh(key, now) else None
+        if bucket is not None:
+            if bucket and date.fromisoformat(bucket[-1][1]) + timedelta(days=1) == day:
+                bucket[-1] = (bucket[-1][0], key)
+            else:
+                bucket.append((key, key))
+        day += timedelta(days=1)
+    return absent, stale
+
+
+def split(
+    ranges: list[tuple[str, str]], days: int = SPLIT_DAYS, above: int = SPLIT_ABOVE, most: int = MAX_SPLITS,
+) -> list[tuple[str, str]]:
+    """Ranges longer than ``above`` days cut into at most ``most`` sub-ranges of ``days`` days or more."""
+    if days <= 0:
+        return ranges
+    out: list[tuple[str, str]] = []
+    for a, b in ranges:
+        day, stop = date.fromisoformat(a), date.fromisoformat(b)
+        span = (stop - day).days + 1
+        if span <= above:
+            out.append((a, b))
+            continue
+        size = max(days, -(-span // most))
+        while day <= stop:
+            last = min(day + timedelta(days=size - 1), stop)
+            out.append((day.isoformat(), last.isoformat()))
+            day = last + timedelta(days=1)
+    return out
+
+
+def page(header: str, rows: list[str], outputsize: Optional[int], page_no: int) -> str:
+    """One page of rows under the header, with a footer when rows remain elsewhere."""
+    if not outputsize or outputsize <= 0:
+        return "\n".join([header, *rows])
+    page_no = max(1, page_no)
+    first = (page_no - 1) * outputsize
+    kept = rows[first:first + outputsize]
+    text = "\n".join([header, *kept])
+    if len(rows) > outputsize:
+        if kept:
+            text += f"\n... rows {first + 1}–{first + len(kept)} of {len(rows)}."
+        else:
+            text += f"\n... page {page_no} is past the last of {len(rows)} rows."
+        if first + len(kept) < len(rows):
+            text += f" Pass page={page_no + 1} for more, or filter by country/exchange to narrow the list."
+    return text
+
+
+class CalendarStore:
+    def __init__(self) -> None:
+        self._calendars: dict[tuple[str, str], Calendar] = {}
+        self._locks: dict[tuple[str, str], asyncio.Lock] = {}
+        self.local = 0
+        self.fetches = 0
+
+    def _calendar(self, scope: str, endpoint: str) -> tuple[Calendar, asyncio.Lock]:
+        key = (scope, endpoint)
+        if key not in self._calendars:
+            self._calendars[key] = Calendar(endpoint)
+            self._locks[key] = asyncio.Lock()
+        return self._calendars[key], self._locks[key]
+
+    async def _fetch(self, client, cal: Calendar, start: Optional[str], end: Optional[str]) -> "dict | tuple[str, str] | None":
+        data = await client.get(cal.endpoint, start_date=start, end_date=end)
+        self.fetches += 1
+        if isinstance(data, dict):
+            return data
+        return cal.ingest(str(data), start, end)
+
+    async def _fetch_ranges(self, client, cal: Calendar, ranges: list[tuple[str, str]]) -> list:
+        """Fetch the ranges, wide ones as concurrent sub-ranges.
+
+        When the key's credits do not cover every sub-range right now, only
+        the first ones it can pay for are fetched; the rest stay absent (the
+        caller reports them) rather than going as one wide, truncated call.
+        """
+        parts = split(ranges)
+        if len(parts) > len(ranges):
+            afford = client.parallelism(cal.endpoint, len(parts))
+            if afford < len(parts):
+                log.debug("calendars: credits for %d of %d %s sub-ranges", afford, len(parts), cal.endpoint)
+                parts = parts[:afford]
+        limit = asyncio.Semaphore(min(CONCURRENCY, len(parts)))
+
+        async def one(a: str, b: str):
+            async with limit:
+                return await self._fetch(client, cal, a, b)
+
+        if len(parts) > 1:
+            log.debug("calendars: %s fetched as %d sub-ranges", cal.endpoint, len(parts))
+        return await asyncio.gather(*(one(a, b) for a, b in parts))
+
+    async def _refresh(self, client, cal: Calendar, ranges: list[tuple[str, str]]) -> None:
+        try:
+            await self._fetch_ranges(client, cal, ranges)
+        finally:
+            cal._refreshing.difference_update(ranges)
+
+    async def query(
+        self, client, endpoint: str, start: Optional[str] = None, end: Optional[str] = None,
+        outputsize: Optional[int] = None, page_no: int = 1, **filters: Optional[str],
+    ) -> "dict | str | None":
+        """The filtered page, an upstream error, or None when the caller must go upstream itself."""
+        if not ENABLED or endpoint not in ENDPOINTS:
+            return None
+        try:
+            if start:
+                date.fromisoformat(start)
+            if end:
+                date.fromisoformat(end)
+        except ValueError:
+            return None
+        if bool(start) != bool(end):  # an open-ended window: the upstream decides its other end
+            return None
+        unloaded: list[tuple[str, str]] = []
+        wanted = {k: v.strip() for k, v in filters.items() if v and v.strip()}
+
+        cal, lock = self._calendar(client.scope, endpoint)
+        now = time.time()
+        async with lock:
+            if cal.header is not None and any(not cal.has(k) for k in wanted):
+                return None
+            if not start:
+                held = cal.default
+                if held is None or now - held[0] >= TTL:
+                    got = await self._fetch(client, cal, None, None)
+                    if isinstance(got, dict):
+                        return got
+                    if got is None:
+                        return None
+                    cal.default = (now, *got)
+                    held = cal.default
+                else:
+                    self.local += 1
+                start, end = held[1], held[2]
+            else:
+                absent, stale = missing(cal, start, end, now)
+                if absent:
+                    results = await self._fetch_ranges(client, cal, absent)
+                    for got in results:
+                        if isinstance(got, dict):
+                            return got
+                        if got is None:
+                            return None
+                    unloaded, _ = missing(cal, start, end, time.time())
+                else:
+                    self.local += 1
+                due = [r for r in stale if r not in cal._refreshing]
+                if due:
+                    cal._refreshing.update(due)
+                    _spawn(self._refresh(client, cal, due))
+            if any(not cal.has(k) for k in wanted):
+                return None
+
+        if "country" in wanted:
+            wanted["country"] = await refdata.country_name(client, wanted["country"])
+        rows = cal.select(start, end, wanted)
+        text = page(cal.header or "", rows, outputsize, page_no)
+        if unloaded:
+            spans = ", ".join(a if a == b else f"{a}..{b}" for a, b in unloaded)
+            text += (f"\n... not loaded yet: {spans} (the answer stopped early or the API credits ran out). "
+                     "Ask again to fetch them.")
+        return text
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ENABLED,
+            "calendars": {
+                f"{scope[:8]}:{ep}": {"days": len(cal.days), "rows": sum(len(d.rows) for d in cal.days.values())}
+                for (scope, ep), cal in self._calendars.items()
+            },
+            "local": self.local,
+            "fetches": self.fetches,
+        }
+
+
+calendar_store = CalendarStore()
@@ -0,0 +1,233 @@
+"""In-memory instrument catalog behind ``search_symbol``.
+
+Agents resolve company names one guess at a time — "appl", "apple",
+"apple inc" — and every guess used to be a ``symbol_search`` round trip.
+The instrument lists (``stocks``, ``etfs``, ``forex_pairs``,
+``cryptocurrencies``) change about once a day, so the first search loads
+them in the background and later searches are answered from a local index:
+
+    symbol prefix     bisect over the sorted, upper-cased tickers
+    name words        bisect over the sorted words of every name
+    fuzzy name        difflib over the words sharing the query's first two letters
+    FIGI/ISIN/CUSIP   dict lookups (when the lists carry them)
+
+Rows are stored once, as tuples of interned strings; the indexes hold row
+numbers. Results come back in ``symbol_search``'s shape, ranked exact ticker →
+ticker prefix → name prefix → fuzzy name, listings on major exchanges first.
+
+The catalog is the same for every key, so it is process-wide; it reloads
+itself in the background once older than MCP_CATALOG_REFRESH, serving the old
+snapshot meanwhile. While it loads, when it fails to load, and when a query
+matches nothing locally, ``search_symbol`` asks the upstream as before.
+
+  MCP_CATALOG=0           disable (search_symbol always goes upstream)
+  MCP_CATALOG_REFRESH     snapshot lifetime in seconds (default 86400)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import difflib
+import logging
+import os
+import re
+import sys
+import time
+from bisect import bisect_left
+from typing import Optional
+
+from client import _spawn
+
+log = logging.getLogger("catalog")
+
+ENABLED = os.environ.get("MCP_CATALOG", "1") not in ("0", "false", "no")
+REFRESH = float(os.environ.get("MCP_CATALOG_REFRESH", "86400"))
+
+# Wait this long after a failed load before trying again.
+RETRY_AFTER = 300.0
+
+# Upstream list → the instrument_type its rows get when they carry none.
+LISTS = {
+    "stocks":           "Common Stock",
+    "etfs":             "ETF",
+    "forex_pairs":      "Physical Currency",
+    "cryptocurrencies": "Digital Currency",
+}
+
+# search_symbol's instrument_type filter → the lists that can answer it.
+_TYPE_LISTS = {
+    "stock":          ("stocks",),
+    "etf":            ("etfs",),
+    "forex":          ("forex_pairs",),
+    "cryptocurrency": ("cryptocurrencies",),
+}
+
+_FIELDS = ("symbol", "instrument_name", "exchange", "mic_code", "country", "currency", "instrument_type")
+_MAJOR = {"NASDAQ", "NYSE", "LSE", "XETR", "TSX", "Euronext", "JPX", "HKEX", "SSE", "NSE"}
+
+_ISIN  = re.compile(r"^[A-Z]{2}[A-Z0-9]{9}\d$")
+_FIGI  = re.compile(r"^BBG[A-Z0-9]{9}$")
+_CUSIP = re.compile(r"^[A-Z0-9]{8}\d$")
+_WORD  = re.compile(r"[A-Za-z0-9]+")
+
+
+def _row(item: dict, kind: str) -> tuple:
+    """One list entry as a tuple in _FIELDS order (plus its source list)."""
+    name = item.get("name") or item.get("instrument_name")
+    if not name and item.get("currency_base"):
+        name = f"{item['currency_base']} / {item.get('currency_quote', '')}"
+    exchange = item.get("exchange") or ""
+    if not exchange and item.get("available_exchanges"):
+        exchange = item["available_exchanges"][0]
+    currency = item.get("currency") or item.get("currency_quote") or ""
+    return tuple(sys.intern(str(v)) if v else "" for v in (
+        item.get("symbol"), name, exchange, item.get("mic_code"), item.get("country"),
+        currency, item.get("type") or LISTS[kind], kind,
+    ))
+
+
+class Catalog:
+    """Instrument rows plus the indexes over them; swapped whole on reload."""
+
+    def __init__(self, lists: Optional[dict[str, list[dict]]] = None) -> None:
+        self.rows: list[tuple] = []
+        self.ids: dict[str, list[int]] = {}
+        for kind, items in (lists or {}).items():
+            for item in items:
+                if not item.get("symbol"):
+                    continue
+                n = len(self.rows)
+                self.rows.append(_row(item, kind))
+                for field in ("figi_code", "figi", "isin", "cusip"):
+                    if item.get(field):
+                        self.ids.setdefault(str(item[field]).upper(), []).append(n)
+        self.tickers = sorted((r[0].upper(), n) for n, r in enumerate(self.rows))
+        self.words = sorted({(w.lower(), n) for n, r in enumerate(self.rows) for w in _WORD.findall(r[1])})
+        self._vocab: dict[str, list[str]] = {}
+        for word in dict.fromkeys(w for w, _ in self.words):
+            self._vocab.setdefault(word[:2], []).append(word)
+        self.loaded_at = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @staticmethod
+    def _prefixed(index: list[tuple[str, int]], prefix: str) -> list[tuple[str, int]]:
+        i = bisect_left(index, (prefix, -1))
+        out = []
+        while i < len(index) and index[i][0].startswith(prefix):
+            out.append(index[i])
+            i += 1
+        return out
+
+    def _fuzzy(self, word: str) -> set[int]:
+        """Rows with a name word close to ``word`` (same first two letters)."""
+        rows: set[int] = set()
+        for close in difflib.get_close_matches(word, self._vocab.get(word[:2], []), n=5, cutoff=0.75):
+            rows.update(n for w, n in self._prefixed(self.words, close) if w == close)
+        return rows
+
+    def identifier(self, value: str) -> list[int]:
+        """Rows carrying this FIGI, ISIN or CUSIP."""
+        return list(self.ids.get(value.strip().upper(), []))
+
+    def search(self, query: str, limit: int = 10, kinds: Optional[tuple[str, ...]] = None,
+               type_name: Optional[str] = None) -> list[dict]:
+        """Ranked matches for a ticker, name fragment or identifier."""
+        q = query.strip()
+        if not q:
+            return []
+        upper = q.upper()
+        ranked: dict[int, tuple] = {}
+
+        def add(rows, rank: int) -> None:
+            for n in rows:
+                if n not in ranked:
+                    r = self.rows[n]
+                    if kinds and r[7] not in kinds:
+                        continue
+                    if type_name and r[6].lower() != type_name:
+                        continue
+                    ranked[n] = (rank, r[2] not in _MAJOR, len(r[0]), r[0])
+
+        if _FIGI.match(upper) or _ISIN.match(upper) or _CUSIP.match(upper):
+            add(self.identifier(upper), 0)
+        add((n for t, n in self._prefixed(self.tickers, upper) if t == upper), 1)
+        add((n for _, n in self._prefixed(self.tickers, upper)), 2)
+
+        words = [w.lower() for w in _WORD.findall(q)]
+        if words:
+            # Every query word must prefix some word of the name.
+            hits = [set(n for _, n in self._prefixed(self.words, w)) for w in words]
+            add(sorted(set.intersection(*hits)), 3)
+            if len(ranked) < limit:
+                add(sorted(set.intersection(*(self._fuzzy(w) for w in words))), 4)
+
+        best = sorted(ranked, key=ranked.__getitem__)[:limit]
+        return [dict(zip(_FIELDS, self.rows[n][:7])) for n in best]
+
+
+class CatalogHolder:
+    """The current snapshot and its background (re)loading."""
+
+    def __init__(self) -> None:
+        self.catalog: Optional[Catalog] = None
+        self._task: Optional[asyncio.Task] = None
+        self._failed_at = -RETRY_AFTER
+        self.local_hits = 0
+        self.fallbacks = 0
+
+    def current(self, client) -> Optional[Catalog]:
+        """The snapshot, if any; starts a (re)load in the background when due."""
+        if not ENABLED:
+            return None
+        now = time.monotonic()
+        due = self.catalog is None or now - self.catalog.loaded_at > REFRESH
+        idle = self._task is None or self._task.done()
+        if due and idle and now - self._failed_at > RETRY_AFTER:
+            self._task = _spawn(self._load(client))
+        return self.catalog
+
+    async def _load(self, client) -> None:
+        started = time.monotonic()
+        answers = await asyncio.gather(*(client.get_json(kind) for kind in LISTS))
+        lists: dict[str, list[dict]] = {}
+        for kind, data in zip(LISTS, answers):
+            if not isinstance(data, dict) or not isinstance(data.get("data"), list):
+                self._failed_at = time.monotonic()
+                log.warning("catalog: loading %s failed (%s)", kind,
+                            data.get("message") if isinstance(data, dict) else "unexpected response")
+                return
+            lists[kind] = data["data"]
+        catalog = await asyncio.get_running_loop().run_in_executor(None, Catalog, lists)
+        self.catalog = catalog
+        log.info("catalog: %d instruments indexed in %.1fs", len(catalog), time.monotonic() - started)
+
+    def search(self, client, query: str, limit: int = 10,
+               instrument_type: Optional[str] = None) -> Optional[list[dict]]:
+        """Local matches, or None when the upstream must answer."""
+        catalog = self.current(client)
+        kinds, type_name = None, None
+        if instrument_type:
+            key = instrument_type.strip().lower()
+            kinds = _TYPE_LISTS.get(key)
+            if kinds is None:
+                type_name = key  # an exact type like 'Common Stock'
+        results = catalog.search(query, limit, kinds, type_name) if catalog is not None else []
+        if not results:
+            self.fallbacks += 1
+            return None
+        self.local_hits += 1
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ENABLED,
+            "instruments": len(self.catalog) if self.catalog else 0,
+            "age": round(time.monotonic() - self.catalog.loaded_at) if self.catalog else None,
+            "local_hits": self.local_hits,
+            "fallbacks": self.fallbacks,
+        }
+
+
+catalog = CatalogHolder()
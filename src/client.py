@@ -1,57 +1,672 @@
-"""Twelve Data API HTTP client."""
+"""Twelve Data API HTTP client.
+
+One pooled ``httpx.AsyncClient`` is shared by the whole process: every tool call
+reuses its keep-alive (HTTP/2 when ``h2`` is installed) connections to
+api.twelvedata.com instead of paying DNS + TCP + TLS per request.
+``TwelveDataClient`` is just a lightweight per-token wrapper over that pool.
+
+The pool is opened by the server lifespan (``upstream_pool()`` in server.py) and
+closed on shutdown. Entry points that bypass it (``mcp dev``) get it lazily on
+first use.
+
+Cacheable endpoints (see cache.py) are answered from an in-process LRU before
+any of that; responses are kept undecoded (``_Response``) so every caller gets
+its own freshly decoded copy and tools may mutate what they receive. With
+REDIS_URL set, an L1 miss consults the replicas' shared Redis tier next.
+Price, quote and movers answers slightly past their TTL are returned at once
+as ``Aged`` strings (the tool output names their age) while a background
+refresh, coalesced like any other call, fetches the new value.
+
+Identical requests that are already in flight are coalesced (single-flight):
+the first caller's upstream call is shared by every concurrent caller with the
+same endpoint + params + entitlement scope. Params are keyed in their
+canonical instrument form (instruments.py), so ``aapl``, ``AAPL`` and its FIGI
+share one entry (the first call of a process starts loading the table
+behind that, see instruments.py). The scope is the key's plan tier
+once known (learned in the background from ``api_usage``), so keys on the
+same standard plan share cache entries and in-flight calls; until then, and
+for custom/enterprise plans, it is the key's own fingerprint. Answers about
+the account itself (``api_usage``) are never shared by tier: they are keyed
+and coalesced by the key's fingerprint whatever its plan.
+
+Only calls that actually go upstream are charged against the key's credit
+budget (ratelimit.py): they queue for credits rather than tripping 429s.
+Transient failures are retried with backoff, and each endpoint family sits
+behind a circuit breaker that fails fast while the upstream is unhealthy
+(resilience.py). Optionally, concurrent calls of one key are gathered onto
+Twelve Data's ``/batch`` endpoint (batch.py).
+
+Bodies are decoded by Content-Type. CSV is returned as text; JSON is passed
+through undecoded (``RawJSON``, a str) unless it is an error envelope or the
+tool asked for ``get_json`` because it needs to reshape the payload. The hot
+path therefore never attempts a failed parse or a parse + re-serialize round
+trip. Parsing uses orjson when installed.
+
+``complex_data`` sends many symbols × intervals × indicators as one
+``POST /complex_data``; it is charged the sum of its parts and is not cached.
+
+Row-capped callers use ``iter_rows`` / ``get_rows`` instead of ``get``: the CSV
+body is streamed line by line and the connection is released as soon as the
+caller has enough rows, so a 100k-character calendar costs what is kept.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import logging
 import os
-from typing import Any
+import re
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional, Tuple
+from urllib.parse import urlencode
 
 import httpx
 
+try:  # optional speed-up: pip install orjson
+    import orjson
+
+    def json_loads(text: "str | bytes") -> Any:
+        return orjson.loads(text)
+
+    def json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:  # pragma: no cover - depends on environment
+    json_loads = json.loads
+    json_dumps = json.dumps
+
+from batch import Batcher, batchable
+from cache import (
+    ENABLED as CACHE_ENABLED, make_key, response_cache, shared_cache, stale_bound, ttl_class,
+)
+from instruments import PRELOAD, canonical, resolver
+from ratelimit import RateLimitExceeded, credit_cost, scheduler
+from resilience import (
+    RETRY_ATTEMPTS, RETRY_MAX_DELAY, RETRYABLE_STATUS, CircuitOpen, backoff, breakers,
+)
+
 API_BASE = "https://api.twelvedata.com"
 
+log = logging.getLogger("client")
+
+# Pool tuning (env-overridable). Defaults suit one worker fanning out to a
+# single upstream host: plenty of concurrent streams, a warm idle reserve.
+_TIMEOUT          = float(os.environ.get("MCP_HTTP_TIMEOUT", "30"))
+_MAX_CONNECTIONS  = int(os.environ.get("MCP_HTTP_MAX_CONNECTIONS", "100"))
+_MAX_KEEPALIVE    = int(os.environ.get("MCP_HTTP_MAX_KEEPALIVE", "20"))
+_KEEPALIVE_EXPIRY = float(os.environ.get("MCP_HTTP_KEEPALIVE_EXPIRY", "60"))
+_HTTP2            = os.environ.get("MCP_HTTP2", "1") not in ("0", "false", "no")
+
+# Entitlement tiers whose keys all see the same data. Anything else (enterprise,
+# custom add-ons, unknown) stays scoped to the individual key.
+_TIER_SHARING = os.environ.get("MCP_SHARE_BY_TIER", "1") not in ("0", "false", "no")
+_SHARED_TIERS = {"basic", "grow", "pro", "ultra"}
+_TIER_TTL     = 6 * 3600
+
+# Endpoints that describe the calling account rather than market data: keyed
+# and coalesced per key, never per tier.
+_PER_KEY = {"api_usage"}
+
+_pool: Optional[httpx.AsyncClient] = None
+
+# key fingerprint → (plan_category, learned_at)
+_tiers: dict[str, tuple[str, float]] = {}
+_tier_probes: set[str] = set()
+# coalescing key → the shared upstream call
+_inflight: dict[tuple, "asyncio.Task[_Response]"] = {}
+_coalesced = 0
+_background: set[asyncio.Task] = set()
+
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (httpx[http2] extra)
+        return True
+    except ImportError:
+        return False
+
+
+def _new_pool() -> httpx.AsyncClient:
+    http2 = _HTTP2 and _h2_available()
+    if _HTTP2 and not http2:
+        log.warning("client: h2 not installed — upstream pool falls back to HTTP/1.1")
+    return httpx.AsyncClient(
+        base_url=API_BASE,
+        http2=http2,
+        timeout=_TIMEOUT,
+        limits=httpx.Limits(
+            max_connections=_MAX_CONNECTIONS,
+            max_keepalive_connections=_MAX_KEEPALIVE,
+            keepalive_expiry=_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def _http() -> httpx.AsyncClient:
+    """Return the shared pool, creating it on first use."""
+    global _pool
+    if _pool is None or _pool.is_closed:
+        _pool = _new_pool()
+    return _pool
+
+
+@asynccontextmanager
+async def upstream_pool() -> AsyncIterator[httpx.AsyncClient]:
+    """Own the shared upstream pool for the lifetime of the server."""
+    global _pool
+    pool = _http()
+    key = os.environ.get("TWELVE_DATA_API_KEY")
+    if key and PRELOAD:
+        # The instrument lists are loaded on the server's own key, never a user's.
+        resolver.ensure(TwelveDataClient(key))
+    try:
+        yield pool
+    finally:
+        _pool = None
+        await pool.aclose()
+        await shared_cache.close()
+
+
+@dataclass(frozen=True)
+class _Response:
+    """An upstream answer, kept undecoded so it can be cached and shared."""
+    status: int
+    text: str
+    content_type: str = ""
+
+    @property
+    def is_success(self) -> bool:
+        return 200 <= self.status < 300
+
+
+def _wrap(resp: httpx.Response) -> _Response:
+    return _Response(resp.status_code, resp.text, resp.headers.get("content-type", ""))
+
+
+def _fingerprint(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def _spawn(coro) -> asyncio.Task:
+    """Fire-and-forget a coroutine, keeping a reference until it finishes."""
+    task = asyncio.get_running_loop().create_task(coro)
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+    return task
+
+
+def _scope(api_key: str) -> str:
+    """Entitlement scope of a key — responses are only shared within it."""
+    fp = _fingerprint(api_key)
+    known = _tiers.get(fp)
+    if known and time.monotonic() - known[1] < _TIER_TTL:
+        return f"tier:{known[0]}" if known[0] in _SHARED_TIERS else fp
+    if _TIER_SHARING and fp not in _tier_probes:
+        _tier_probes.add(fp)
+        _spawn(_probe_tier(api_key, fp))
+    return fp
+
+
+def _settle(key: tuple, task: asyncio.Task) -> None:
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    if not task.cancelled():
+        task.exception()  # mark retrieved even if every waiter went away
+
+
+def _plan_category(text: str) -> str:
+    """Pull plan_category out of an api_usage body (JSON or CSV)."""
+    try:
+        body = json.loads(text)
+        return str(body.get("plan_category", "")).lower() if isinstance(body, dict) else ""
+    except ValueError:
+        lines = text.splitlines()
+        if len(lines) < 2:
+            return ""
+        header, row = lines[0].split(";"), lines[1].split(";")
+        return row[header.index("plan_category")].lower() if "plan_category" in header else ""
+
+
+def _learn_tier(fp: str, text: str) -> None:
+    plan = _plan_category(text)
+    if plan:
+        _tiers[fp] = (plan, time.monotonic())
+
+
+async def _probe_tier(api_key: str, fp: str) -> None:
+    try:
+        resp = await TwelveDataClient(api_key)._fetch("api_usage", {"format": "JSON"})
+        if resp.is_success:
+            _learn_tier(fp, resp.text)
+    except Exception as exc:
+        log.debug("client: tier probe failed (%s)", exc)
+    finally:
+        _tier_probes.discard(fp)
+
+
+class RawJSON(str):
+    """A JSON body passed through undecoded — nobody asked to inspect it."""
+
+
+class Aged(str):
+    """A cached body served past its TTL; ``age`` is seconds since it was fetched."""
+
+    age: float = 0.0
+
+
+def _aged(data: "dict | str", age: float) -> "dict | str":
+    if not isinstance(data, str):
+        return data
+    out = Aged(data)
+    out.age = age
+    return out
+
+
+_ERROR_STATUS = re.compile(r'"status"\s*:\s*"error"')
+
+# Error envelopes are a few hundred bytes; a JSON body larger than this is data.
+_ENVELOPE_MAX = 4096
+
+
+def _is_json(resp: _Response) -> bool:
+    ctype = resp.content_type.lower()
+    if "json" in ctype:
+        return True
+    if "csv" in ctype or "text/plain" in ctype:
+        return False
+    return resp.text.lstrip()[:1] in ("{", "[")
+
+
+def _decode(resp: _Response, parse: bool = False) -> "dict | str":
+    is_json = _is_json(resp)
+    if resp.is_success:
+        if not is_json:
+            return resp.text  # CSV response
+        # Only a small body mentioning "status":"error" (anywhere — key order
+        # and trailing fields vary) can be an error envelope; parse just those.
+        if not parse and (len(resp.text) > _ENVELOPE_MAX or not _ERROR_STATUS.search(resp.text)):
+            return RawJSON(resp.text)
+
+    body = None
+    if is_json:
+        try:
+            body = json_loads(resp.text)  # error envelope or JSON the tool reshapes
+        except ValueError:
+            body = None
+
+    if resp.is_success:
+        if not parse and not (isinstance(body, dict) and body.get("status") == "error"):
+            return RawJSON(resp.text)
+        return body if body is not None else resp.text
+
+    # HTTP error (plan gating comes as 403 or 404). Twelve Data
+    # usually carries details in a JSON envelope; keep them but
+    # always stamp the HTTP status into `code` so downstream still
+    # has it when the body lacks it or isn't JSON.
+    if isinstance(body, dict):
+        body.setdefault("status", "error")
+        body.setdefault("code", resp.status)
+        return body
+    return {
+        "status": "error",
+        "code": resp.status,
+        "message": f"HTTP {resp.status}: {resp.text[:300]}",
+    }
+
+
+def _clean(params: dict) -> dict[str, str]:
+    return {k: str(v).strip() for k, v in params.items() if v is not None}
+
+
+def _not_authenticated() -> dict:
+    return {
+        "status": "error",
+        "message": (
+            "Not authenticated. Run oauth_login or set the "
+            "TWELVE_DATA_API_KEY environment variable."
+        ),
+    }
+
+
+def _failure(exc: Exception) -> dict:
+    """Error envelope for a call that never produced an upstream answer."""
+    if isinstance(exc, RateLimitExceeded):
+        return {
+            "status": "error",
+            "code": 429,
+            "message": (
+                f"API credit limit reached for this minute ({exc}). "
+                "Try again shortly or request fewer symbols at once."
+            ),
+        }
+    if isinstance(exc, CircuitOpen):
+        return {
+            "status": "error",
+            "code": 503,
+            "message": (
+                f"Twelve Data is temporarily unavailable for this data "
+                f"({exc.family}); retry in about {exc.retry_in:.0f}s."
+            ),
+        }
+    return {"status": "error", "message": f"Request failed: {exc}"}
+
+
+class NotRows(Exception):
+    """``iter_rows`` got a JSON answer (error envelope or JSON-only endpoint)."""
+
+    def __init__(self, data: "dict | str") -> None:
+        super().__init__("upstream answered without CSV rows")
+        self.data = data
+
+
+def stats() -> dict:
+    """Upstream-layer counters for the /stats route."""
+    return {
+        "cache": response_cache.stats(),
+        "shared_cache": shared_cache.stats(),
+        "single_flight": {"inflight": len(_inflight), "coalesced": _coalesced},
+        "instruments": resolver.stats(),
+        "tiers": {"known_keys": len(_tiers)},
+        "rate_limit": scheduler.stats(),
+        "breakers": breakers.stats(),
+        "batch": _batcher.stats(),
+    }
+
 
 class TwelveDataClient:
     def __init__(self, api_key: str = ""):
         self._api_key = api_key or os.environ.get("TWELVE_DATA_API_KEY", "")
 
+    @property
+    def api_key(self) -> str:
+        """The raw key, for transports outside the HTTP pool (stream.py)."""
+        return self._api_key
+
+    @property
+    def scope(self) -> str:
+        """Entitlement scope of this key: data fetched with it may be shared within it."""
+        return _scope(self._api_key) if self._api_key else ""
+
+    def parallelism(self, endpoint: str, cap: int) -> int:
+        """Concurrent calls of ``endpoint`` worth starting now: ``cap``, bounded by available credits."""
+        return scheduler.parallelism(_fingerprint(self._api_key), credit_cost(endpoint, {}), cap)
+
     async def get(self, endpoint: str, **params: Any) -> "dict | str":
+        """CSV text, passthrough JSON (RawJSON) or an error dict."""
+        return await self._get(endpoint, _clean(params), parse=False)
+
+    async def get_json(self, endpoint: str, **params: Any) -> "dict | str":
+        """Like get(), but asks for JSON and returns it parsed, for tools that reshape it."""
+        return await self._get(endpoint, {**_clean(params), "format": "JSON"}, parse=True)
+
+    async def _get(self, endpoint: str, clean: dict[str, str], parse: bool) -> "dict | str":
         if not self._api_key:
-            return {
-                "status": "error",
-                "message": (
-                    "Not authenticated. Run oauth_login or set the "
-                    "TWELVE_DATA_API_KEY environment variable."
-                ),
+            return _not_authenticated()
+
+        cls = ttl_class(endpoint) if CACHE_ENABLED else None
+        scope = _fingerprint(self._api_key) if endpoint in _PER_KEY else _scope(self._api_key)
+        key = make_key(scope, endpoint, canonical(clean))
+        resp = response_cache.get(key, cls) if cls else None
+        if resp is not None:
+            return _decode(resp, parse)
+        stale = stale_bound(endpoint) if cls else 0
+        if stale and (hit := response_cache.get_stale(key, cls)) is not None:
+            resp, age = hit
+            if key not in _inflight:
+                _spawn(self._refresh(key, endpoint, clean, cls, stale))
+            return _aged(_decode(resp, parse), age)
+        if cls and (shared := await shared_cache.get(key)) is not None:
+            content_type, text, ttl_left = shared
+            resp = _Response(200, text, content_type)
+            response_cache.put(key, resp, len(text), cls, ttl=ttl_left, stale=stale)
+            return _decode(resp, parse)
+        try:
+            resp = await self._shared(key, endpoint, clean)
+        except (httpx.RequestError, RateLimitExceeded, CircuitOpen) as exc:
+            return _failure(exc)
+        if endpoint == "api_usage" and resp.is_success:
+            _learn_tier(_fingerprint(self._api_key), resp.text)
+        data = _decode(resp, parse)
+        if cls:
+            self._keep(key, resp, data, cls, stale)
+        return data
+
+    @staticmethod
+    def _keep(key: tuple, resp: _Response, data: "dict | str", cls: str, stale: float) -> None:
+        # Never cache errors — including 200-wrapped error envelopes.
+        if not resp.is_success or (isinstance(data, dict) and data.get("status") == "error"):
+            return
+        response_cache.put(key, resp, len(resp.text), cls, stale=stale)
+        if shared_cache.enabled:
+            _spawn(shared_cache.put(key, resp.content_type, resp.text, cls))
+
+    async def _refresh(self, key: tuple, endpoint: str, params: dict[str, str], cls: str, stale: float) -> None:
+        """Background revalidation of an entry that was just served stale."""
+        try:
+            resp = await self._shared(key, endpoint, params)
+        except (httpx.RequestError, RateLimitExceeded, CircuitOpen) as exc:
+            log.info("stale refresh of %s failed (%s)", endpoint, exc)
+            return
+        self._keep(key, resp, _decode(resp), cls, stale)
+
+    async def complex_data(
+        self, symbols: list[str], intervals: list[str], methods: list["str | dict"], **params: Any,
+    ) -> dict:
+        """One ``POST /complex_data`` for every symbol × interval × method.
+
+        ``methods`` are endpoint names (``"time_series"``, ``"rsi"``) or
+        ``{"name": ..., <indicator params>}`` dicts; ``params`` apply to all
+        (outputsize, start_date, …). Returns the parsed envelope —
+        ``{"data": [{"meta": …, "values": […], "status": "ok"}, …]}`` — or an
+        error dict.
+        """
+        if not self._api_key:
+            return _not_authenticated()
+        body = {
+            "symbols": symbols, "intervals": intervals, "methods": methods,
+            **{k: v for k, v in params.items() if v is not None},  # JSON body: keep value types
+        }
+        fam, breaker = breakers.for_endpoint("complex_data")
+        try:
+            if not breaker.allow():
+                raise CircuitOpen(fam, breaker.retry_in())
+            cost = sum(
+                credit_cost(m if isinstance(m, str) else str(m.get("name", "")), {}) for m in methods
+            ) * len(symbols) * len(intervals)
+            try:  # the probe slot is given back even if the credit wait fails or is cancelled
+                await scheduler.acquire(_fingerprint(self._api_key), "complex_data", {}, cost=cost)
+                resp = await self._send(breaker, "POST", "/complex_data", json=body)
+            finally:
+                breaker.release()
+        except (httpx.RequestError, RateLimitExceeded, CircuitOpen) as exc:
+            return _failure(exc)
+        data = _decode(_wrap(resp), parse=True)
+        if not isinstance(data, dict):
+            return {"status": "error", "message": "Unexpected complex_data response format"}
+        return data
+
+    async def iter_rows(self, endpoint: str, **params: Any) -> AsyncIterator[str]:
+        """Stream a CSV response line by line, header first.
+
+        Stopping early (``break`` / closing the generator) closes the upstream
+        stream, so the rest of the body is never downloaded. Raises NotRows when
+        the answer is JSON instead — an error envelope or a JSON-only endpoint.
+        Not cached or coalesced: every call is its own (partial) download.
+        """
+        if not self._api_key:
+            raise NotRows(_not_authenticated())
+        clean = _clean(params)
+        fam, breaker = breakers.for_endpoint(endpoint)
+        if not breaker.allow():
+            raise CircuitOpen(fam, breaker.retry_in())
+        key_id = _fingerprint(self._api_key)
+        try:
+            await scheduler.acquire(key_id, endpoint, clean)
+            async with _http().stream(
+                "GET",
+                f"/{endpoint}",
+                headers={"Authorization": f"apikey {self._api_key}"},
+                params={**clean, "format": "CSV"},
+            ) as resp:
+                scheduler.observe(key_id, resp.headers)
+                if resp.status_code >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                lines = resp.aiter_lines()
+                first = await anext(lines, "")
+                if not resp.is_success or first.lstrip().startswith("{"):
+                    rest = [line async for line in lines]
+                    body = "\n".join([first, *rest])
+                    raise NotRows(_decode(_Response(resp.status_code, body, "application/json"), parse=True))
+                if first:
+                    yield first
+                async for line in lines:
+                    if line:
+                        yield line
+        except httpx.RequestError:
+            breaker.record_failure()
+            raise
+        finally:
+            breaker.release()
+
+    async def get_rows(self, endpoint: str, max_rows: int, **params: Any) -> Tuple["dict | str", bool]:
+        """Header + at most ``max_rows`` CSV rows, and whether more rows existed.
+
+        The stream is abandoned right after the first surplus row. ``max_rows``
+        <= 0 reads everything. Errors come back as the usual error dict.
+        """
+        kept: list[str] = []
+        more = False
+        rows = self.iter_rows(endpoint, **params)
+        try:
+            async for line in rows:
+                if 0 < max_rows < len(kept):  # header + max_rows already kept
+                    more = True
+                    break
+                kept.append(line)
+        except NotRows as exc:
+            return exc.data, False
+        except (httpx.RequestError, RateLimitExceeded, CircuitOpen) as exc:
+            return _failure(exc), False
+        finally:
+            await rows.aclose()
+        return "\n".join(kept), more
+
+    async def _shared(self, key: tuple, endpoint: str, params: dict[str, str]) -> _Response:
+        """Join an identical in-flight upstream call, or start one.
+
+        The call runs as its own task and every caller awaits it shielded, so a
+        caller going away (client disconnect) never cancels it for the others.
+        """
+        global _coalesced
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._fetch(endpoint, params))
+            _inflight[key] = task
+            task.add_done_callback(lambda t: _settle(key, t))
+        else:
+            _coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _fetch(self, endpoint: str, params: dict[str, str]) -> _Response:
+        fam, breaker = breakers.for_endpoint(endpoint)
+        if not breaker.allow():
+            raise CircuitOpen(fam, breaker.retry_in())
+        try:  # the probe slot is given back even if the credit wait fails or is cancelled
+            await scheduler.acquire(_fingerprint(self._api_key), endpoint, params)
+            if batchable(endpoint):
+                sub = await _batcher.submit(self._api_key, endpoint, params)
+                if sub.status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+                return sub
+            resp = await self._send(breaker, "GET", f"/{endpoint}", params={"format": "CSV", **params})
+            return _wrap(resp)
+        finally:
+            breaker.release()
+
+    async def _send(self, breaker, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """One upstream HTTP exchange, retried per resilience.py.
+
+        Records outcomes on ``breaker`` and feeds the credit headers back to the
+        scheduler; raises httpx.RequestError once retries are exhausted.
+        """
+        key_id = _fingerprint(self._api_key)
+        headers = {"Authorization": f"apikey {self._api_key}"}
+        attempt = 0
+        while True:
+            try:
+                resp = await _http().request(method, path, headers=headers, **kwargs)
+            except httpx.RequestError:
+                breaker.record_failure()
+                attempt += 1
+                if attempt >= RETRY_ATTEMPTS or not breaker.allow():
+                    raise
+                await asyncio.sleep(backoff(attempt - 1))
+                continue
+
+            scheduler.observe(key_id, resp.headers)
+            if resp.status_code >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if resp.status_code in RETRYABLE_STATUS and attempt + 1 < RETRY_ATTEMPTS:
+                delay = backoff(attempt, resp.headers.get("retry-after"))
+                if delay <= RETRY_MAX_DELAY and breaker.allow():
+                    attempt += 1
+                    await asyncio.sleep(delay)
+                    continue
+            return resp
+
+    async def _send_batch(self, items: list[tuple[str, dict]]) -> list[_Response]:
+        """Run sub-requests as one ``POST /batch``; one response per item."""
+        _, breaker = breakers.for_endpoint("batch")
+        try:
+            if len(items) == 1:  # nothing to gather — skip the envelope
+                endpoint, params = items[0]
+                resp = await self._send(breaker, "GET", f"/{endpoint}", params={"format": "CSV", **params})
+                return [_wrap(resp)]
+            body = {
+                f"req_{i}": {"url": f"/{endpoint}?{urlencode({'format': 'CSV', **params, 'apikey': self._api_key})}"}
+                for i, (endpoint, params) in enumerate(items)
             }
-        clean = {k: str(v) for k, v in params.items() if v is not None}
-        clean["format"] = "CSV"
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as http:
-                resp = await http.get(
-                    f"{API_BASE}/{endpoint}",
-                    headers={"Authorization": f"apikey {self._api_key}"},
-                    params=clean,
-                )
-                try:
-                    body = resp.json()  # error envelope or JSON-only endpoints
-                except Exception:
-                    body = None
-
-                if resp.is_success:
-                    return body if body is not None else resp.text  # CSV response
-
-                # HTTP error (plan gating comes as 403 or 404). Twelve Data
-                # usually carries details in a JSON envelope; keep them but
-                # always stamp the HTTP status into `code` so downstream still
-                # has it when the body lacks it or isn't JSON.
-                if isinstance(body, dict):
-                    body.setdefault("status", "error")
-                    body.setdefault("code", resp.status_code)
-                    return body
-                return {
-                    "status": "error",
-                    "code": resp.status_code,
-                    "message": f"HTTP {resp.status_code}: {resp.text[:300]}",
-                }
-        except httpx.RequestError as exc:
-            return {"status": "error", "message": f"Request failed: {exc}"}
+            resp = await self._send(breaker, "POST", "/batch", json=body)
+        finally:
+            breaker.release()
+        if not resp.is_success:
+            return [_wrap(resp)] * len(items)
+
+        try:
+            envelope = json_loads(resp.content)
+        except ValueError:
+            envelope = None
+        data = envelope.get("data") if isinstance(envelope, dict) else None
+        if not isinstance(data, dict):
+            log.warning("client: unreadable /batch response for %d requests", len(items))
+            bad = json_dumps({"status": "error", "code": 502, "message": "Unexpected batch response format"})
+            return [_Response(502, bad, "application/json")] * len(items)
+        out: list[_Response] = []
+        for i in range(len(items)):
+            sub = data.get(f"req_{i}")
+            if not isinstance(sub, dict):
+                sub = {}
+            inner = sub.get("response")
+            if isinstance(inner, str):
+                text, ctype = inner, "text/csv"
+            else:
+                text, ctype = json_dumps(inner), "application/json"
+            if sub.get("status") == "success":
+                status = 200
+            else:
+                code = inner.get("code") if isinstance(inner, dict) else None
+                status = code if isinstance(code, int) and code >= 400 else 502
+            out.append(_Response(status, text, ctype))
+        return out
+
+
+_batcher = Batcher(lambda api_key, items: TwelveDataClient(api_key)._send_batch(items))
@@ -0,0 +1,153 @@
+"""Smaller time-series answers: LTTB downsampling and a compact encoding.
+
+A 5000-row CSV costs the model tens of thousands of tokens, most of which say
+little more than a few hundred well-chosen rows would. Two opt-in options on
+``get_time_series`` and ``get_technical_indicator`` shrink the answer:
+
+``max_points`` keeps at most that many rows, picked with Largest-Triangle-
+Three-Buckets (Steinarsson, 2013) on the close (or the first column of an
+indicator). LTTB keeps the first and last row and, per bucket, the row that
+spans the largest triangle with its neighbours, so peaks, troughs and trend
+changes survive where plain striding would drop them. Rows are kept whole,
+so every returned bar is a real upstream bar. The x axis is the row number:
+bars are equidistant on a trading chart, whatever the calendar gaps.
+
+``compact`` writes the table oldest first with one shared datetime base and,
+per row, the number of steps since the previous row, and values at a fixed
+precision of SIG_DIGITS significant digits per column::
+
+    # compact: base=2024-01-02 step=86400s, t = steps since the previous row
+    t;open;high;low;close;volume
+    0;184.22;185.88;183.43;184.25;58414500
+    1;184.22;185.88;183.43;184.25;58414500
+    3;…
+
+Each reshaped answer ends with a one-line report of what it cost: rows and
+bytes before and after, and — when rows were dropped — the largest and RMS
+deviation of the linear interpolation between kept rows from the full series,
+as a percentage of the column's range.
+"""
+
+from __future__ import annotations
+
+import math
+from array import array
+from functools import reduce
+from typing import Optional
+
+from series import SEP, Bars, format_dt, parse_csv
+
+# Significant digits kept by the compact encoding (never more than the upstream sent).
+SIG_DIGITS = 6
+
+
+def lttb(ys: "array | list[float]", n: int) -> list[int]:
+    """Indices of the ``n`` rows LTTB keeps, ascending (x is the row number)."""
+    size = len(ys)
+    if n >= size or size <= 2:
+        return list(range(size))
+    if n < 3:
+        return [0, size - 1][:max(n, 1)]
+    every = (size - 2) / (n - 2)
+    keep = [0]
+    a = 0
+    for i in range(n - 2):
+        # Average of the next bucket: the third corner of the triangle.
+        lo, hi = int((i + 1) * every) + 1, min(int((i + 2) * every) + 1, size)
+        tail = [(j, ys[j]) for j in range(lo, hi) if ys[j] == ys[j]] or [(size - 1, ys[size - 1])]
+        avg_x = sum(j for j, _ in tail) / len(tail)
+        avg_y = sum(y for _, y in tail) / len(tail)
+
+        best, best_area = -1, -1.0
+        ya = ys[a]
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            y = ys[j]
+            if y != y:
+                continue
+            area = abs((a - avg_x) * (y - ya) - (a - j) * (avg_y - ya))
+            if area > best_area:
+                best, best_area = j, area
+        if best < 0:  # a bucket of gaps: keep its first row
+            best = int(i * every) + 1
+        keep.append(best)
+        a = best
+    keep.append(size - 1)
+    return keep
+
+
+def _take(bars: Bars, keep: list[int]) -> Bars:
+    out = bars.empty_like()
+    out.ts = array("q", (bars.ts[i] for i in keep))
+    out.values = {c: array("d", (bars.values[c][i] for i in keep)) for c in bars.columns}
+    return out
+
+
+def fidelity(ys: "array | list[float]", keep: list[int]) -> tuple[float, float]:
+    """(max, RMS) deviation of the kept-point interpolation, in % of the range."""
+    finite = [y for y in ys if y == y]
+    span = (max(finite) - min(finite)) if finite else 0.0
+    if span == 0 or len(keep) < 2:
+        return 0.0, 0.0
+    worst = total = 0.0
+    count = 0
+    for a, b in zip(keep, keep[1:]):
+        ya, yb = ys[a], ys[b]
+        for j in range(a, b):
+            y = ys[j]
+            if y != y or ya != ya or yb != yb:
+                continue
+            err = abs(y - (ya + (yb - ya) * (j - a) / (b - a)))
+            worst = max(worst, err)
+            total += err * err
+            count += 1
+    return 100 * worst / span, 100 * math.sqrt(total / count) / span if count else 0.0
+
+
+def _decimals(bars: Bars, col: str) -> int:
+    finite = [abs(v) for v in bars.values[col] if v == v]
+    top = max(finite, default=0.0)
+    digits = int(math.floor(math.log10(top))) + 1 if top > 0 else 1
+    return max(0, min(bars.decimals.get(col, 0), SIG_DIGITS - digits))
+
+
+def compact(bars: Bars) -> str:
+    """``bars`` oldest first: one datetime base, step deltas, fixed precision."""
+    if not len(bars):
+        return bars.to_csv()
+    deltas = [b - a for a, b in zip(bars.ts, bars.ts[1:])]
+    step = reduce(math.gcd, deltas, 0) or 1
+    fmt = [f"{{:.{_decimals(bars, c)}f}}" for c in bars.columns]
+    cols = [bars.values[c] for c in bars.columns]
+    lines = [
+        f"# compact: base={format_dt(bars.ts[0], bars.intraday)} step={step}s, t = steps since the previous row",
+        SEP.join(["t", *bars.columns]),
+    ]
+    prev = bars.ts[0]
+    for i, ts in enumerate(bars.ts):
+        cells = (f.format(c[i]) if c[i] == c[i] else "" for f, c in zip(fmt, cols))
+        lines.append(SEP.join([str((ts - prev) // step), *cells]))
+        prev = ts
+    return "\n".join(lines)
+
+
+def reshape(text: str, max_points: Optional[int] = None, compact_form: bool = False) -> Optional[str]:
+    """A time-series CSV answer downsampled and/or compacted, with its size report.
+
+    None when ``text`` is not a single datetime-first table (the caller then
+    returns it unchanged).
+    """
+    bars = parse_csv(text)
+    if bars is None or not bars.columns:
+        return None
+    column = "close" if "close" in bars.columns else bars.columns[0]
+    rows = len(bars)
+    note = []
+    if max_points and max_points < rows:
+        keep = lttb(bars.values[column], max_points)
+        worst, rms = fidelity(bars.values[column], keep)
+        bars = _take(bars, keep)
+        note.append(f"LTTB on {column}: {rows} → {len(bars)} rows, max deviation {worst:.2f}%"
+                    f" / RMS {rms:.2f}% of its range")
+    body = compact(bars) if compact_form else bars.to_csv()
+    note.append(f"{len(text.encode())} → {len(body.encode())} bytes")
+    return f"{body}\n\n({'; '.join(note)})"
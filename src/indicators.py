@@ -0,0 +1,514 @@
+"""Local technical-indicator engine (opt-in, needs NumPy).
+
+Each ``get_technical_indicator`` call is an upstream request that costs
+credits, even though the common indicators are cheap functions of OHLCV bars.
+With MCP_LOCAL_INDICATORS=1, SMA, EMA, RSI, MACD, BBANDS and ATR are computed
+here instead: the bars come from one plain ``time_series`` call (coalesced
+with identical in-flight calls, but neither cached nor kept in the bar store —
+the latest bars are never final) and the result is rendered as the same ``;``-separated CSV, newest first, with Twelve
+Data's column names::
+
+    sma / ema / rsi / atr   datetime;<name>
+    macd                    datetime;macd;macd_signal;macd_hist
+    bbands                  datetime;upper_band;middle_band;lower_band
+
+Definitions follow TA-Lib, which the upstream uses: EMAs are seeded with the
+SMA of their first window, RSI and ATR use Wilder smoothing, Bollinger bands
+the population standard deviation. Recursive indicators depend on the history
+before the first output row, so ``lookback`` fetches enough extra bars for
+them to converge to the upstream's values.
+
+Anything else — other indicators, parameters this engine does not know
+(``ma_type``, ``symbol_2``, …), multi-symbol requests — goes to the API
+unchanged, as does everything when NumPy is not installed.
+
+``indicator_table`` backs the ``get_indicators`` tool: several indicators of
+one series from a single bar fetch, joined into one table on datetime (specs
+the engine cannot compute are fetched upstream alongside and joined in).
+``complex_tables`` runs watchlist scans — many symbols / intervals — as one
+``complex_data`` call and splits the combined answer back per symbol.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from series import Bars, is_intraday, parse_csv, parse_dt
+
+ENABLED = os.environ.get("MCP_LOCAL_INDICATORS", "0") not in ("0", "false", "no") and np is not None
+
+MAX_BARS = 5000  # one upstream time_series call
+
+DECIMALS = 5  # the upstream renders indicator values with five decimals
+
+# Bars fetched ahead of the first output row per unit of period, for
+# indicators whose value depends on the whole history (EMA-style smoothing).
+_CONVERGENCE = 25
+
+# Identifier / series params passed through to time_series unchanged.
+SERIES_PARAMS = ("symbol", "figi", "isin", "cusip", "mic_code", "exchange", "country", "interval", "prepost")
+
+# Keys a get_indicators spec may not set: the call itself decides them.
+RESERVED = (*SERIES_PARAMS, "outputsize", "start_date", "end_date", "format", "name")
+
+
+class Unsupported(Exception):
+    """The engine cannot reproduce this call; it must go upstream."""
+
+
+def _int(params: dict, name: str, default: int) -> int:
+    value = params.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        out = int(float(value))
+    except (TypeError, ValueError):
+        raise Unsupported(f"{name}={value!r}")
+    if out < 1:
+        raise Unsupported(f"{name}={value!r}")
+    return out
+
+
+def _float(params: dict, name: str, default: float) -> float:
+    value = params.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise Unsupported(f"{name}={value!r}")
+
+
+def _series(bars: Bars, params: dict) -> "np.ndarray":
+    col = str(params.get("series_type") or "close").lower()
+    if col not in bars.values:
+        raise Unsupported(f"series_type={col!r}")
+    return np.asarray(bars.values[col], dtype=float)
+
+
+# -- kernels ------------------------------------------------------------------
+
+
+def _sma(x: "np.ndarray", n: int) -> "np.ndarray":
+    out = np.full(len(x), np.nan)
+    if len(x) >= n:
+        c = np.cumsum(np.insert(x, 0, 0.0))
+        out[n - 1:] = (c[n:] - c[:-n]) / n
+    return out
+
+
+def _ema(x: "np.ndarray", n: int, start: int = 0) -> "np.ndarray":
+    """EMA seeded with the SMA of x[start:start+n] (TA-Lib's classic seed)."""
+    out = np.full(len(x), np.nan)
+    first = start + n - 1
+    if len(x) <= first:
+        return out
+    k = 2.0 / (n + 1)
+    prev = float(np.mean(x[start:first + 1]))
+    out[first] = prev
+    for i in range(first + 1, len(x)):
+        prev += k * (x[i] - prev)
+        out[i] = prev
+    return out
+
+
+def _wilder(x: "np.ndarray", n: int, start: int) -> "np.ndarray":
+    """Wilder smoothing seeded with the mean of x[start:start+n]."""
+    out = np.full(len(x), np.nan)
+    first = start + n - 1
+    if len(x) <= first:
+        return out
+    prev = float(np.mean(x[start:first + 1]))
+    out[first] = prev
+    for i in range(first + 1, len(x)):
+        prev = (prev * (n - 1) + x[i]) / n
+        out[i] = prev
+    return out
+
+
+def _rsi(x: "np.ndarray", n: int) -> "np.ndarray":
+    delta = np.diff(x, prepend=np.nan)
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    avg_gain = _wilder(gain, n, 1)
+    avg_loss = _wilder(loss, n, 1)
+    total = avg_gain + avg_loss
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 * avg_gain / total
+    rsi[total == 0] = 0.0  # flat series: TA-Lib reports 0
+    return rsi
+
+
+def _true_range(bars: Bars) -> "np.ndarray":
+    high = np.asarray(bars.values["high"], dtype=float)
+    low = np.asarray(bars.values["low"], dtype=float)
+    prev_close = np.roll(np.asarray(bars.values["close"], dtype=float), 1)
+    tr = np.maximum(high - low, np.maximum(np.abs(high - prev_close), np.abs(low - prev_close)))
+    tr[0] = np.nan  # TA-Lib starts the true range at the second bar
+    return tr
+
+
+# -- indicators ---------------------------------------------------------------
+# name → (output columns, accepted params, lookback(params), compute(bars, params))
+
+
+def _sma_ind(bars: Bars, p: dict) -> list:
+    return [_sma(_series(bars, p), _int(p, "time_period", 9))]
+
+
+def _ema_ind(bars: Bars, p: dict) -> list:
+    return [_ema(_series(bars, p), _int(p, "time_period", 9))]
+
+
+def _rsi_ind(bars: Bars, p: dict) -> list:
+    return [_rsi(_series(bars, p), _int(p, "time_period", 14))]
+
+
+def _macd_ind(bars: Bars, p: dict) -> list:
+    x = _series(bars, p)
+    fast, slow = _int(p, "fast_period", 12), _int(p, "slow_period", 26)
+    signal = _int(p, "signal_period", 9)
+    if fast >= slow:
+        fast, slow = slow, fast  # TA-Lib swaps them as well
+    # Both EMAs start producing on the same bar, as in TA-Lib.
+    macd = _ema(x, fast, slow - fast) - _ema(x, slow)
+    sig = np.full(len(x), np.nan)
+    if len(x) >= slow:
+        sig[slow - 1:] = _ema(macd[slow - 1:], signal)
+    return [macd, sig, macd - sig]
+
+
+def _bbands_ind(bars: Bars, p: dict) -> list:
+    if str(p.get("ma_type") or "SMA").upper() != "SMA":
+        raise Unsupported("ma_type")
+    x = _series(bars, p)
+    n = _int(p, "time_period", 20)
+    sd = _float(p, "sd", 2.0)
+    up, dn = _float(p, "nbdevup", sd), _float(p, "nbdevdn", sd)
+    mid = _sma(x, n)
+    std = np.full(len(x), np.nan)
+    if len(x) >= n:
+        std[n - 1:] = np.lib.stride_tricks.sliding_window_view(x, n).std(axis=1)
+    return [mid + up * std, mid, mid - dn * std]
+
+
+def _atr_ind(bars: Bars, p: dict) -> list:
+    return [_wilder(_true_range(bars), _int(p, "time_period", 14), 1)]
+
+
+def _recursive(period: str, default: int) -> Callable[[dict], int]:
+    return lambda p: _int(p, period, default) * _CONVERGENCE
+
+
+INDICATORS: dict[str, tuple[tuple[str, ...], frozenset, Callable[[dict], int], Callable[[Bars, dict], list]]] = {
+    "sma": (("sma",), frozenset({"time_period", "series_type"}),
+            lambda p: _int(p, "time_period", 9), _sma_ind),
+    "ema": (("ema",), frozenset({"time_period", "series_type"}),
+            _recursive("time_period", 9), _ema_ind),
+    "rsi": (("rsi",), frozenset({"time_period", "series_type"}),
+            _recursive("time_period", 14), _rsi_ind),
+    "macd": (("macd", "macd_signal", "macd_hist"),
+             frozenset({"fast_period", "slow_period", "signal_period", "series_type"}),
+             lambda p: (_int(p, "slow_period", 26) + _int(p, "signal_period", 9)) * _CONVERGENCE, _macd_ind),
+    "bbands": (("upper_band", "middle_band", "lower_band"),
+               frozenset({"time_period", "series_type", "sd", "nbdevup", "nbdevdn", "ma_type"}),
+               lambda p: _int(p, "time_period", 20), _bbands_ind),
+    "atr": (("atr",), frozenset({"time_period"}),
+            _recursive("time_period", 14), _atr_ind),
+}
+
+
+def supports(name: str, params: dict[str, Any]) -> bool:
+    """Can ``name`` with these (non-series) params be computed locally?"""
+    spec = INDICATORS.get(name.lower())
+    if spec is None or np is None:
+        return False
+    extra = {k for k, v in params.items() if v is not None and v != "" and v is not False}
+    return extra <= spec[1]
+
+
+def lookback(name: str, params: dict) -> int:
+    """Bars needed before the first output row."""
+    return INDICATORS[name.lower()][2](params)
+
+
+def columns(name: str) -> tuple[str, ...]:
+    return INDICATORS[name.lower()][0]
+
+
+def compute(name: str, bars: Bars, params: dict) -> list["np.ndarray"]:
+    """Output columns of one indicator, aligned with ``bars`` (NaN during warm-up)."""
+    return INDICATORS[name.lower()][3](bars, params)
+
+
+def table(bars: Bars, named: list[tuple[str, "np.ndarray"]], outputsize: int) -> Bars:
+    """Indicator columns as Bars: rows where every column is defined, last ``outputsize``."""
+    out = Bars([name for name, _ in named], bars.intraday)
+    for name, _ in named:
+        out.decimals[name] = DECIMALS
+    stacked = np.column_stack([col for _, col in named]) if named else np.empty((len(bars), 0))
+    ok = ~np.isnan(stacked).any(axis=1)
+    for i in np.nonzero(ok)[0][-outputsize:] if outputsize > 0 else np.nonzero(ok)[0]:
+        out.append(bars.ts[i], [float(v) for v in stacked[i]])
+    return out
+
+
+async def fetch_bars(client, series: dict, count: int) -> "Bars | dict":
+    """The last ``count`` bars of a series (capped at one upstream call)."""
+    data = await client.get("time_series", **{**series, "outputsize": min(count, MAX_BARS)})
+    if isinstance(data, dict):
+        return data
+    bars = parse_csv(data)
+    if bars is None or not {"open", "high", "low", "close"} <= set(bars.columns):
+        return {"status": "error", "message": "Unexpected time_series response format"}
+    return bars
+
+
+async def technical_indicator(client, name: str, params: dict) -> "dict | str":
+    """Answer one get_technical_indicator call locally (raises Unsupported)."""
+    series = {k: params[k] for k in SERIES_PARAMS if params.get(k) not in (None, False)}
+    rest = {k: v for k, v in params.items() if k not in SERIES_PARAMS and k != "outputsize"}
+    if not supports(name, rest) or "," in str(params.get("symbol") or ""):
+        raise Unsupported(name)
+    outputsize = int(params.get("outputsize") or 30)
+    bars = await fetch_bars(client, series, outputsize + lookback(name, rest))
+    if isinstance(bars, dict):
+        return bars
+    cols = compute(name, bars, rest)
+    return table(bars, list(zip(columns(name), cols)), outputsize).to_csv()
+
+
+@dataclass
+class Spec:
+    name: str
+    params: dict = field(default_factory=dict)
+    suffix: str = ""  # set when several specs share a name
+
+
+def parse_specs(text: str) -> list[Spec]:
+    """``'rsi, macd, sma:50, sma:200'`` or a JSON list of ``{"indicator": ..., <params>}``.
+
+    ``name:N`` sets time_period. Raises ValueError on malformed input, and on
+    JSON specs setting a key the call decides for all of them (``RESERVED``).
+    """
+    text = text.strip()
+    specs: list[Spec] = []
+    if text.startswith("["):
+        for item in json.loads(text):
+            if not isinstance(item, dict) or not item.get("indicator"):
+                raise ValueError("each JSON spec needs an \"indicator\" key")
+            params = {k: v for k, v in item.items() if k != "indicator"}
+            clash = sorted(k for k in params if k.lower() in RESERVED)
+            if clash:
+                raise ValueError(
+                    f"{item['indicator']}: {', '.join(clash)} cannot be set per indicator — "
+                    "pass symbol/interval/outputsize to the tool itself"
+                )
+            specs.append(Spec(str(item["indicator"]).strip().lower(), params))
+    else:
+        for part in text.replace(";", ",").split(","):
+            if not part.strip():
+                continue
+            name, _, period = part.strip().partition(":")
+            params = {"time_period": int(period)} if period.strip() else {}
+            specs.append(Spec(name.strip().lower(), params))
+    if not specs:
+        raise ValueError("no indicators given")
+    names = [s.name for s in specs]
+    for spec in specs:
+        if names.count(spec.name) > 1:
+            spec.suffix = "_".join(str(v) for v in spec.params.values()) or "default"
+    return specs
+
+
+def _label(spec: Spec, column: str) -> str:
+    return f"{column}_{spec.suffix}" if spec.suffix else column
+
+
+class _Table:
+    """Columns joined on datetime while specs are added one by one."""
+
+    def __init__(self, intraday: bool = False) -> None:
+        self.labels: list[str] = []
+        self.rows: dict[int, dict[str, float]] = {}
+        self.intraday = intraday
+        self.notes: list[str] = []
+
+    def add(self, label: str, ts: int, value: float) -> None:
+        if label not in self.labels:
+            self.labels.append(label)
+        self.rows.setdefault(ts, {})[label] = value
+
+    def add_csv(self, spec: Spec, data: "dict | str") -> None:
+        """One upstream indicator answer (CSV, or an error dict)."""
+        if isinstance(data, dict):
+            self.notes.append(f"{spec.name}: {data.get('message', 'request failed')}")
+            return
+        part = parse_csv(data)
+        if part is None:
+            self.notes.append(f"{spec.name}: unexpected response format")
+            return
+        self.intraday = self.intraday or part.intraday
+        for col in part.columns:
+            for i, ts in enumerate(part.ts):
+                self.add(_label(spec, col), ts, part.values[col][i])
+
+    def add_complex(self, spec: Spec, entry: dict) -> None:
+        """One ``complex_data`` entry: ``{"meta": …, "values": [{"datetime": …, …}], "status": …}``."""
+        if entry.get("status") == "error" or not isinstance(entry.get("values"), list):
+            self.notes.append(f"{spec.name}: {entry.get('message', 'no values returned')}")
+            return
+        for row in entry["values"]:
+            try:
+                ts = parse_dt(str(row.get("datetime", "")))
+            except ValueError:
+                continue
+            for col, value in row.items():
+                if col == "datetime":
+                    continue
+                try:
+                    self.add(_label(spec, col), ts, float(value))
+                except (TypeError, ValueError):
+                    self.add(_label(spec, col), ts, float("nan"))
+
+    def result(self, outputsize: int) -> "Bars | dict":
+        if not self.labels:
+            return {"status": "error", "message": "; ".join(self.notes) or "no indicator could be computed"}
+        out = Bars(list(self.labels), self.intraday)
+        for label in self.labels:
+            out.decimals[label] = DECIMALS
+        for ts in sorted(self.rows)[-outputsize:]:
+            out.append(ts, [self.rows[ts].get(label, float("nan")) for label in self.labels])
+        return out
+
+
+def _method(spec: Spec) -> "str | dict":
+    return {"name": spec.name, **spec.params} if spec.params else spec.name
+
+
+def _same(a: Any, b: Any) -> bool:
+    try:
+        return float(a) == float(b)
+    except (TypeError, ValueError):
+        return str(a).strip().lower() == str(b).strip().lower()
+
+
+def _describes(indicator: Any, spec: Spec) -> bool:
+    """Whether a complex_data ``meta.indicator`` (``{"name": "SMA - Simple …", "time_period": 9, …}``) is ``spec``."""
+    if not isinstance(indicator, dict):
+        return False
+    name = str(indicator.get("name", "")).split(" - ")[0].strip().lower()
+    return name == spec.name and all(_same(indicator.get(k, v), v) for k, v in spec.params.items())
+
+
+def _match(entries: list, symbol: str, interval: str, specs: list[Spec]) -> list[Optional[dict]]:
+    """Each spec's complex_data entry for symbol × interval, found by its meta; None when absent.
+
+    The upstream's order is not relied on: entries are told apart by symbol,
+    interval and indicator (name and parameters) only.
+    """
+    candidates = [
+        e for e in entries
+        if isinstance(e, dict) and isinstance(e.get("meta"), dict)
+        and str(e["meta"].get("symbol", "")).upper() == symbol.upper()
+        and str(e["meta"].get("interval", "")) == interval
+    ]
+    out: list[Optional[dict]] = []
+    for spec in specs:
+        entry = next((e for e in candidates if _describes(e["meta"].get("indicator"), spec)), None)
+        if entry is not None:
+            candidates.remove(entry)
+        out.append(entry)
+    return out
+
+
+async def indicator_table(client, series: dict, specs: list[Spec], outputsize: int) -> tuple["Bars | dict", list[str]]:
+    """One table of every spec's columns over the last ``outputsize`` bars.
+
+    Locally computable specs share one bar fetch; the rest go upstream — as
+    one complex_data call when there are several of them. Returns (table or
+    error dict, notes about specs that could not be added).
+    """
+    local = [s for s in specs if supports(s.name, s.params)]
+    remote = [s for s in specs if s not in local]
+    need = outputsize + max((lookback(s.name, s.params) for s in local), default=0)
+
+    async def upstream() -> "list | dict":
+        if len(remote) == 1:
+            return [await client.get(remote[0].name, **{**remote[0].params, **series, "outputsize": outputsize})]
+        ident = {k: v for k, v in series.items() if k not in ("symbol", "interval")}
+        return await client.complex_data(
+            [series["symbol"]], [series["interval"]], [_method(s) for s in remote],
+            outputsize=outputsize, **ident,
+        )
+
+    bars, answers = await asyncio.gather(
+        fetch_bars(client, series, need) if local else asyncio.sleep(0),
+        upstream() if remote else asyncio.sleep(0),
+    )
+    if local and isinstance(bars, dict):
+        return bars, []
+
+    table = _Table(is_intraday(series.get("interval", "")))
+    if local:
+        table.intraday = bars.intraday
+        first = max(0, len(bars) - outputsize)
+        for spec in local:
+            try:
+                arrays = compute(spec.name, bars, spec.params)
+            except Unsupported as exc:
+                table.notes.append(f"{spec.name}: unsupported parameter {exc}")
+                continue
+            for col, arr in zip(columns(spec.name), arrays):
+                for i in range(first, len(bars)):
+                    table.add(_label(spec, col), bars.ts[i], float(arr[i]))
+    if isinstance(answers, list):
+        for spec, data in zip(remote, answers):
+            table.add_csv(spec, data)
+    elif isinstance(answers, dict):
+        entries = answers.get("data")
+        if isinstance(entries, list):
+            for spec, entry in zip(remote, _match(entries, series["symbol"], series["interval"], remote)):
+                table.add_complex(spec, entry if entry is not None else {"message": "missing from the response"})
+        else:
+            table.notes.extend(f"{s.name}: {answers.get('message', 'request failed')}" for s in remote)
+    return table.result(outputsize), table.notes
+
+
+async def complex_tables(
+    client, symbols: list[str], intervals: list[str], specs: list[Spec], outputsize: int, **params: Any,
+) -> "list[tuple[str, str, Bars | dict, list[str]]] | dict":
+    """A watchlist scan as one complex_data call, split back per symbol × interval.
+
+    Returns [(symbol, interval, table or error dict, notes), …] or an error dict
+    when the whole call failed.
+    """
+    data = await client.complex_data(symbols, intervals, [_method(s) for s in specs], outputsize=outputsize, **params)
+    entries = data.get("data")
+    if not isinstance(entries, list):
+        return data if data.get("status") == "error" else {
+            "status": "error", "message": "Unexpected complex_data response format"}
+
+    groups: dict[tuple[str, str], list[dict]] = {}
+    for entry in entries:
+        meta = entry.get("meta") if isinstance(entry, dict) else None
+        if isinstance(meta, dict):
+            groups.setdefault((str(meta.get("symbol", "")).upper(), str(meta.get("interval", ""))), []).append(entry)
+
+    out = []
+    for sym in symbols:
+        for iv in intervals:
+            table = _Table(is_intraday(iv))
+            for spec, entry in zip(specs, _match(groups.get((sym.upper(), iv), []), sym, iv, specs)):
+                table.add_complex(spec, entry if entry is not None else {"message": "missing from the response"})
+            out.append((sym, iv, table.result(outputsize), table.notes))
+    return out
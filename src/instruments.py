@@ -0,0 +1,185 @@
+"""Canonical instrument keys for caching and single-flight coalescing.
+
+Every market and fundamentals tool takes ``symbol``, ``figi``, ``isin`` or
+``cusip``, optionally narrowed by ``exchange`` / ``mic_code`` / ``country``.
+Keyed verbatim, ``aapl``, ``AAPL``, ``AAPL`` on ``NASDAQ``, its ISIN and its
+FIGI are five cache entries and five upstream calls for one listing.
+``canonical`` folds them into one key before the response cache, the Redis
+tier, the in-flight table and the bar store see it:
+
+    identifiers     stripped and upper-cased (each element of a comma list)
+    figi/isin/cusip → symbol + mic_code, when the catalog maps it to one listing
+    symbol+exchange → symbol + mic_code, when the exchange has one listing of it
+    mic_code set    → exchange and country dropped (the MIC already pins both)
+
+Only the *key* changes — the upstream still receives the parameters the tool
+was called with, so entitlements and error messages are unaffected.
+
+Keys must not change once data is stored under them (the bar store keys its
+directories this way), so the mappings live in their own table, kept on disk
+at MCP_INSTRUMENTS_TABLE and read on first use. It is filled from the
+instrument lists the catalog (catalog.py) loads — four list calls and tens of
+megabytes, so they are never loaded on behalf of an arbitrary tool call:
+``search_symbol`` loads them as it always did, and with
+MCP_INSTRUMENTS_PRELOAD=1 the server loads them at startup on its own
+TWELVE_DATA_API_KEY while the table is empty. Every new catalog snapshot
+adds its mappings. Entries are never rewritten, so a key,
+once resolved, stays the same across refreshes and restarts. Until the table
+holds anything, ``ready`` is False and identifiers are only normalised —
+callers that persist data by key (bars.py) skip calls that would resolve
+differently later.
+
+  MCP_INSTRUMENTS_TABLE     mapping table file (default ~/.twelvedata_mcp/instruments.json)
+  MCP_INSTRUMENTS_PRELOAD=1 fill an empty table at startup with TWELVE_DATA_API_KEY
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from auth import CONFIG_DIR
+
+log = logging.getLogger("instruments")
+
+TABLE   = Path(os.environ.get("MCP_INSTRUMENTS_TABLE", "") or CONFIG_DIR / "instruments.json")
+PRELOAD = os.environ.get("MCP_INSTRUMENTS_PRELOAD", "0") not in ("0", "false", "no")
+
+IDENTIFIERS = ("figi", "isin", "cusip")
+
+_UPPER = ("symbol", "figi", "isin", "cusip", "mic_code")
+
+
+def _upper(value: str) -> str:
+    if "," in value:
+        return ",".join(v.strip().upper() for v in value.split(","))
+    return value.strip().upper()
+
+
+class Resolver:
+    """Identifier → listing table, persisted, grown from each catalog snapshot."""
+
+    def __init__(self, path: Path = TABLE) -> None:
+        self.path = path
+        self._snapshot = None
+        self._read_done = False
+        self._ids: dict[str, tuple[str, str]] = {}
+        self._listings: dict[tuple[str, str], Optional[str]] = {}
+        self.resolved = 0
+
+    def _read(self) -> None:
+        if self._read_done:
+            return
+        self._read_done = True
+        try:
+            table = json.loads(self.path.read_text())
+            self._ids = {k: (v[0], v[1]) for k, v in table.get("ids", {}).items()}
+            self._listings = {(sym, exch): mic for sym, exch, mic in table.get("listings", [])}
+        except (OSError, ValueError, TypeError, IndexError) as exc:
+            if self.path.exists():
+                log.warning("instruments: ignoring unreadable %s (%s)", self.path, exc)
+
+    def _write(self) -> None:
+        table = {
+            "ids": {k: list(v) for k, v in self._ids.items()},
+            "listings": [[sym, exch, mic] for (sym, exch), mic in self._listings.items()],
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(table))
+            os.replace(tmp, self.path)
+        except OSError as exc:  # pragma: no cover - depends on environment
+            log.warning("instruments: writing %s failed (%s)", self.path, exc)
+
+    @property
+    def ready(self) -> bool:
+        """Whether keys resolve as they will from now on (the table is filled, or never will be)."""
+        from catalog import ENABLED  # catalog imports client, which imports this module
+
+        self._sync()
+        return bool(self._ids or self._listings) or not ENABLED
+
+    def ensure(self, client) -> None:
+        """Start loading the instrument lists with ``client`` while the table is empty."""
+        from catalog import catalog
+
+        if not self.ready:
+            catalog.current(client)
+
+    def _sync(self) -> None:
+        from catalog import catalog
+
+        self._read()
+        snapshot = catalog.catalog
+        if snapshot is None or snapshot is self._snapshot:
+            return
+        ids: dict[str, tuple[str, str]] = {}
+        for ident, rows in snapshot.ids.items():
+            listings = {(snapshot.rows[n][0].upper(), snapshot.rows[n][3]) for n in rows}
+            if len(listings) == 1:
+                symbol, mic = next(iter(listings))
+                if mic:
+                    ids[ident] = (symbol, mic)
+        listings: dict[tuple[str, str], Optional[str]] = {}
+        for row in snapshot.rows:
+            if row[2] and row[3]:
+                key = (row[0].upper(), row[2].upper())
+                # Two MICs for one symbol on one exchange name: ambiguous, keep as is.
+                listings[key] = row[3] if listings.get(key, row[3]) == row[3] else None
+        # Existing entries win: a key must not change under stored data.
+        added = 0
+        for ident, listing in ids.items():
+            if ident not in self._ids:
+                self._ids[ident] = listing
+                added += 1
+        for key, mic in listings.items():
+            if key not in self._listings:
+                self._listings[key] = mic
+                added += 1
+        self._snapshot = snapshot
+        if added:
+            self._write()
+            log.info("instruments: %d mapping(s) added", added)
+
+    def canonical(self, params: dict[str, str]) -> dict[str, str]:
+        """``params`` with the instrument spelled one way (see the module docstring)."""
+        if not any(k in params for k in ("symbol", *IDENTIFIERS)):
+            return params
+        out = {k: (_upper(v) if k in _UPPER else v) for k, v in params.items()}
+        self._sync()
+
+        if not out.get("symbol"):
+            for ident in IDENTIFIERS:
+                listing = self._ids.get(out.get(ident, ""))
+                if listing is not None:
+                    out["symbol"], out["mic_code"] = listing
+                    for k in IDENTIFIERS:
+                        out.pop(k, None)
+                    self.resolved += 1
+                    break
+        symbol = out.get("symbol", "")
+        if symbol and "," not in symbol and out.get("exchange") and not out.get("mic_code"):
+            mic = self._listings.get((symbol, out["exchange"].strip().upper()))
+            if mic:
+                out["mic_code"] = mic
+                self.resolved += 1
+        if out.get("mic_code") and "," not in out["mic_code"]:
+            out.pop("exchange", None)
+            out.pop("country", None)
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "ready": bool(self._ids or self._listings),
+            "identifiers": len(self._ids),
+            "listings": len(self._listings),
+            "resolved": self.resolved,
+        }
+
+
+resolver = Resolver()
+canonical = resolver.canonical
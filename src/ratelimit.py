@@ -0,0 +1,198 @@
+"""Per-API-key credit scheduler for upstream Twelve Data calls.
+
+Twelve Data meters each key in *credits per minute*, and endpoints cost very
+different amounts (a quote is 1 credit per symbol, ``statistics`` 50, an
+institutional-holders lookup 1500). Instead of letting a burst from one agent
+run into a wall of 429s, every upstream call first takes its credit cost from
+a token bucket owned by its api_token:
+
+- the bucket refills continuously at ``capacity / 60`` credits per second;
+- callers queue FIFO behind the bucket lock and sleep until their cost fits,
+  up to ``MCP_RATE_MAX_WAIT`` seconds — past that they get a clean 429-style
+  error instead of sitting in the queue indefinitely;
+- capacity starts at ``MCP_RATE_CREDITS_PER_MIN`` (the free plan's 8) and is
+  corrected from the ``api-credits-used`` / ``api-credits-left`` headers on the
+  first response, so paid plans run at their real rate after one call.
+
+The cost table is approximate; the response headers keep the bucket honest.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Mapping, Optional
+
+ENABLED          = os.environ.get("MCP_RATE_LIMIT", "1") not in ("0", "false", "no")
+DEFAULT_CAPACITY = int(os.environ.get("MCP_RATE_CREDITS_PER_MIN", "8"))
+MAX_WAIT         = float(os.environ.get("MCP_RATE_MAX_WAIT", "30"))
+
+# Credits per symbol. Anything not listed (quotes, series, indicators,
+# reference lists) costs 1.
+_COST = {
+    "statistics":               50,
+    "profile":                  10,
+    "key_executives":           1000,
+    "income_statement":         100,
+    "balance_sheet":            100,
+    "cash_flow":                100,
+    "earnings":                 20,
+    "earnings_calendar":        40,
+    "dividends":                20,
+    "dividends_calendar":       40,
+    "splits":                   20,
+    "splits_calendar":          40,
+    "ipo_calendar":             40,
+    "market_cap":               5,
+    "price_target":             75,
+    "recommendations":          100,
+    "earnings_estimate":        20,
+    "revenue_estimate":         20,
+    "eps_trend":                20,
+    "eps_revisions":            20,
+    "growth_estimates":         20,
+    "exchange_schedule":        100,
+    "cross_listings":           40,
+    "insider_transactions":     200,
+    "institutional_holders":    1500,
+    "fund_holders":             1500,
+}
+_PREFIX_COST = (
+    ("analyst_ratings/",    75),
+    ("market_movers/",      100),
+    ("etfs/world",          200),
+    ("mutual_funds/world",  200),
+    ("edgar_fillings/",     50),
+)
+
+
+def credit_cost(endpoint: str, params: Mapping[str, str]) -> int:
+    """Approximate credit cost of one call (per-symbol cost × symbol count)."""
+    base = _COST.get(endpoint)
+    if base is None:
+        base = next((c for p, c in _PREFIX_COST if endpoint.startswith(p)), 1)
+    symbols = params.get("symbol", "")
+    return base * max(1, symbols.count(",") + 1)
+
+
+class RateLimitExceeded(Exception):
+    """The call would have to queue longer than the allowed deadline."""
+
+    def __init__(self, wait: float) -> None:
+        super().__init__(f"would wait {wait:.0f}s for API credits")
+        self.wait = wait
+
+
+class CreditBucket:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.capacity = float(max(1, capacity))
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()  # FIFO: waiters are served in arrival order
+        # metrics
+        self.queued = 0
+        self.served = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    async def acquire(self, cost: int, max_wait: float = MAX_WAIT) -> float:
+        """Take ``cost`` credits, sleeping until they are available.
+
+        Returns the seconds spent waiting; raises RateLimitExceeded when the
+        wait (including everyone queued ahead) would exceed ``max_wait``.
+        """
+        start = time.monotonic()
+        self.queued += 1
+        try:
+            async with self._lock:
+                # A single call dearer than a whole minute waits for a full bucket.
+                need = min(float(cost), self.capacity)
+                self._refill()
+                if self.tokens < need:
+                    wait = (need - self.tokens) * 60 / self.capacity
+                    if time.monotonic() - start + wait > max_wait:
+                        self.rejected += 1
+                        raise RateLimitExceeded(time.monotonic() - start + wait)
+                    await asyncio.sleep(wait)
+                    self._refill()
+                self.tokens -= need
+        finally:
+            self.queued -= 1
+        waited = time.monotonic() - start
+        self.served += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        return waited
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Reconcile with Twelve Data's own accounting from response headers."""
+        try:
+            used = int(headers["api-credits-used"])
+            left = int(headers["api-credits-left"])
+        except (KeyError, ValueError):
+            return
+        if used + left > 0:
+            self.capacity = float(used + left)
+        self._refill()
+        self.tokens = min(self.tokens, float(left))
+
+    def stats(self) -> dict:
+        return {
+            "capacity_per_min": self.capacity,
+            "tokens": round(self.tokens, 2),
+            "queue_depth": self.queued,
+            "served": self.served,
+            "rejected": self.rejected,
+            "wait_avg": round(self.wait_total / self.served, 3) if self.served else 0.0,
+            "wait_max": round(self.wait_max, 3),
+        }
+
+
+class CreditScheduler:
+    """One CreditBucket per api_token (keyed by fingerprint, never the raw key)."""
+
+    def __init__(self) -> None:
+        self._buckets: dict[str, CreditBucket] = {}
+
+    def bucket(self, key_id: str) -> CreditBucket:
+        b = self._buckets.get(key_id)
+        if b is None:
+            b = self._buckets[key_id] = CreditBucket()
+        return b
+
+    async def acquire(
+        self, key_id: str, endpoint: str, params: Mapping[str, str], cost: Optional[int] = None,
+    ) -> float:
+        """Wait for the call's credits; ``cost`` overrides the table (composite calls)."""
+        if not ENABLED:
+            return 0.0
+        return await self.bucket(key_id).acquire(credit_cost(endpoint, params) if cost is None else cost)
+
+    def parallelism(self, key_id: str, cost: int, cap: int) -> int:
+        """How many calls of ``cost`` credits are worth starting at once (1..cap)."""
+        if not ENABLED:
+            return cap
+        b = self.bucket(key_id)
+        b._refill()
+        return max(1, min(cap, int(b.tokens // max(1, cost))))
+
+    def observe(self, key_id: str, headers: Mapping[str, str]) -> None:
+        b: Optional[CreditBucket] = self._buckets.get(key_id)
+        if b is not None:
+            b.observe(headers)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ENABLED,
+            "keys": {kid[:8]: b.stats() for kid, b in self._buckets.items()},
+        }
+
+
+scheduler = CreditScheduler()
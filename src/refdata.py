@@ -0,0 +1,161 @@
+"""Reference lists held in memory and filtered locally.
+
+``countries``, ``exchanges``, ``cryptocurrency_exchanges``, ``instrument_type``,
+``etfs/type`` and ``mutual_funds/type`` change a few times a year, yet each
+filter combination of ``get_reference_data`` was its own upstream call (and
+cache entry). Here every list is fetched once, unfiltered, as CSV, and indexed
+per column (lower-cased value → row numbers); the tool's filters are then
+answered from the index and rendered as the same CSV the upstream would send.
+
+    exchanges          name (exchange), code (mic_code), country; one list per type
+    etfs/type          country, fund_type
+    mutual_funds/type  country, fund_type
+
+``country`` accepts ISO codes as the upstream does: 'US' and 'USA' are
+translated to the country's name through the ``countries`` list.
+
+Lists load on first use — concurrent first uses share one fetch — and reload
+in the background once older than MCP_REFDATA_REFRESH, serving the old copy
+meanwhile. The lists are the same for every key, so they are process-wide. A
+list that fails to load, or a filter on a column a list does not have, goes
+to the upstream as before.
+
+  MCP_REFDATA=0            disable (get_reference_data always goes upstream)
+  MCP_REFDATA_REFRESH      list lifetime in seconds (default 86400)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from client import _spawn
+from series import SEP
+
+log = logging.getLogger("refdata")
+
+ENABLED = os.environ.get("MCP_REFDATA", "1") not in ("0", "false", "no")
+REFRESH = float(os.environ.get("MCP_REFDATA_REFRESH", "86400"))
+
+# Wait this long after a failed load before trying again.
+RETRY_AFTER = 300.0
+
+# Filter name → the columns that may hold it, first match wins.
+_COLUMNS = {
+    "name":      ("name",),
+    "code":      ("code", "mic_code"),
+    "country":   ("country",),
+    "fund_type": ("fund_type", "type"),
+}
+
+
+class Table:
+    """One reference list: its CSV lines and a per-column value index."""
+
+    def __init__(self, text: str) -> None:
+        lines = [ln for ln in text.splitlines() if ln.strip()]
+        self.header = lines[0] if lines else ""
+        self.columns = [c.strip().lower() for c in self.header.split(SEP)]
+        self.lines = lines[1:]
+        self.index: dict[str, dict[str, list[int]]] = {c: {} for c in self.columns}
+        for n, line in enumerate(self.lines):
+            for col, cell in zip(self.columns, line.split(SEP)):
+                self.index[col].setdefault(cell.strip().lower(), []).append(n)
+        self.loaded_at = time.monotonic()
+
+    def column(self, name: str) -> Optional[str]:
+        return next((c for c in _COLUMNS.get(name, (name,)) if c in self.index), None)
+
+    def select(self, filters: dict[str, str]) -> Optional[str]:
+        """Rows matching every filter (case-insensitive), as CSV; None if a filter has no column."""
+        rows: Optional[set[int]] = None
+        for name, value in filters.items():
+            col = self.column(name)
+            if col is None:
+                return None
+            hits = set(self.index[col].get(value.strip().lower(), ()))
+            rows = hits if rows is None else rows & hits
+        keep = range(len(self.lines)) if rows is None else sorted(rows)
+        return "\n".join([self.header, *(self.lines[n] for n in keep)])
+
+
+class RefData:
+    """The loaded lists, keyed by (endpoint, type) — exchanges come per asset type."""
+
+    def __init__(self) -> None:
+        self._tables: dict[tuple[str, str], Table] = {}
+        self._loads: dict[tuple[str, str], asyncio.Task] = {}
+        self._failed_at: dict[tuple[str, str], float] = {}
+        self.local = 0
+        self.upstream = 0
+
+    async def _fetch(self, client, key: tuple[str, str]) -> Optional[Table]:
+        endpoint, kind = key
+        data = await client.get(endpoint, type=kind or None)
+        if isinstance(data, dict) or not data.strip():
+            self._failed_at[key] = time.monotonic()
+            log.warning("refdata: loading %s failed (%s)", endpoint,
+                        data.get("message") if isinstance(data, dict) else "empty response")
+            return None
+        table = self._tables[key] = Table(data)
+        log.info("refdata: %s%s loaded (%d rows)", endpoint, f" [{kind}]" if kind else "", len(table.lines))
+        return table
+
+    async def table(self, client, endpoint: str, kind: str = "") -> Optional[Table]:
+        """The list, loading it on first use; refreshes in the background when old."""
+        key = (endpoint, kind.strip().lower())
+        if time.monotonic() - self._failed_at.get(key, -RETRY_AFTER) < RETRY_AFTER:
+            return self._tables.get(key)
+        table = self._tables.get(key)
+        task = self._loads.get(key)
+        idle = task is None or task.done()
+        if table is not None:
+            if idle and time.monotonic() - table.loaded_at > REFRESH:
+                self._loads[key] = _spawn(self._fetch(client, key))
+            return table
+        if idle:
+            task = self._loads[key] = _spawn(self._fetch(client, key))
+        return await asyncio.shield(task)
+
+    async def country_name(self, client, value: str) -> str:
+        """An ISO-2/ISO-3 code → the country name the lists use."""
+        code = value.strip().upper()
+        if len(code) not in (2, 3) or not code.isalpha():
+            return value
+        countries = await self.table(client, "countries")
+        if countries is None:
+            return value
+        for col in ("iso2", "iso3"):
+            rows = countries.index.get(col, {}).get(code.lower())
+            if rows and "name" in countries.columns:
+                return countries.lines[rows[0]].split(SEP)[countries.columns.index("name")]
+        return value
+
+    async def lookup(self, client, endpoint: str, kind: Optional[str] = None, **filters: Optional[str]) -> Optional[str]:
+        """The filtered list as CSV, or None when the upstream must answer."""
+        if not ENABLED or not client.api_key:
+            return None
+        table = await self.table(client, endpoint, kind or "")
+        wanted = {k: v for k, v in filters.items() if v}
+        if table is not None and wanted.get("country"):
+            wanted["country"] = await self.country_name(client, wanted["country"])
+        result = table.select(wanted) if table is not None else None
+        if result is None:
+            self.upstream += 1
+            return None
+        self.local += 1
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ENABLED,
+            "lists": {f"{e}[{k}]" if k else e: len(t.lines) for (e, k), t in self._tables.items()},
+            "local": self.local,
+            "upstream": self.upstream,
+        }
+
+
+refdata = RefData()
@@ -0,0 +1,179 @@
+"""OHLCV resampling: coarser bars derived from finer ones.
+
+Agents often look at one symbol at several intervals — 1min, then 1h, then
+4h; 1day, then 1week and 1month. Once the bar store holds the finer series
+for a window, the coarser one is a pure function of it, so ``bars.window``
+derives it here instead of fetching it again.
+
+Buckets follow the upstream's own conventions:
+
+    intraday   anchored at the session open (09:30, 10:30, … on NASDAQ;
+               midnight for 24h markets), taken as the time of day most
+               stored days start at, so a day whose first minutes had no
+               trades still buckets from the open
+    1week      labelled with the Monday of the week
+    1month     labelled with the first of the month
+
+A bucket takes the first open, the highest high, the lowest low, the last
+close and the summed volume of its bars (any other column: its last value).
+Only intraday → intraday and 1day → 1week / 1month are derived: daily bars
+carry official auction prices and volumes that intraday bars do not add up to.
+A window with a day that starts before the usual open (an early session,
+pre-market bars) is not derived at all.
+
+The bucketing and reductions run as NumPy ``reduceat`` passes when NumPy is
+installed, with a plain-Python fallback otherwise.
+"""
+
+from __future__ import annotations
+
+import calendar
+import time
+from array import array
+from collections import Counter
+from typing import Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from series import INTERVAL_SECONDS, Bars, is_intraday
+
+_DAY = 86400
+
+
+def sources(interval: str) -> list[str]:
+    """Intervals ``interval`` can be derived from, coarsest first."""
+    if interval in ("1week", "1month"):
+        return ["1day"]
+    if not is_intraday(interval) or interval not in INTERVAL_SECONDS:
+        return []
+    width = INTERVAL_SECONDS[interval]
+    finer = [iv for iv, s in INTERVAL_SECONDS.items() if s < width and is_intraday(iv) and width % s == 0]
+    return sorted(finer, key=INTERVAL_SECONDS.__getitem__, reverse=True)
+
+
+def _next_month(ts: int) -> int:
+    t = time.gmtime(ts)
+    year, month = (t.tm_year + 1, 1) if t.tm_mon == 12 else (t.tm_year, t.tm_mon + 1)
+    return calendar.timegm((year, month, 1, 0, 0, 0))
+
+
+def bucket_end(interval: str, label: int) -> int:
+    """End of the bucket labelled ``label`` (exclusive)."""
+    if interval == "1month":
+        return _next_month(label)
+    return label + INTERVAL_SECONDS[interval]
+
+
+def first_of_day(ts) -> list[int]:
+    """Time of day, in seconds, of each day's first timestamp in ``ts`` (ascending)."""
+    if np is not None:
+        t = np.frombuffer(ts, dtype=np.int64)
+        _, first = np.unique(t // _DAY, return_index=True)
+        return (t[first] % _DAY).tolist()
+    out, day = [], None
+    for t in ts:
+        if t // _DAY != day:
+            day = t // _DAY
+            out.append(t % _DAY)
+    return out
+
+
+def session_open(ts) -> Optional[int]:
+    """The time of day most days of ``ts`` start at (None without any)."""
+    firsts = first_of_day(ts)
+    return Counter(firsts).most_common(1)[0][0] if firsts else None
+
+
+def _labels_py(ts: array, interval: str, open_at: int) -> list[int]:
+    if interval == "1month":
+        out = []
+        for t in ts:
+            g = time.gmtime(t)
+            out.append(calendar.timegm((g.tm_year, g.tm_mon, 1, 0, 0, 0)))
+        return out
+    if interval == "1week":
+        # 1970-01-01 was a Thursday: day + 3 counts days since a Monday.
+        return [(t // _DAY - (t // _DAY + 3) % 7) * _DAY for t in ts]
+    width = INTERVAL_SECONDS[interval]
+    out = []
+    for t in ts:
+        anchor = t - t % _DAY + open_at
+        out.append(anchor + (t - anchor) // width * width)
+    return out
+
+
+def _labels_np(ts, interval: str, open_at: int):
+    if interval == "1month":
+        return ts.astype("M8[s]").astype("M8[M]").astype("M8[s]").astype("int64")
+    days = ts // _DAY
+    if interval == "1week":
+        return (days - (days + 3) % 7) * _DAY
+    width = INTERVAL_SECONDS[interval]
+    anchor = days * _DAY + open_at
+    return anchor + (ts - anchor) // width * width
+
+
+def _reducer(col: str) -> str:
+    return {"open": "first", "high": "max", "low": "min", "volume": "sum"}.get(col, "last")
+
+
+def resample(bars: Bars, interval: str, open_at: int = 0) -> Bars:
+    """``bars`` (ascending, finer) aggregated into ``interval`` buckets.
+
+    Intraday buckets start ``open_at`` seconds after each midnight.
+    """
+    out = Bars(list(bars.columns), is_intraday(interval), decimals=dict(bars.decimals))
+    if not len(bars):
+        return out
+    if np is not None:
+        ts = np.frombuffer(bars.ts, dtype=np.int64)
+        labels = _labels_np(ts, interval, open_at)
+        starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+        ends = np.r_[starts[1:], len(ts)] - 1
+        out.ts = array("q", labels[starts].tobytes())
+        for col in bars.columns:
+            v = np.frombuffer(bars.values[col], dtype=np.float64)
+            how = _reducer(col)
+            if how == "first":
+                r = v[starts]
+            elif how == "last":
+                r = v[ends]
+            elif how == "max":
+                r = np.fmax.reduceat(v, starts)
+            elif how == "min":
+                r = np.fmin.reduceat(v, starts)
+            else:
+                r = np.add.reduceat(v, starts)
+            out.values[col] = array("d", r.tobytes())
+        return out
+
+    labels = _labels_py(bars.ts, interval, open_at)
+    starts = [i for i in range(len(labels)) if i == 0 or labels[i] != labels[i - 1]]
+    bounds = list(zip(starts, [*starts[1:], len(labels)]))
+    out.ts = array("q", (labels[a] for a, _ in bounds))
+    for col in bars.columns:
+        v = bars.values[col]
+        how = _reducer(col)
+        if how == "first":
+            r = (v[a] for a, _ in bounds)
+        elif how == "last":
+            r = (v[b - 1] for _, b in bounds)
+        elif how == "max":
+            r = (max((x for x in v[a:b] if x == x), default=float("nan")) for a, b in bounds)
+        elif how == "min":
+            r = (min((x for x in v[a:b] if x == x), default=float("nan")) for a, b in bounds)
+        else:
+            r = (sum(v[a:b]) for a, b in bounds)
+        out.values[col] = array("d", r)
+    return out
+
+
+def complete(resampled: Bars, interval: str, covered_until: int) -> tuple[Bars, Optional[int]]:
+    """The leading buckets that end by ``covered_until``, and the first label that does not."""
+    for i, label in enumerate(resampled.ts):
+        if bucket_end(interval, label) > covered_until:
+            return resampled.slice(0, i), label
+    return resampled, None
@@ -0,0 +1,138 @@
+"""Retry policy and circuit breakers for upstream Twelve Data calls.
+
+Every upstream call is an idempotent GET, so transient failures are retried
+inside the client instead of surfacing as an error string that makes the model
+re-run the whole tool call:
+
+- transport errors and 429 / 5xx responses are retried up to
+  ``MCP_RETRY_ATTEMPTS`` attempts in total;
+- the delay honours ``Retry-After`` when the upstream sends one, otherwise it is
+  exponential backoff with full jitter (``base * 2**attempt``, capped);
+- a retry that would have to wait longer than ``MCP_RETRY_MAX_DELAY`` is not
+  attempted — the caller gets the upstream answer as-is.
+
+Health is tracked per endpoint *family* (the first path segment: ``price``,
+``market_movers``, ``etfs``, …) by a circuit breaker. After
+``MCP_BREAKER_THRESHOLD`` consecutive transport errors / 5xx the family opens
+and calls fail fast for ``MCP_BREAKER_COOLDOWN`` seconds, instead of piling up
+coroutines that each sit out the full request timeout. Then a single probe is
+let through (half-open): success closes the breaker, failure re-opens it.
+429s are a budget signal, not an outage, and never trip a breaker.
+"""
+
+from __future__ import annotations
+
+import email.utils
+import os
+import random
+import time
+from typing import Optional
+
+RETRY_ATTEMPTS   = max(1, int(os.environ.get("MCP_RETRY_ATTEMPTS", "3")))
+RETRY_BASE       = float(os.environ.get("MCP_RETRY_BASE", "0.25"))
+RETRY_CAP        = float(os.environ.get("MCP_RETRY_CAP", "4"))
+RETRY_MAX_DELAY  = float(os.environ.get("MCP_RETRY_MAX_DELAY", "10"))
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+BREAKER_THRESHOLD = int(os.environ.get("MCP_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN  = float(os.environ.get("MCP_BREAKER_COOLDOWN", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before retry number ``attempt + 1``."""
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            when = email.utils.parsedate_to_datetime(retry_after)
+            return max(0.0, when.timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2 ** attempt))
+
+
+def family(endpoint: str) -> str:
+    return endpoint.split("/", 1)[0]
+
+
+class CircuitOpen(Exception):
+    """The endpoint family is failing fast; nothing was sent upstream."""
+
+    def __init__(self, family: str, retry_in: float) -> None:
+        super().__init__(f"{family} circuit open, retry in {retry_in:.0f}s")
+        self.family = family
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+
+    def retry_in(self) -> float:
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def allow(self) -> bool:
+        """May a call go upstream now? Claims the probe slot when half-open."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.retry_in() > 0:
+            return False
+        self.state = HALF_OPEN
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            if self.state != OPEN:
+                self.trips += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """Give the probe slot back if the probe ended without an outcome (cancelled)."""
+        self._probing = False
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "trips": self.trips,
+            "retry_in": round(self.retry_in(), 1) if self.state == OPEN else 0.0,
+        }
+
+
+class Breakers:
+    def __init__(self) -> None:
+        self._by_family: dict[str, CircuitBreaker] = {}
+
+    def for_endpoint(self, endpoint: str) -> tuple[str, CircuitBreaker]:
+        fam = family(endpoint)
+        b = self._by_family.get(fam)
+        if b is None:
+            b = self._by_family[fam] = CircuitBreaker()
+        return fam, b
+
+    def stats(self) -> dict:
+        return {fam: b.stats() for fam, b in sorted(self._by_family.items())}
+
+
+breakers = Breakers()
@@ -0,0 +1,197 @@
+"""Market open/closed state evaluated locally between schedule boundaries.
+
+"Is the market open?" only changes a couple of times a day per exchange, yet
+``get_market_state`` asked the upstream every time. One ``market_state``
+answer already says when each exchange next flips: an open market closes in
+``time_to_close``, a closed one opens in ``time_to_open``. ``MarketClock``
+keeps those instants and recomputes every field against the current time, so
+the upstream is asked again only once one of the listed markets has passed
+its boundary (or after MCP_SCHEDULE_MAX_AGE, in case of unscheduled halts):
+
+    open     opened_at = fetched - time_after_open,  boundary = fetched + time_to_close
+    closed   boundary = fetched + time_to_open
+
+Markets that never close (crypto answers "open" with no time to close) have
+no boundary. A filtered call (exchange / mic_code / country) is served from
+the unfiltered answer when one is held and it lists a match.
+
+``seconds_to_change(mic_code)`` exposes the same evaluator to other modules
+— e.g. for a TTL that lasts until the market reopens.
+
+``exchange_schedule`` (100 credits a call) is cached here as well: a given
+date's schedule for a day, today's until the next UTC midnight.
+
+  MCP_SCHEDULE=0             disable (both tools always go upstream)
+  MCP_SCHEDULE_MAX_AGE       refetch market_state at least this often, seconds (default 3600)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from series import SEP
+
+ENABLED = os.environ.get("MCP_SCHEDULE", "1") not in ("0", "false", "no")
+MAX_AGE = float(os.environ.get("MCP_SCHEDULE_MAX_AGE", "3600"))
+
+# A closed market without a time to open is asked about again this soon.
+_UNKNOWN_RETRY = 60.0
+
+# Cached exchange_schedule answers kept at most.
+_SCHEDULES = 256
+
+_FILTERS = {"exchange": "name", "code": "code", "country": "country"}
+
+
+def _seconds(value) -> float:
+    """'HH:MM:SS' (hours may exceed 24) → seconds; 0 when absent or unreadable."""
+    try:
+        h, m, s = str(value).split(":")
+        return int(h) * 3600 + int(m) * 60 + float(s)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _hms(seconds: float) -> str:
+    seconds = max(0, int(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+@dataclass
+class Market:
+    row: dict                      # the upstream row (name, code, country, …)
+    is_open: bool
+    opened_at: Optional[float]     # epoch seconds, when open
+    boundary: Optional[float]      # next open/close instant; None = never changes
+
+    @classmethod
+    def from_row(cls, row: dict, now: float) -> "Market":
+        is_open = str(row.get("is_market_open")).lower() == "true"
+        if is_open:
+            to_close = _seconds(row.get("time_to_close"))
+            return cls(row, True, now - _seconds(row.get("time_after_open")), now + to_close if to_close else None)
+        to_open = _seconds(row.get("time_to_open"))
+        return cls(row, False, None, now + (to_open or _UNKNOWN_RETRY))
+
+    def at(self, now: float) -> dict:
+        """The upstream row, recomputed for ``now``."""
+        out = dict(self.row)
+        out["is_market_open"] = self.is_open
+        if self.boundary is None:  # always open: nothing to count
+            return out
+        out["time_after_open"] = _hms(now - self.opened_at) if self.is_open else _hms(0)
+        out["time_to_open"] = _hms(0) if self.is_open else _hms(self.boundary - now)
+        out["time_to_close"] = _hms(self.boundary - now) if self.is_open else _hms(0)
+        return out
+
+    def matches(self, filters: dict[str, str]) -> bool:
+        return all(str(self.row.get(_FILTERS[k], "")).lower() == v.lower() for k, v in filters.items())
+
+
+@dataclass
+class _Snapshot:
+    fetched_at: float
+    markets: list[Market]
+
+    def valid(self, now: float) -> bool:
+        if now - self.fetched_at > MAX_AGE:
+            return False
+        return all(m.boundary is None or now < m.boundary for m in self.markets)
+
+
+def _csv(rows: list[dict]) -> str:
+    columns = list(dict.fromkeys(k for r in rows for k in r))
+    lines = [SEP.join(columns)]
+    for r in rows:
+        lines.append(SEP.join("true" if r.get(c) is True else "false" if r.get(c) is False else str(r.get(c, ""))
+                              for c in columns))
+    return "\n".join(lines)
+
+
+class MarketClock:
+    def __init__(self) -> None:
+        self._snapshots: dict[tuple, _Snapshot] = {}
+        self._schedules: OrderedDict[tuple, tuple[float, str]] = OrderedDict()
+        self.local = 0
+        self.upstream = 0
+
+    def _held(self, filters: dict[str, str], now: float) -> Optional[list[Market]]:
+        snap = self._snapshots.get(tuple(sorted(filters.items())))
+        if snap is not None and snap.valid(now):
+            return snap.markets
+        everything = self._snapshots.get(())
+        if filters and everything is not None and everything.valid(now):
+            hits = [m for m in everything.markets if m.matches(filters)]
+            if hits:
+                return hits
+        return None
+
+    async def market_state(self, client, **filters: Optional[str]) -> "dict | str":
+        """``market_state`` as CSV, recomputed locally while no market crossed a boundary."""
+        wanted = {k: v.strip() for k, v in filters.items() if v}
+        if not ENABLED:
+            return await client.get("market_state", **wanted)
+        now = time.time()
+        markets = self._held(wanted, now)
+        if markets is None:
+            data = await client.get_json("market_state", **wanted)
+            if isinstance(data, dict):  # error envelope
+                return data
+            if not isinstance(data, list):
+                return {"status": "error", "message": "Unexpected market_state response format"}
+            now = time.time()
+            markets = [Market.from_row(r, now) for r in data if isinstance(r, dict)]
+            self._snapshots[tuple(sorted(wanted.items()))] = _Snapshot(now, markets)
+            self.upstream += 1
+        else:
+            self.local += 1
+        return _csv([m.at(now) for m in markets])
+
+    def seconds_to_change(self, mic_code: str) -> Optional[float]:
+        """Seconds until this market next opens or closes, if a current snapshot knows it."""
+        now = time.time()
+        for snap in self._snapshots.values():
+            if not snap.valid(now):
+                continue
+            for m in snap.markets:
+                if str(m.row.get("code", "")).upper() == mic_code.upper() and m.boundary is not None:
+                    return m.boundary - now
+        return None
+
+    async def exchange_schedule(self, client, **params: Optional[str]) -> "dict | str":
+        """``exchange_schedule``, cached for the rest of the day (a given date's: for a day)."""
+        wanted = {k: v.strip() for k, v in params.items() if v}
+        if not ENABLED:
+            return await client.get("exchange_schedule", **wanted)
+        now = time.time()
+        key = (client.scope, tuple(sorted(wanted.items())), time.strftime("%Y-%m-%d", time.gmtime(now)))
+        held = self._schedules.get(key)
+        if held is not None and now < held[0]:
+            self._schedules.move_to_end(key)
+            self.local += 1
+            return held[1]
+        data = await client.get("exchange_schedule", **wanted)
+        if isinstance(data, dict):
+            return data
+        expires = now + 86400 if "date" in wanted else now - now % 86400 + 86400
+        self._schedules[key] = (expires, str(data))
+        while len(self._schedules) > _SCHEDULES:
+            self._schedules.popitem(last=False)
+        self.upstream += 1
+        return data
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ENABLED,
+            "snapshots": len(self._snapshots),
+            "schedules": len(self._schedules),
+            "local": self.local,
+            "upstream": self.upstream,
+        }
+
+
+market_clock = MarketClock()
@@ -27,6 +27,12 @@ from starlette.requests import Request
 from starlette.responses import HTMLResponse, JSONResponse, RedirectResponse, FileResponse
 from starlette.routing import Route
 
+from calendars import calendar_store
+from catalog import catalog
+from client import upstream_pool, stats as upstream_stats
+from refdata import refdata
+from schedule import market_clock
+from stream import price_hub, price_streams
 from views import callback_page
 from state import mcp, _oauth_pending, _persist_user_token, _session_user_ids, _session_tokens, _persisted_sessions, _oauth_provider
 from oauth import storage as _oauth_storage
@@ -81,6 +87,7 @@ import tools.analysis      # noqa: F401
 import tools.regulatory    # noqa: F401
 import tools.mutual_funds  # noqa: F401
 import tools.reference     # noqa: F401
+import tools.streaming     # noqa: F401
 
 
 _FAVICON = Path(__file__).parent / "favicon.png"  # ships next to server.py (also in the Docker image)
@@ -97,6 +104,19 @@ async def health(_: Request) -> JSONResponse:
     return JSONResponse({"status": "ok"})
 
 
+@mcp.custom_route("/stats", methods=["GET"])
+async def stats(_: Request) -> JSONResponse:
+    """Upstream-layer counters (response cache, …) for monitoring."""
+    return JSONResponse({
+        **upstream_stats(),
+        "streams": price_hub.stats(),
+        "catalog": catalog.stats(),
+        "refdata": refdata.stats(),
+        "schedule": market_clock.stats(),
+        "calendars": calendar_store.stats(),
+    })
+
+
 @mcp.custom_route("/callback", methods=["GET"])
 async def oauth_callback(request: Request) -> HTMLResponse:
     """OAuth redirect URI handler — receives the code from Twelve Data after user authorizes."""
@@ -212,11 +232,18 @@ def main():
                     },
                 },
             )
-            await uvicorn.Server(cfg).serve()
+            async with upstream_pool(), price_streams():
+                await uvicorn.Server(cfg).serve()
 
         asyncio.run(serve())
     else:
-        mcp.run(transport=transport)
+        import anyio
+
+        async def serve_stdio():
+            async with upstream_pool(), price_streams():
+                await mcp.run_stdio_async()
+
+        anyio.run(serve_stdio)
 
 
 if __name__ == "__main__":
@@ -2,7 +2,6 @@
 
 from __future__ import annotations
 
-import json
 import os
 import time
 from typing import Optional
@@ -10,7 +9,7 @@ from typing import Optional
 from mcp.server.fastmcp import FastMCP, Context
 
 from auth import TwelveDataAuth, load_config
-from client import TwelveDataClient
+from client import TwelveDataClient, json_dumps
 from store import store
 from oauth import build_auth, resolve_apikey
 
@@ -107,6 +106,7 @@ def _persist_user_token(api_token: str, profile: dict, session_id: str = "") ->
 
 
 def _get_client(request_api_token: Optional[str] = None) -> TwelveDataClient:
+    """Per-request, per-token wrapper — cheap; all share the process-wide pool."""
     return TwelveDataClient(request_api_token or "")
 
 
@@ -180,7 +180,15 @@ def _err(data) -> Optional[str]:
 
 
 def _raw(data) -> str:
-    """Return API response as a string: CSV text as-is, JSON dicts serialized."""
-    return data if isinstance(data, str) else json.dumps(data)
+    """Return API response as a string: CSV / passthrough JSON text as-is, dicts serialized.
+
+    A cached answer served past its TTL (client.Aged) gets a note with its age.
+    """
+    if not isinstance(data, str):
+        return json_dumps(data)
+    age = getattr(data, "age", None)
+    if age is not None:
+        return f"{data}\n\n(cached {age:.0f}s ago; a refresh is running in the background)"
+    return data
 
 
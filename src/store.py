@@ -23,6 +23,8 @@ Redis key layout
   td:user:<uid>:profile          STR  json profile blob
   td:user:<uid>:meta             HASH free-form per-user state (payments live here)
   td:session:<sid>               HASH {user_id, api_token}  (optional TTL)
+  td:cache:<scope>:<ep>:<hash>   STR  zlib(content-type \n body) of a cached upstream
+                                     answer, TTL per cache class (see cache.py)
 """
 
 from __future__ import annotations
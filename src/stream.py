@@ -0,0 +1,346 @@
+"""Real-time prices over Twelve Data's WebSocket, fanned out to every session.
+
+Agents that watch a symbol used to poll ``get_price``, paying a credit per
+poll. Instead, ``subscribe_prices`` registers symbols with a per-api_token
+``PriceFeed``: one upstream socket to ``/v1/quotes/price`` per key, shared by
+all MCP sessions of that user, which keeps the latest tick of every
+subscribed symbol in memory. ``get_streamed_price`` then reads ticks locally.
+
+Protocol (Twelve Data WebSocket API)::
+
+    → {"action": "subscribe",   "params": {"symbols": "AAPL,EUR/USD"}}
+    ← {"event": "subscribe-status", "status": "ok", "success": [...], "fails": [...]}
+    ← {"event": "price", "symbol": "AAPL", "price": 189.3, "timestamp": 1718000000, ...}
+    → {"action": "heartbeat"}          every MCP_STREAM_HEARTBEAT seconds
+    → {"action": "unsubscribe", "params": {"symbols": "AAPL"}}
+
+A dropped socket is reopened with backoff and re-subscribes everything.
+Symbols nobody has read for MCP_STREAM_IDLE seconds are unsubscribed (also
+while reconnecting), and a feed without symbols closes its socket or stops
+reconnecting, so a forgotten watch does not keep consuming WebSocket credits.
+After CONNECT_TRIES failed connects in a row, watches the upstream never
+confirmed are marked as errored instead of staying "pending".
+
+  TWELVE_DATA_WS_URL     upstream endpoint (default wss://ws.twelvedata.com/v1/quotes/price)
+  MCP_STREAM_HEARTBEAT   heartbeat interval in seconds (default 10)
+  MCP_STREAM_IDLE        drop symbols unread for this long (default 900)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable, Optional
+from urllib.parse import urlencode
+
+try:
+    import websockets
+except ImportError:  # pragma: no cover - websockets is a declared dependency
+    websockets = None
+
+from client import _fingerprint
+
+log = logging.getLogger("stream")
+
+WS_URL    = os.environ.get("TWELVE_DATA_WS_URL", "wss://ws.twelvedata.com/v1/quotes/price")
+HEARTBEAT = float(os.environ.get("MCP_STREAM_HEARTBEAT", "10"))
+IDLE      = float(os.environ.get("MCP_STREAM_IDLE", "900"))
+
+# How long subscribe() waits for the upstream's subscribe-status.
+SUBSCRIBE_WAIT = 5.0
+RECONNECT_MIN  = 1.0
+RECONNECT_MAX  = 30.0
+CONNECT_TRIES  = 5
+
+
+@dataclass
+class _Watch:
+    last_read: float
+    tick: Optional[dict] = None
+    received_at: float = 0.0
+    error: Optional[str] = None
+    confirmed: bool = False
+
+
+def _symbols(symbols: "str | Iterable[str]") -> list[str]:
+    items = symbols.split(",") if isinstance(symbols, str) else symbols
+    return list(dict.fromkeys(s.strip().upper() for s in items if s.strip()))
+
+
+def _items(value) -> list:
+    """A subscribe-status ``success`` / ``fails`` list (anything else: none)."""
+    return value if isinstance(value, list) else []
+
+
+def _item_symbol(item) -> str:
+    """``{"symbol": "AAPL", …}``, or a bare symbol string."""
+    return str(item.get("symbol", "") if isinstance(item, dict) else item).strip().upper()
+
+
+class PriceFeed:
+    """One upstream socket for one api_token and the latest tick per symbol."""
+
+    def __init__(self, api_key: str, url: str = WS_URL) -> None:
+        self._api_key = api_key
+        self.url = url
+        self.watches: dict[str, _Watch] = {}
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self._pending: dict[str, list[asyncio.Future]] = {}
+        self.connects = 0
+        self.ticks = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None
+
+    async def subscribe(self, symbols: list[str]) -> dict[str, Optional[str]]:
+        """Add symbols; returns symbol → None (live), error message, or "pending"."""
+        now = time.monotonic()
+        loop = asyncio.get_running_loop()
+        waits: dict[str, asyncio.Future] = {}
+        new: list[str] = []
+        for sym in symbols:
+            watch = self.watches.get(sym)
+            if watch is not None and watch.error is None:
+                watch.last_read = now
+                if watch.confirmed:
+                    continue
+            else:
+                self.watches[sym] = _Watch(last_read=now)
+                new.append(sym)
+            waits[sym] = loop.create_future()
+            self._pending.setdefault(sym, []).append(waits[sym])
+
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+        elif new and self._ws is not None:
+            await self._send({"action": "subscribe", "params": {"symbols": ",".join(new)}})
+
+        out: dict[str, Optional[str]] = {s: None for s in symbols}
+        if waits:
+            await asyncio.wait(waits.values(), timeout=SUBSCRIBE_WAIT)
+        for sym, fut in waits.items():
+            out[sym] = fut.result() if fut.done() else "pending"
+            if not fut.done():
+                fut.cancel()
+                waiting = self._pending.get(sym, [])
+                if fut in waiting:
+                    waiting.remove(fut)
+        return out
+
+    def latest(self, symbols: Optional[list[str]] = None) -> dict[str, dict]:
+        now = time.monotonic()
+        out: dict[str, dict] = {}
+        for sym in symbols if symbols is not None else list(self.watches):
+            watch = self.watches.get(sym)
+            if watch is None:
+                out[sym] = {"status": "not subscribed — call subscribe_prices first"}
+                continue
+            watch.last_read = now
+            if watch.error:
+                out[sym] = {"status": "error", "message": watch.error}
+            elif watch.tick is None:
+                out[sym] = {"status": "waiting for the first tick"}
+            else:
+                out[sym] = {**watch.tick, "age_seconds": round(now - watch.received_at, 1)}
+        return out
+
+    async def unsubscribe(self, symbols: list[str]) -> None:
+        gone = [s for s in symbols if self.watches.pop(s, None) is not None]
+        if gone and self._ws is not None:
+            await self._send({"action": "unsubscribe", "params": {"symbols": ",".join(gone)}})
+        if not self.watches:
+            await self.close()
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    # -- connection ------------------------------------------------------------
+
+    def _subscribed(self) -> list[str]:
+        return [s for s, w in self.watches.items() if w.error is None]
+
+    async def _send(self, message: dict) -> None:
+        ws = self._ws
+        if ws is None:
+            return
+        try:
+            await ws.send(json.dumps(message))
+        except websockets.WebSocketException as exc:
+            log.info("stream: send failed (%s)", exc)
+
+    async def _run(self) -> None:
+        delay = RECONNECT_MIN
+        failed = 0
+        while self._subscribed():
+            url = f"{self.url}?{urlencode({'apikey': self._api_key})}"
+            opened = False
+            try:
+                async with websockets.connect(url, open_timeout=10, ping_interval=None) as ws:
+                    self._ws = ws
+                    self.connects += 1
+                    opened, failed, delay = True, 0, RECONNECT_MIN
+                    await self._send({"action": "subscribe", "params": {"symbols": ",".join(self._subscribed())}})
+                    beat = asyncio.get_running_loop().create_task(self._heartbeat())
+                    try:
+                        async for message in ws:
+                            try:
+                                self._on_message(message)
+                            except Exception as exc:  # one odd message must not end the feed
+                                log.warning("stream: ignoring unreadable message (%s)", exc)
+                    finally:
+                        beat.cancel()
+                        self._ws = None
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as exc:
+                log.warning("stream: connection to %s lost (%s)", self.url, exc)
+                if not opened:
+                    failed += 1
+                    if failed >= CONNECT_TRIES:
+                        self._give_up(f"cannot connect to the price stream ({exc or type(exc).__name__})")
+            self._drop_idle()
+            if not self._subscribed():
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX)
+
+    def _drop_idle(self) -> list[str]:
+        """Forget symbols unread for IDLE seconds; returns those subscribed upstream."""
+        cutoff = time.monotonic() - IDLE
+        idle = [s for s, w in self.watches.items() if w.last_read < cutoff]
+        if not idle:
+            return []
+        log.info("stream: dropping %d idle symbol(s)", len(idle))
+        live = [s for s in idle if self.watches[s].error is None]
+        self.watches = {s: w for s, w in self.watches.items() if s not in idle}
+        return live
+
+    def _give_up(self, reason: str) -> None:
+        """Fail every watch the upstream has not confirmed yet."""
+        for sym, watch in self.watches.items():
+            if not watch.confirmed and watch.error is None:
+                watch.error = reason
+                self._resolve(sym, reason)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(HEARTBEAT)
+            live = self._drop_idle()
+            if live:
+                await self._send({"action": "unsubscribe", "params": {"symbols": ",".join(live)}})
+            if not self._subscribed():
+                ws = self._ws
+                if ws is not None:
+                    await ws.close()
+                return
+            await self._send({"action": "heartbeat"})
+
+    def _resolve(self, sym: str, result: Optional[str]) -> None:
+        for fut in self._pending.pop(sym, []):
+            if not fut.done():
+                fut.set_result(result)
+
+    def _on_message(self, message: "str | bytes") -> None:
+        try:
+            event = json.loads(message)
+        except ValueError:
+            return
+        if not isinstance(event, dict):
+            return
+        kind = event.get("event")
+        if kind == "price":
+            watch = self.watches.get(str(event.get("symbol", "")).upper())
+            if watch is not None:
+                watch.tick = {k: v for k, v in event.items() if k != "event"}
+                watch.received_at = time.monotonic()
+                self.ticks += 1
+        elif kind == "subscribe-status":
+            for item in _items(event.get("success")):
+                sym = _item_symbol(item)
+                if sym in self.watches:
+                    self.watches[sym].confirmed = True
+                self._resolve(sym, None)
+            for item in _items(event.get("fails")):
+                sym = _item_symbol(item)
+                reason = "not available for streaming on this plan or symbol"
+                if sym in self.watches:
+                    self.watches[sym].error = reason
+                self._resolve(sym, reason)
+            if event.get("status") == "error":
+                reason = "; ".join(m for m in _items(event.get("messages")) if isinstance(m, str)) \
+                    or "subscription rejected"
+                for sym in list(self._pending):
+                    if sym in self.watches:
+                        self.watches[sym].error = reason
+                    self._resolve(sym, reason)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "symbols": len(self.watches),
+            "connects": self.connects,
+            "ticks": self.ticks,
+        }
+
+
+class PriceHub:
+    """Process-wide registry of PriceFeeds, one per api_token."""
+
+    def __init__(self, url: str = WS_URL) -> None:
+        self.url = url
+        self._feeds: dict[str, PriceFeed] = {}
+
+    def feed(self, api_key: str) -> PriceFeed:
+        fp = _fingerprint(api_key)
+        feed = self._feeds.get(fp)
+        if feed is None:
+            feed = self._feeds[fp] = PriceFeed(api_key, self.url)
+        return feed
+
+    async def subscribe(self, api_key: str, symbols: "str | Iterable[str]") -> dict[str, Optional[str]]:
+        return await self.feed(api_key).subscribe(_symbols(symbols))
+
+    def latest(self, api_key: str, symbols: "str | Iterable[str] | None" = None) -> dict[str, dict]:
+        feed = self._feeds.get(_fingerprint(api_key))
+        wanted = _symbols(symbols) if symbols else None
+        if feed is None:
+            return {s: {"status": "not subscribed — call subscribe_prices first"} for s in wanted or []}
+        return feed.latest(wanted)
+
+    async def unsubscribe(self, api_key: str, symbols: "str | Iterable[str]") -> None:
+        feed = self._feeds.get(_fingerprint(api_key))
+        if feed is not None:
+            await feed.unsubscribe(_symbols(symbols))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(feed.close() for feed in self._feeds.values()))
+        self._feeds.clear()
+
+    def stats(self) -> dict:
+        return {
+            "available": websockets is not None,
+            "feeds": {fp[:8]: feed.stats() for fp, feed in self._feeds.items()},
+        }
+
+
+price_hub = PriceHub()
+
+
+@asynccontextmanager
+async def price_streams() -> AsyncIterator[PriceHub]:
+    """Close every upstream socket when the server shuts down."""
+    try:
+        yield price_hub
+    finally:
+        await price_hub.close()
@@ -0,0 +1,177 @@
+"""The ``get_time_series`` path: one series, or a basket of them.
+
+A single series is answered from the bar store when it can be (bars.py),
+otherwise straight from the upstream. A basket — several comma-separated
+symbols — fetches every series concurrently instead of costing the agent
+one tool round trip per ticker. Concurrency is capped by
+MCP_SERIES_CONCURRENCY and by the credits the key has available right now,
+so a free-plan key does not open 30 connections only to queue them all in
+the credit scheduler. The series are then merged into one table:
+
+    long   symbol;datetime;open;high;low;close;volume  (every column, stacked)
+    wide   datetime;AAPL;MSFT;…                        (close prices, aligned)
+
+A symbol that fails is reported under the table; the others still answer.
+
+A range longer than one upstream call (5000 bars) is fetched in windows by
+bars.py under the same concurrency cap. Such ranges are usually too large to
+read whole, so ``export`` writes the complete window to a compressed .npz
+under MCP_EXPORT_DIR and answers with its path and a short summary instead.
+The file lives on the server's disk, so this only helps local (stdio)
+deployments. File names start with the key's fingerprint, so one key never
+overwrites another's; files older than MCP_EXPORT_MAX_AGE, and the oldest
+ones past MCP_EXPORT_MAX_BYTES in total, are deleted after each export.
+
+  MCP_SERIES_CONCURRENCY   most series (or windows of one series) fetched at once (default 8)
+  MCP_EXPORT_DIR           where exports go (default ~/.twelvedata_mcp/exports)
+  MCP_EXPORT_MAX_AGE       delete exports older than this, seconds (default 86400)
+  MCP_EXPORT_MAX_BYTES     keep at most this much in exports (default 1 GiB)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+import time
+from array import array
+from pathlib import Path
+from typing import Optional
+
+import bars
+from auth import CONFIG_DIR
+from client import _fingerprint
+from series import SEP, Bars, format_dt, parse_csv
+
+CONCURRENCY      = max(1, int(os.environ.get("MCP_SERIES_CONCURRENCY", "8")))
+EXPORT_DIR       = Path(os.environ.get("MCP_EXPORT_DIR", "") or CONFIG_DIR / "exports")
+EXPORT_MAX_AGE   = float(os.environ.get("MCP_EXPORT_MAX_AGE", "86400"))
+EXPORT_MAX_BYTES = int(os.environ.get("MCP_EXPORT_MAX_BYTES", str(1024 ** 3)))
+
+# Rows of an export echoed back as a preview.
+PREVIEW_ROWS = 5
+
+LAYOUTS = ("long", "wide")
+
+
+async def fetch(client, params: dict, concurrency: Optional[int] = None) -> "dict | str":
+    """One series (``params`` as the tool received them), CSV or an error dict."""
+    if bars.applicable(params) or bars.chunked(params):
+        if concurrency is None:
+            concurrency = client.parallelism("time_series", CONCURRENCY)
+        return await bars.time_series(client, params, concurrency)
+    return await client.get("time_series", **params)
+
+
+async def export(client, params: dict) -> "dict | str":
+    """Write one series' full window to an .npz file; a summary of it, or an error dict."""
+    if bars.ranged(params):
+        try:
+            series = await bars.window(client, params, client.parallelism("time_series", CONCURRENCY))
+        except ValueError:
+            return {"status": "error", "message": "start_date/end_date must be YYYY-MM-DD or YYYY-MM-DD HH:MM:SS"}
+    else:
+        data = await client.get("time_series", **params)
+        series = data if isinstance(data, dict) else parse_csv(data)
+    if isinstance(series, dict):
+        return series
+    if series is None or not len(series):
+        return {"status": "error", "message": "No data is available for this request."}
+
+    ident = params.get("symbol") or params.get("figi") or params.get("isin") or params.get("cusip") or "series"
+    first, last = (format_dt(t, series.intraday) for t in (series.ts[0], series.ts[-1]))
+    name = "_".join(re.sub(r"[^A-Za-z0-9.-]+", "-", p) for p in (ident, params["interval"], first, last))
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    path = EXPORT_DIR / f"{_fingerprint(client.api_key)}_{name}.npz"
+    tmp = path.with_suffix(".tmp")
+    series.to_npz(tmp)
+    os.replace(tmp, path)
+    _prune(keep=path)
+
+    return "\n".join([
+        f"Exported {len(series)} bars to {path}",
+        f"range: {first} → {last} ({params['interval']})",
+        f"arrays: datetime (datetime64[s], exchange time), {', '.join(series.columns)} (float64)",
+        f"size: {path.stat().st_size} bytes (load with numpy.load(path))",
+        "",
+        "latest bars:",
+        series.tail(PREVIEW_ROWS).to_csv(),
+    ])
+
+
+def _prune(keep: Path) -> None:
+    """Delete expired exports, then the oldest ones while over the size budget."""
+    now = time.time()
+    files: list[tuple[float, int, Path]] = []
+    for f in EXPORT_DIR.glob("*.npz"):
+        try:
+            st = f.stat()
+        except OSError:
+            continue
+        if f != keep and now - st.st_mtime > EXPORT_MAX_AGE:
+            f.unlink(missing_ok=True)
+        else:
+            files.append((st.st_mtime, st.st_size, f))
+    total = sum(size for _, size, _ in files)
+    for _, size, f in sorted(files):
+        if total <= EXPORT_MAX_BYTES:
+            break
+        if f != keep:
+            f.unlink(missing_ok=True)
+            total -= size
+
+
+def _long(parts: list[tuple[str, Bars]]) -> str:
+    # Instruments may lack columns (forex has no volume): pad them with empty cells.
+    columns = list(dict.fromkeys(c for _, s in parts for c in s.columns))
+    for _, series in parts:
+        for col in columns:
+            if col not in series.values:
+                series.values[col] = array("d", [float("nan")] * len(series))
+                series.decimals[col] = 0
+        series.columns = columns
+    lines = [SEP.join(["symbol", "datetime", *columns])]
+    for symbol, series in parts:
+        for line in series.to_csv().splitlines()[1:]:
+            lines.append(f"{symbol}{SEP}{line}")
+    return "\n".join(lines)
+
+
+def _wide(parts: list[tuple[str, Bars]]) -> str:
+    table = Bars([symbol for symbol, _ in parts], intraday=any(s.intraday for _, s in parts))
+    rows: dict[int, list[float]] = {}
+    for n, (symbol, series) in enumerate(parts):
+        table.decimals[symbol] = series.decimals.get("close", 0)
+        for i, ts in enumerate(series.ts):
+            rows.setdefault(ts, [float("nan")] * len(parts))[n] = series.values["close"][i]
+    for ts in sorted(rows):
+        table.append(ts, rows[ts])
+    return table.to_csv()
+
+
+async def fetch_many(client, symbols: list[str], params: dict, layout: str = "long") -> "dict | str":
+    """Every symbol's series, merged into one ``layout`` table (errors listed below it)."""
+    limit = asyncio.Semaphore(client.parallelism("time_series", CONCURRENCY))
+
+    async def one(symbol: str) -> "dict | str":
+        async with limit:
+            return await fetch(client, {**params, "symbol": symbol}, concurrency=1)
+
+    answers = await asyncio.gather(*(one(s) for s in symbols))
+    parts: list[tuple[str, Bars]] = []
+    errors: list[str] = []
+    for symbol, data in zip(symbols, answers):
+        if isinstance(data, dict):
+            errors.append(f"{symbol}: {data.get('message', 'request failed')}")
+            continue
+        series = parse_csv(data)
+        if series is None or "close" not in series.columns:
+            errors.append(f"{symbol}: unexpected response format")
+            continue
+        parts.append((symbol, series))
+    if not parts:
+        return {"status": "error", "message": "No series could be fetched. " + "; ".join(errors)}
+    out = _wide(parts) if layout == "wide" else _long(parts)
+    if errors:
+        out += "\n\nErrors:\n" + "\n".join(errors)
+    return out
@@ -10,6 +10,7 @@ from typing import Optional
 from mcp.server.fastmcp import Context
 
 from auth import load_config, save_config, CALLBACK_PORT
+from catalog import catalog
 from state import (
     mcp,
     _get_shared_auth, _reset_shared_auth, _persist_user_token,
@@ -165,7 +166,7 @@ async def get_api_usage(ctx: Context) -> str:
     Useful to verify authentication is working and to monitor quota.
     """
     client = _get_client(_token_from_ctx(ctx))
-    data = await client.get("api_usage")
+    data = await client.get_json("api_usage")
 
     if e := _err(data):
         return e
@@ -217,7 +218,11 @@ async def search_symbol(
             return e
         return _raw(data)
 
-    data = await client.get("symbol_search", symbol=symbol, outputsize=outputsize, type=instrument_type)
+    local = catalog.search(client, symbol, outputsize, instrument_type)
+    if local is not None:
+        return json.dumps(local)
+
+    data = await client.get_json("symbol_search", symbol=symbol, outputsize=outputsize, type=instrument_type)
 
     if e := _err(data):
         return e
@@ -8,6 +8,8 @@ from pydantic import BeforeValidator
 
 from mcp.server.fastmcp import Context
 
+import downsample
+import indicators as indicator_engine
 from state import mcp, _get_client, _token_from_ctx, _err, _raw
 
 
@@ -34,6 +36,8 @@ async def get_technical_indicator(
     nbdevdn: Optional[float] = None,
     symbol_2: Optional[str] = None,
     extra: Optional[Annotated[str, BeforeValidator(lambda v: json.dumps(v) if isinstance(v, dict) else v)]] = None,
+    max_points: Optional[int] = None,
+    compact: bool = False,
 ) -> str:
     """Calculate any technical indicator for a symbol.
 
@@ -71,6 +75,9 @@ async def get_technical_indicator(
       symbol_2           – second symbol for CORREL / BETA
       extra              – JSON string for any other indicator-specific params
                            e.g. "{\"fast_k_period\":5,\"slow_k_period\":3}" for STOCH
+      max_points         – at most this many rows, chosen with LTTB (shape-preserving)
+      compact            – oldest-first table with a datetime base, step deltas and
+                           fixed precision (far fewer bytes)
     """
     client = _get_client(_token_from_ctx(ctx))
 
@@ -101,12 +108,101 @@ async def get_technical_indicator(
         except json.JSONDecodeError:
             return "Error: `extra` must be a JSON object, e.g. {\"time_period\": 200}"
 
-    data = await client.get(indicator.lower(), **params)
+    data = None
+    if indicator_engine.ENABLED:
+        try:
+            data = await indicator_engine.technical_indicator(client, indicator, params)
+        except indicator_engine.Unsupported:
+            data = None
+    if data is None:
+        data = await client.get(indicator.lower(), **params)
     if e := _err(data):
         return e
+    if (max_points or compact) and isinstance(data, str):
+        data = downsample.reshape(data, max_points, compact) or data
     return _raw(data)
 
 
+@mcp.tool()
+async def get_indicators(
+    ctx: Context,
+    symbol: str,
+    indicators: str,
+    interval: str = "1day",
+    outputsize: int = 30,
+    mic_code: Optional[str] = None,
+    exchange: Optional[str] = None,
+    country: Optional[str] = None,
+    prepost: bool = False,
+) -> str:
+    """Calculate several technical indicators in a single call, as one table per symbol.
+
+    indicators: comma-separated list; 'name:N' sets time_period, e.g.
+      'rsi, macd, bbands, sma:50, sma:200'
+    or a JSON list for other parameters, e.g.
+      '[{"indicator": "macd", "fast_period": 8}, {"indicator": "rsi", "time_period": 7}]'
+
+    Returns one row per datetime (newest first) with a column per indicator output,
+    e.g. datetime;rsi;macd;macd_signal;macd_hist;sma_50;sma_200. Repeated indicators
+    get their parameters as a suffix.
+
+    Prefer this over several get_technical_indicator calls on the same symbol and
+    interval: SMA, EMA, RSI, MACD, BBANDS and ATR are all computed from one price
+    series fetch. Other indicators (see get_technical_indicator) are fetched
+    alongside and joined into the same table.
+
+    Watchlist scans: pass several symbols and/or intervals comma-separated
+    (symbol='AAPL,MSFT,NVDA', interval='1h,1day'). The whole scan is one upstream
+    request; the answer has one table per symbol and interval.
+
+    Filters:
+      exchange  – exchange name (e.g. 'NASDAQ')
+      mic_code  – MIC code (e.g. 'XNGS')
+      country   – country name or ISO code (e.g. 'United States', 'US')
+    """
+    client = _get_client(_token_from_ctx(ctx))
+    try:
+        specs = indicator_engine.parse_specs(indicators)
+    except ValueError as exc:
+        return f"Error: could not read `indicators` ({exc}). Example: 'rsi, macd, sma:50, sma:200'"
+
+    symbols = [s.strip() for s in symbol.split(",") if s.strip()]
+    intervals = [i.strip() for i in interval.split(",") if i.strip()]
+    if len(symbols) > 1 or len(intervals) > 1:
+        filters = {k: v for k, v in dict(mic_code=mic_code, exchange=exchange, country=country).items() if v}
+        result = await indicator_engine.complex_tables(
+            client, symbols, intervals, specs, outputsize,
+            prepost=prepost if prepost else None, **filters,
+        )
+        if e := _err(result):
+            return e
+        sections = []
+        for sym, iv, table, notes in result:
+            body = _err(table) or table.to_csv()
+            if notes and not _err(table):
+                body += "\n" + "\n".join(f"Not included — {n}" for n in notes)
+            sections.append(f"{sym} ({iv})\n{body}")
+        return "\n\n".join(sections)
+
+    series = {
+        k: v for k, v in dict(
+            symbol=symbol,
+            mic_code=mic_code,
+            exchange=exchange,
+            country=country,
+            interval=interval,
+            prepost=prepost if prepost else None,
+        ).items() if v is not None
+    }
+    data, notes = await indicator_engine.indicator_table(client, series, specs, outputsize)
+    if e := _err(data):
+        return e
+    out = data.to_csv()
+    if notes:
+        out += "\n\n" + "\n".join(f"Not included — {n}" for n in notes)
+    return out
+
+
 @mcp.tool()
 async def get_analyst_data(
     ctx: Context,
@@ -161,11 +257,13 @@ async def get_analyst_data(
         country=country,
     )
 
-    data = await client.get(endpoint, **params)
+    # Only ratings get reshaped; everything else passes through undecoded.
+    is_ratings = data_type.lower() == "ratings"
+    data = await (client.get_json if is_ratings else client.get)(endpoint, **params)
     if e := _err(data):
         return e
 
-    if data_type.lower() == "ratings" and isinstance(data, dict):
+    if is_ratings and isinstance(data, dict):
         for rating in data.get("ratings", []):
             if rating.get("time") == "00:00:00":
                 rating.pop("time", None)
@@ -11,15 +11,24 @@ from typing import Optional
 
 from mcp.server.fastmcp import Context
 
+from calendars import calendar_store
 from state import mcp, _get_client, _token_from_ctx, _err, _raw
 
 
-def _truncate_csv(data, max_rows: int) -> str:
+def _truncate_csv(data, max_rows: int, more: bool = False) -> str:
     """Keep the header + first max_rows data rows of a CSV response.
 
-    Non-CSV (JSON) responses and already-short results pass through unchanged.
+    ``more`` marks a body that client.get_rows already cut at max_rows (the
+    total is unknown then). Non-CSV (JSON) responses and already-short results
+    pass through unchanged.
     """
     text = _raw(data)
+    if more:
+        return (
+            f"{text}\n"
+            f"... showing the first {max_rows} rows. "
+            f"Pass a larger outputsize or filter by country/exchange to narrow the list."
+        )
     if max_rows <= 0 or "\n" not in text:
         return text
     lines = text.splitlines()
@@ -167,7 +176,7 @@ async def get_market_cap(
     if start_date or end_date:
         data = await client.get("market_cap", **params, start_date=start_date, end_date=end_date, outputsize=outputsize)
     else:
-        data = await client.get("statistics", **params)
+        data = await client.get_json("statistics", **params)
         if e := _err(data):
             return e
         if isinstance(data, dict):
@@ -305,7 +314,7 @@ async def get_company_news(
         end_date=end_date,
         outputsize=outputsize,
     )
-    data = await client.get("press_releases", **params)
+    data = await client.get_json("press_releases", **params)
     if e := _err(data):
         return e
     return _raw(_shape_press_releases(data))
@@ -374,6 +383,7 @@ async def get_earnings(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     outputsize: Optional[int] = None,
+    page: int = 1,
 ) -> str:
     """Get earnings data or the market-wide earnings calendar.
 
@@ -385,8 +395,9 @@ async def get_earnings(
 
     outputsize: max rows for the market-wide calendar. It lists every company
     reporting (1000+ rows for a single day worldwide), so calendar=True caps at
-    50 rows by default. Pass a larger number or filter by country/exchange to
-    narrow it. Ignored for single-symbol earnings history.
+    50 rows by default. Pass a larger number, page=2, 3, … for the next rows, or
+    filter by country/exchange/mic_code (or symbol) to narrow it. Ignored for
+    single-symbol earnings history.
     """
     client = _get_client(_token_from_ctx(ctx))
     params = dict(
@@ -401,12 +412,23 @@ async def get_earnings(
         end_date=end_date,
     )
     if calendar:
-        data = await client.get("earnings_calendar", **params)
+        max_rows = outputsize if outputsize is not None else 50
+        if not (figi or isin or cusip):
+            data = await calendar_store.query(
+                client, "earnings_calendar", start_date, end_date, max_rows, page,
+                symbol=symbol, exchange=exchange, mic_code=mic_code, country=country,
+            )
+            if data is not None:
+                if e := _err(data):
+                    return e
+                return data
+        # The earnings_calendar endpoint ignores outputsize/date filtering and
+        # returns every company reporting (~100k chars). Cap rows on our side,
+        # streaming so the download stops once the cap is reached.
+        data, more = await client.get_rows("earnings_calendar", max_rows, **params)
         if e := _err(data):
             return e
-        # The earnings_calendar endpoint ignores outputsize/date filtering and
-        # returns every company reporting (~100k chars). Cap rows on our side.
-        return _truncate_csv(data, outputsize if outputsize is not None else 50)
+        return _truncate_csv(data, max_rows, more)
     data = await client.get("earnings", **params)
 
     if e := _err(data):
@@ -427,6 +449,8 @@ async def get_dividends(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     calendar: bool = False,
+    outputsize: Optional[int] = None,
+    page: int = 1,
 ) -> str:
     """Get dividend history for a stock or the upcoming dividend calendar.
 
@@ -441,12 +465,21 @@ async def get_dividends(
       mic_code  – MIC code (e.g. 'XNGS')
       country   – country name or ISO code (e.g. 'United States', 'US')
 
+    Calendar paging: outputsize rows per page (default: all), page=1, 2, …
+
     Use for: 'dividend history of X', 'when is Y ex-date?', 'upcoming dividends'
     """
     client = _get_client(_token_from_ctx(ctx))
 
     if calendar:
-        data = await client.get("dividends_calendar", start_date=start_date, end_date=end_date)
+        data = None
+        if not (figi or isin or cusip):
+            data = await calendar_store.query(
+                client, "dividends_calendar", start_date, end_date, outputsize, page,
+                symbol=symbol, exchange=exchange, mic_code=mic_code, country=country,
+            )
+        if data is None:
+            data = await client.get("dividends_calendar", start_date=start_date, end_date=end_date)
     else:
         data = await client.get(
             "dividends",
@@ -478,6 +511,8 @@ async def get_splits(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     calendar: bool = False,
+    outputsize: Optional[int] = None,
+    page: int = 1,
 ) -> str:
     """Get stock split history for a company or the upcoming splits calendar.
 
@@ -492,12 +527,19 @@ async def get_splits(
       mic_code   – MIC code (e.g. 'XNGS')
       country    – country name or ISO code (e.g. 'United States', 'US')
       start_date / end_date – date window in YYYY-MM-DD format
+      outputsize / page     – calendar rows per page (default: all) and page number
 
     Use for: 'split history of X', 'upcoming stock splits', 'has AAPL ever split?'
     """
     client = _get_client(_token_from_ctx(ctx))
 
-    if calendar:
+    data = None
+    if calendar and not (figi or isin or cusip):
+        data = await calendar_store.query(
+            client, "splits_calendar", start_date, end_date, outputsize, page,
+            symbol=symbol, exchange=exchange, mic_code=mic_code, country=country,
+        )
+    if data is None and calendar:
         data = await client.get(
             "splits_calendar",
             symbol=symbol,
@@ -510,7 +552,7 @@ async def get_splits(
             start_date=start_date,
             end_date=end_date,
         )
-    else:
+    elif data is None:
         data = await client.get(
             "splits",
             symbol=symbol,
@@ -538,6 +580,8 @@ async def get_ipo_calendar(
     exchange: Optional[str] = None,
     mic_code: Optional[str] = None,
     country: Optional[str] = None,
+    outputsize: Optional[int] = None,
+    page: int = 1,
 ) -> str:
     """Get the IPO calendar — upcoming and recent initial public offerings.
 
@@ -549,6 +593,7 @@ async def get_ipo_calendar(
       exchange              – e.g. 'NASDAQ', 'NYSE'
       mic_code              – ISO 10383 MIC code (e.g. 'XNAS')
       country               – e.g. 'United States'
+      outputsize / page     – rows per page (default: all) and page number
 
     Use for: 'what IPOs are coming up?', 'IPOs on NASDAQ this month', 'recent IPOs'
     """
@@ -560,7 +605,12 @@ async def get_ipo_calendar(
         mic_code=mic_code,
         country=country,
     )
-    data = await client.get("ipo_calendar", **params)
+    data = await calendar_store.query(
+        client, "ipo_calendar", start_date, end_date, outputsize, page,
+        exchange=exchange, mic_code=mic_code, country=country,
+    )
+    if data is None:
+        data = await client.get("ipo_calendar", **params)
     if e := _err(data):
         return e
     return _raw(data)
@@ -6,6 +6,9 @@ from typing import Optional
 
 from mcp.server.fastmcp import Context
 
+import downsample
+import timeseries
+from schedule import market_clock
 from state import mcp, _get_client, _token_from_ctx, _err, _raw
 
 
@@ -117,11 +120,20 @@ async def get_time_series(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     prepost: bool = False,
+    layout: str = "long",
+    export: bool = False,
+    max_points: Optional[int] = None,
+    compact: bool = False,
 ) -> str:
     """Get historical OHLCV (Open, High, Low, Close, Volume) time series data.
 
     Instrument identifiers (use any one):
       symbol, figi, isin, cusip
+    For a basket pass a comma-separated string: 'AAPL,MSFT,NVDA' — all series are
+    fetched at once and returned as one table:
+      layout='long'  symbol;datetime;open;high;low;close;volume (default)
+      layout='wide'  datetime;AAPL;MSFT;NVDA — close prices side by side
+    Symbols that fail are listed under the table.
 
     Filters:
       exchange  – exchange name (e.g. 'NASDAQ')
@@ -129,8 +141,20 @@ async def get_time_series(
       country   – country name or ISO code (e.g. 'United States', 'US')
 
     interval: 1min | 5min | 15min | 30min | 45min | 1h | 2h | 4h | 1day | 1week | 1month
-    outputsize: number of data points (default 30, max 5000)
-    start_date / end_date: YYYY-MM-DD (optional, overrides outputsize window)
+    outputsize: number of data points (default 30; max 5000 without start_date)
+    start_date / end_date: YYYY-MM-DD (optional, overrides outputsize window).
+      Long ranges are fetched in several calls and stitched, e.g. all 1min bars
+      of 2024; outputsize then caps the (newest) rows returned.
+    export: write the whole range to a compressed .npz file (NumPy arrays) and
+      return its path and a summary instead of the rows — use for bulk history
+      that would not fit in the conversation. Single instrument only. The file
+      is written on the machine running this server, so export only helps
+      local (stdio) deployments; over HTTP the path is not reachable.
+    max_points: return at most this many rows, chosen with LTTB so peaks, troughs and
+      trend changes are kept — e.g. outputsize=5000, max_points=300 for a long-range
+      view. Each kept row is a real bar.
+    compact: oldest-first table with one datetime base, step deltas per row and fixed
+      precision — a fraction of the bytes of the plain CSV.
     prepost: include pre-market and post-market data (default False)
 
     Use for: historical prices, trend analysis, price performance over time.
@@ -142,8 +166,7 @@ async def get_time_series(
     DIA (Dow), IWM (Russell 2000).
     """
     client = _get_client(_token_from_ctx(ctx))
-    data = await client.get(
-        "time_series",
+    params = dict(
         symbol=symbol,
         figi=figi,
         isin=isin,
@@ -157,8 +180,21 @@ async def get_time_series(
         end_date=end_date,
         prepost=prepost if prepost else None,
     )
+    symbols = [s.strip() for s in (symbol or "").split(",") if s.strip()]
+    if export:
+        if len(symbols) > 1:
+            return "Error: export takes a single instrument; call it once per symbol"
+        data = await timeseries.export(client, params)
+    elif len(symbols) > 1:
+        if layout not in timeseries.LAYOUTS:
+            return f"Error: layout must be one of {', '.join(timeseries.LAYOUTS)}"
+        data = await timeseries.fetch_many(client, symbols, params, layout)
+    else:
+        data = await timeseries.fetch(client, params)
     if e := _err(data):
         return e
+    if (max_points or compact) and not export and isinstance(data, str):
+        data = downsample.reshape(data, max_points, compact) or data
     return _raw(data)
 
 
@@ -225,7 +261,7 @@ async def get_market_state(
     Use for: 'is the market open?', 'NYSE hours', 'when does NASDAQ close?'
     """
     client = _get_client(_token_from_ctx(ctx))
-    data = await client.get("market_state", exchange=exchange, code=mic_code, country=country)
+    data = await market_clock.market_state(client, exchange=exchange, code=mic_code, country=country)
     if e := _err(data):
         return e
     return _raw(data)
@@ -6,6 +6,8 @@ from typing import Optional
 
 from mcp.server.fastmcp import Context
 
+from refdata import refdata
+from schedule import market_clock
 from state import mcp, _get_client, _token_from_ctx, _err, _raw
 
 
@@ -47,7 +49,9 @@ async def get_reference_data(
     key = data_type.lower().replace(" ", "_")
 
     if key in ("exchanges", "exchange"):
-        data = await client.get(
+        data = await refdata.lookup(
+            client, "exchanges", instrument_type, name=exchange, code=mic_code, country=country,
+        ) or await client.get(
             "exchanges",
             type=instrument_type,
             name=exchange,
@@ -55,23 +59,26 @@ async def get_reference_data(
             country=country,
         )
     elif key in ("exchange_schedule", "schedule"):
-        data = await client.get(
-            "exchange_schedule",
+        data = await market_clock.exchange_schedule(
+            client,
             mic_name=exchange,
             mic_code=mic_code,
             country=country,
             date=date,
         )
     elif key in ("crypto_exchanges", "crypto_exchange", "cryptocurrency_exchanges"):
-        data = await client.get("cryptocurrency_exchanges")
+        data = await refdata.lookup(client, "cryptocurrency_exchanges") \
+            or await client.get("cryptocurrency_exchanges")
     elif key in ("countries", "country"):
-        data = await client.get("countries")
+        data = await refdata.lookup(client, "countries") or await client.get("countries")
     elif key in ("instrument_types", "instrument_type"):
-        data = await client.get("instrument_type")
+        data = await refdata.lookup(client, "instrument_type") or await client.get("instrument_type")
     elif key in ("etf_types", "etf_type"):
-        data = await client.get("etfs/type", country=country, fund_type=fund_type)
+        data = await refdata.lookup(client, "etfs/type", country=country, fund_type=fund_type) \
+            or await client.get("etfs/type", country=country, fund_type=fund_type)
     elif key in ("fund_types", "fund_type", "mutual_fund_types"):
-        data = await client.get("mutual_funds/type", country=country, fund_type=fund_type)
+        data = await refdata.lookup(client, "mutual_funds/type", country=country, fund_type=fund_type) \
+            or await client.get("mutual_funds/type", country=country, fund_type=fund_type)
     else:
         return f"Error: unknown data_type '{data_type}'"
 
@@ -0,0 +1,52 @@
+"""Streaming tools: real-time prices pushed over Twelve Data's WebSocket."""
+
+from __future__ import annotations
+
+from typing import Optional
+
+from mcp.server.fastmcp import Context
+
+from client import _not_authenticated
+from state import mcp, _get_client, _token_from_ctx, _err, _raw
+from stream import price_hub, websockets
+
+
+@mcp.tool()
+async def subscribe_prices(ctx: Context, symbols: str) -> str:
+    """Start streaming real-time prices for symbols; read them with get_streamed_price.
+
+    symbols: comma-separated, e.g. 'AAPL,MSFT,EUR/USD,BTC/USD'
+
+    Use this instead of calling get_price repeatedly to watch a price: after
+    subscribing, every get_streamed_price read is local and costs no API credits.
+    The subscription is shared by all sessions of the same account and lapses
+    after 15 minutes without reads. Requires a plan with WebSocket access.
+    """
+    client = _get_client(_token_from_ctx(ctx))
+    if not client.api_key:
+        return _err(_not_authenticated())
+    if websockets is None:
+        return "Price streaming is not available: the 'websockets' package is not installed on the server."
+    result = await price_hub.subscribe(client.api_key, symbols)
+    return _raw({
+        "subscribed": [s for s, r in result.items() if r is None],
+        "pending":    [s for s, r in result.items() if r == "pending"],
+        "failed":     {s: r for s, r in result.items() if r not in (None, "pending")},
+    })
+
+
+@mcp.tool()
+async def get_streamed_price(ctx: Context, symbols: Optional[str] = None) -> str:
+    """Get the latest streamed tick (price, timestamp, day volume, age) for subscribed symbols.
+
+    symbols: comma-separated subset to read; omit for every subscribed symbol.
+
+    Ticks come from subscribe_prices — call that first. Reads cost no API credits.
+    """
+    client = _get_client(_token_from_ctx(ctx))
+    if not client.api_key:
+        return _err(_not_authenticated())
+    ticks = price_hub.latest(client.api_key, symbols)
+    if not ticks:
+        return "No symbols are subscribed. Call subscribe_prices first."
+    return _raw(ticks)
@@ -0,0 +1,66 @@
+"""What max_points / compact cost in fidelity, and what they save in bytes.
+
+    python tests/bench_downsample.py [series.csv]
+
+Reshapes a daily series (default: the recorded ``fixtures/recorded/
+time_series.csv``, else a seeded 5000-bar random walk) at several
+``max_points`` and prints, per setting, the answer's bytes next to the max and
+RMS deviation of the close the LTTB report gives.
+"""
+
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import downsample  # noqa: E402
+from series import Bars, format_dt  # noqa: E402
+
+RECORDED = Path(__file__).parent / "fixtures" / "recorded" / "time_series.csv"
+
+POINTS = (None, 2000, 1000, 500, 250, 100)
+
+_REPORT = re.compile(r"max deviation ([\d.]+)% / RMS ([\d.]+)%.*?→ (\d+) bytes|→ (\d+) bytes")
+
+
+def random_walk(rows: int = 5000, seed: int = 7) -> str:
+    """Daily OHLCV bars of a seeded random walk, as the upstream's CSV."""
+    rng = random.Random(seed)
+    bars = Bars(["open", "high", "low", "close", "volume"], False,
+                decimals={"open": 5, "high": 5, "low": 5, "close": 5, "volume": 0})
+    t, close = 946944000, 100.0  # 2000-01-04
+    for _ in range(rows):
+        open_ = close
+        close = max(1.0, open_ * (1 + rng.gauss(0, 0.02)))
+        bars.append(t, [open_, max(open_, close) * (1 + rng.random() / 100),
+                        min(open_, close) * (1 - rng.random() / 100), close, rng.randint(10**6, 10**8)])
+        t += 86400 * (3 if time.gmtime(t).tm_wday == 4 else 1)
+    return bars.to_csv()
+
+
+def measure(text: str, max_points, compact: bool) -> tuple[int, float, float]:
+    """(bytes, max %, RMS %) of one reshaped answer."""
+    out = downsample.reshape(text, max_points, compact)
+    body, report = out.rsplit("\n\n", 1)
+    m = _REPORT.search(report)
+    worst, rms = (float(m.group(1)), float(m.group(2))) if m.group(1) else (0.0, 0.0)
+    return len(body.encode()), worst, rms
+
+
+def main() -> None:
+    path = Path(sys.argv[1]) if len(sys.argv) > 1 else RECORDED
+    text = path.read_text() if path.exists() else random_walk()
+    print(f"{path.name if path.exists() else 'random walk'}: {len(text.splitlines()) - 1} rows, "
+          f"{len(text.encode())} bytes")
+    print(f"{'max_points':>10} {'csv bytes':>10} {'compact':>10} {'max %':>7} {'RMS %':>7}")
+    for n in POINTS:
+        size, worst, rms = measure(text, n, False)
+        packed, _, _ = measure(text, n, True)
+        print(f"{n or 'all':>10} {size:>10} {packed:>10} {worst:>7.2f} {rms:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""The server's modules are flat under src/ (see Dockerfile): import them from there."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
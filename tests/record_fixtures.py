@@ -0,0 +1,46 @@
+"""Record the upstream answers the indicator parity tests compare against.
+
+    TWELVE_DATA_API_KEY=... python tests/record_fixtures.py
+
+Writes ``fixtures/recorded/time_series.csv`` (the daily bars) and one
+``<indicator>.csv`` per indicator tested in test_indicators.py, all for the
+same symbol and ``end_date`` so the indicators are computed over exactly
+those bars. Costs 7 API credits; commit the files it writes.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import httpx
+
+OUT = Path(__file__).parent / "fixtures" / "recorded"
+
+SYMBOL   = "AAPL"
+INTERVAL = "1day"
+END_DATE = "2024-06-28"
+BARS     = 1000  # more than ROWS + lookback of every indicator below (macd: 875)
+ROWS     = 60
+
+INDICATORS = ("sma", "ema", "rsi", "macd", "bbands", "atr")
+
+
+def main() -> None:
+    key = os.environ.get("TWELVE_DATA_API_KEY")
+    if not key:
+        sys.exit("Set TWELVE_DATA_API_KEY")
+    OUT.mkdir(parents=True, exist_ok=True)
+    common = {"symbol": SYMBOL, "interval": INTERVAL, "end_date": END_DATE, "format": "CSV"}
+    with httpx.Client(base_url="https://api.twelvedata.com", headers={"Authorization": f"apikey {key}"},
+                      timeout=30) as http:
+        for name, size in (("time_series", BARS), *((n, ROWS) for n in INDICATORS)):
+            resp = http.get(f"/{name}", params={**common, "outputsize": size})
+            resp.raise_for_status()
+            if not resp.text.startswith("datetime;"):
+                sys.exit(f"{name}: {resp.text[:200]}")
+            (OUT / f"{name}.csv").write_text(resp.text.strip() + "\n")
+            print(f"{name}: {len(resp.text.splitlines()) - 1} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Bar store: what an open-ended call writes back."""
+
+import asyncio
+import time
+
+import bars
+from series import INTERVAL_SECONDS, Bars, format_dt, parse_dt
+
+DAY = 86400
+
+
+class Upstream:
+    """Bars up to yesterday on weekdays, in 9:30-16:00 sessions when intraday."""
+
+    scope = "test"
+
+    def __init__(self, fail_before: int = 0) -> None:
+        self.calls = 0
+        self.fail_before = fail_before
+
+    async def get(self, endpoint, **params):
+        self.calls += 1
+        start = parse_dt(params["start_date"])
+        stop = parse_dt(params["end_date"]) if params.get("end_date") else int(time.time())
+        if start < self.fail_before:
+            return {"status": "error", "code": 500, "message": "Internal error"}
+        step = INTERVAL_SECONDS[params["interval"]]
+        intraday = step < DAY
+        today = int(time.time()) // DAY * DAY
+        stamps = [
+            t for t in range(start - start % step, min(stop + 1, today), step)
+            if t >= start and time.gmtime(t).tm_wday < 5
+            and (not intraday or 34200 <= t % DAY < 57600)
+        ][-params["outputsize"]:]
+        if not stamps:
+            return {"status": "error", "code": 400, "message": "No data is available on the specified dates."}
+        rows = [f"{format_dt(t, intraday)};{t / DAY:.4f};{t / DAY + 1:.4f};{t / DAY - 1:.4f};{t / DAY:.4f}"
+                for t in reversed(stamps)]
+        return "datetime;open;high;low;close\n" + "\n".join(rows)
+
+
+def test_repeated_open_ended_calls_do_not_rewrite_the_series(tmp_path, monkeypatch):
+    monkeypatch.setattr(bars, "store", bars.BarStore(tmp_path))
+    api = Upstream()
+    start = format_dt(int(time.time()) // DAY * DAY - 40 * DAY, False)
+    params = {"symbol": "AAPL", "interval": "1day", "start_date": start}
+
+    first = asyncio.run(bars.window(api, params))
+    (d,) = tmp_path.iterdir()
+    files = {p.name: (p.stat().st_ino, p.stat().st_mtime_ns) for p in d.iterdir()}
+    second = asyncio.run(bars.window(api, params))
+
+    assert list(second.ts) == list(first.ts)
+    assert {p.name: (p.stat().st_ino, p.stat().st_mtime_ns) for p in d.iterdir()} == files
+
+
+def test_newer_bars_are_appended(tmp_path, monkeypatch):
+    monkeypatch.setattr(bars, "store", bars.BarStore(tmp_path))
+    api = Upstream()
+    today = int(time.time()) // DAY * DAY
+    old = {"symbol": "AAPL", "interval": "1day",
+           "start_date": format_dt(today - 60 * DAY, False), "end_date": format_dt(today - 30 * DAY, False)}
+    asyncio.run(bars.window(api, old))
+    (d,) = tmp_path.iterdir()
+    inode = (d / "ts.q").stat().st_ino
+
+    got = asyncio.run(bars.window(api, {**old, "end_date": format_dt(today - 10 * DAY, False)}))
+    key = bars.store.key(api.scope, old)
+
+    assert (d / "ts.q").stat().st_ino == inode
+    assert list(bars.store.read(key).ts) == list(got.ts)
+    assert bars.store.meta(key)["coverage"] == [[today - 60 * DAY, today - 10 * DAY]]
+
+
+def test_windows_that_arrived_are_kept_when_another_fails(tmp_path, monkeypatch):
+    monkeypatch.setattr(bars, "store", bars.BarStore(tmp_path))
+    today = int(time.time()) // DAY * DAY
+    start = today - 8000 * DAY  # two windows of 5000 days
+    api = Upstream(fail_before=start + 1)
+    params = {"symbol": "AAPL", "interval": "1day", "start_date": format_dt(start, False),
+              "end_date": format_dt(today - 10 * DAY, False)}
+
+    assert asyncio.run(bars.window(api, params))["code"] == 500
+    assert bars.store.meta(bars.store.key(api.scope, params))["coverage"] == [
+        [start + 5000 * DAY, today - 10 * DAY]]
+
+
+def test_intraday_windows_follow_the_bars_not_the_clock(tmp_path, monkeypatch):
+    monkeypatch.setattr(bars, "store", bars.BarStore(tmp_path))
+    today = int(time.time()) // DAY * DAY
+    api = Upstream()
+    params = {"symbol": "AAPL", "interval": "1min", "start_date": format_dt(today - 70 * DAY, True),
+              "end_date": format_dt(today - 10 * DAY, True)}
+
+    got = asyncio.run(bars.window(api, params))
+
+    assert len(got) == 390 * sum(time.gmtime(today - n * DAY).tm_wday < 5 for n in range(11, 71))
+    assert api.calls <= len(got) // 5000 + 3  # clock-sized windows would take 18
+
+
+def test_no_derivation_over_a_day_that_opens_early(tmp_path, monkeypatch):
+    monkeypatch.setattr(bars, "store", bars.BarStore(tmp_path))
+    day = 19000 * DAY
+    finer = Bars(["open", "high", "low", "close"], True)
+    for d, first in ((0, 34200), (1, 34200), (2, 4 * 3600)):  # the third day has pre-market bars
+        for t in range(day + d * DAY + first, day + d * DAY + 57600, 60):
+            finer.append(t, [1.0, 1.0, 1.0, 1.0])
+    params = {"symbol": "AAPL", "interval": "1min"}
+    bars.store.write(bars.store.key("test", params), finer, [[day, day + 3 * DAY]])
+
+    hourly = {**params, "interval": "1h"}
+    assert asyncio.run(bars._derive("test", hourly, day, day + 2 * DAY)) is not None
+    assert asyncio.run(bars._derive("test", hourly, day, day + 3 * DAY)) is None
@@ -0,0 +1,32 @@
+"""Calendar store: what an upstream answer is allowed to mark as known."""
+
+import time
+
+import calendars
+
+
+def test_truncated_answer_leaves_later_dates_unknown():
+    cal = calendars.Calendar("dividends_calendar")
+    covered = cal.ingest("ex_date;symbol\n2024-01-02;A\n2024-01-05;B\n2024-02-10;C", "2024-01-01", "2024-03-31")
+
+    assert covered == ("2024-01-01", "2024-02-10")
+    assert "2024-02-15" not in cal.days
+    absent, _ = calendars.missing(cal, "2024-02-01", "2024-02-28", time.time())
+    assert absent == [("2024-02-11", "2024-02-28")]
+
+
+def test_only_settled_partitions_with_rows_are_final():
+    cal = calendars.Calendar("dividends_calendar")
+    cal.ingest("ex_date;symbol\n2024-01-02;A\n2024-01-05;B", "2024-01-01", "2024-01-31")
+    for held in cal.days.values():
+        held.fetched_at = time.mktime((2024, 3, 1, 0, 0, 0, 0, 0, 0))
+    later = time.time()
+
+    assert cal.fresh("2024-01-02", later)      # rows, fetched long after: final
+    assert not cal.fresh("2024-01-03", later)  # empty: expires like any other
+
+
+def test_answer_without_rows_in_window_covers_nothing():
+    cal = calendars.Calendar("earnings_calendar")
+    assert cal.ingest("date;symbol\n2023-12-01;A", "2024-01-01", "2024-01-31") == ()
+    assert not cal.days
@@ -0,0 +1,50 @@
+"""Upstream client: failure paths that must not leave shared state behind."""
+
+import asyncio
+
+import client
+import ratelimit
+import resilience
+
+
+def test_credit_wait_failure_gives_the_probe_slot_back(monkeypatch):
+    monkeypatch.setattr(ratelimit.CreditBucket.acquire, "__defaults__", (0,))  # no queueing
+    api = client.TwelveDataClient("probe-key")
+    ratelimit.scheduler.bucket(client._fingerprint("probe-key")).tokens = 0
+    _, breaker = resilience.breakers.for_endpoint("statistics")
+    breaker.state, breaker.opened_at = resilience.OPEN, 0.0  # cooled down: next call probes
+
+    data = asyncio.run(api.get("statistics", symbol="AAPL"))
+
+    assert data["code"] == 429
+    assert breaker.allow()  # the half-open slot is free again
+    breaker.record_success()
+
+
+def test_error_envelopes_are_recognised_in_any_key_order():
+    from state import _err
+
+    for body in (
+        '{"code":400,"message":"bad symbol","status":"error","meta":{"symbol":"X"}}',
+        '{"status":"error","code":404,"message":"not found"}',
+    ):
+        data = client._decode(client._Response(200, body, "application/json"))
+        assert isinstance(data, dict) and data["status"] == "error"
+        assert _err(data)
+
+
+def test_json_data_stays_undecoded():
+    body = '{"data":[{"symbol":"AAPL","status":"ok"}],"status":"ok"}'
+    data = client._decode(client._Response(200, body, "application/json"))
+    assert isinstance(data, client.RawJSON) and data == body
+
+
+def test_tool_calls_do_not_load_the_instrument_lists(monkeypatch):
+    from catalog import catalog
+
+    monkeypatch.setattr(ratelimit.CreditBucket.acquire, "__defaults__", (0,))
+    ratelimit.scheduler.bucket(client._fingerprint("quiet-key")).tokens = 0
+
+    asyncio.run(client.TwelveDataClient("quiet-key").get("quote", symbol="AAPL"))
+
+    assert catalog._task is None
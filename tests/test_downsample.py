@@ -0,0 +1,69 @@
+"""LTTB edge cases, the compact encoding and the bytes / fidelity trade-off."""
+
+import pytest
+
+import downsample
+from bench_downsample import measure, random_walk
+from series import parse_csv
+
+NAN = float("nan")
+
+
+@pytest.mark.parametrize("n, kept", [(0, [0]), (1, [0]), (2, [0, 9]), (10, list(range(10))), (50, list(range(10)))])
+def test_lttb_degenerate_sizes(n, kept):
+    assert downsample.lttb([float(i % 3) for i in range(10)], n) == kept
+
+
+def test_lttb_short_series_is_kept_whole():
+    assert downsample.lttb([], 5) == []
+    assert downsample.lttb([1.0], 1) == [0]
+    assert downsample.lttb([1.0, 2.0], 1) == [0, 1]
+
+
+def test_lttb_keeps_a_row_of_a_bucket_of_gaps():
+    ys = [1.0, 5.0, 2.0, NAN, NAN, NAN, 3.0, 9.0, 1.0, 4.0]
+    keep = downsample.lttb(ys, 5)  # buckets of two rows; rows 3-4 are all gaps
+
+    assert len(keep) == 5 and keep == sorted(set(keep))
+    assert keep[0] == 0 and keep[-1] == 9
+    assert 3 in keep
+
+
+def test_lttb_with_a_gap_filled_last_bucket():
+    ys = [1.0, 4.0, 2.0, 8.0, NAN, NAN]
+    keep = downsample.lttb(ys, 4)
+    assert keep[0] == 0 and keep[-1] == 5 and len(keep) == 4
+
+
+def test_fidelity_of_a_straight_line_is_exact():
+    ys = [float(i) for i in range(100)]
+    assert downsample.fidelity(ys, [0, 99]) == (0.0, 0.0)
+    assert downsample.fidelity([NAN] * 5, [0, 4]) == (0.0, 0.0)
+
+
+def test_compact_keeps_every_bar():
+    text = "datetime;close;volume\n2024-01-08;3.5;30\n2024-01-03;2.25;\n2024-01-02;1;10"
+    out = downsample.compact(parse_csv(text))
+
+    assert out.splitlines() == [
+        "# compact: base=2024-01-02 step=86400s, t = steps since the previous row",
+        "t;close;volume",
+        "0;1.00;10",
+        "1;2.25;",
+        "5;3.50;30",
+    ]
+
+
+def test_reshape_leaves_other_answers_alone():
+    assert downsample.reshape('{"status":"error"}', 10) is None
+
+
+def test_fewer_points_cost_fidelity_and_save_bytes():
+    text = random_walk(2000)
+    results = [measure(text, n, False) for n in (1000, 250, 50)]
+
+    sizes = [size for size, _, _ in results]
+    rms = [r for _, _, r in results]
+    assert sizes == sorted(sizes, reverse=True)
+    assert rms == sorted(rms)
+    assert measure(text, None, True)[0] < len(text.encode())
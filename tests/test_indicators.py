@@ -0,0 +1,97 @@
+"""Local indicator engine vs. the upstream's recorded answers.
+
+``fixtures/recorded/`` holds real upstream answers written by
+``record_fixtures.py``: ``time_series.csv`` with the daily bars and
+``<indicator>.csv`` with the ``/sma``, ``/macd``, … answers for those same
+bars. The engine only fetches ``outputsize + lookback`` bars, so the
+recursive indicators are checked for having converged to the upstream's
+values over its full history. Without recordings the parity tests skip.
+"""
+
+import asyncio
+import math
+from pathlib import Path
+
+import pytest
+
+import indicators
+from series import parse_csv
+
+pytest.importorskip("numpy")
+
+RECORDED = Path(__file__).parent / "fixtures" / "recorded"
+
+recorded = pytest.mark.skipif(
+    not (RECORDED / "time_series.csv").exists(),
+    reason="no recorded upstream answers: run tests/record_fixtures.py",
+)
+
+
+class RecordedClient:
+    """Answers ``time_series`` with the newest ``outputsize`` recorded rows."""
+
+    def __init__(self) -> None:
+        path = RECORDED / "time_series.csv"
+        self.lines = path.read_text().splitlines() if path.exists() else []
+        self.calls = []
+
+    async def get(self, endpoint, **params):
+        self.calls.append((endpoint, params))
+        assert endpoint == "time_series"
+        n = int(params.get("outputsize") or 30)
+        assert n < len(self.lines), "record more bars"
+        return "\n".join(self.lines[:n + 1])
+
+
+@recorded
+@pytest.mark.parametrize("name", ["sma", "ema", "rsi", "macd", "bbands", "atr"])
+def test_matches_recorded_output(name):
+    expected = parse_csv((RECORDED / f"{name}.csv").read_text())
+    client = RecordedClient()
+    text = asyncio.run(indicators.technical_indicator(
+        client, name, {"symbol": "AAPL", "interval": "1day", "outputsize": len(expected)},
+    ))
+    got = parse_csv(text)
+
+    assert len(client.calls) == 1
+    assert got.columns == expected.columns
+    assert list(got.ts) == list(expected.ts)
+    for col in expected.columns:
+        for a, b in zip(got.values[col], expected.values[col]):
+            assert math.isclose(a, b, abs_tol=2e-5), (col, a, b)
+
+
+def test_unknown_params_go_upstream():
+    class Flat:
+        async def get(self, endpoint, **params):
+            return "datetime;open;high;low;close;volume\n" + "\n".join(
+                f"2024-01-{d:02d};1;1;1;1;1" for d in range(31, 0, -1))
+
+    with pytest.raises(indicators.Unsupported):
+        asyncio.run(indicators.technical_indicator(
+            Flat(), "bbands", {"symbol": "AAPL", "interval": "1day", "ma_type": "EMA"},
+        ))
+
+
+def test_complex_entries_are_matched_by_meta_not_position():
+    def entry(symbol, name, period, value):
+        return {"meta": {"symbol": symbol, "interval": "1day",
+                         "indicator": {"name": name, "series_type": "close", "time_period": period}},
+                "values": [{"datetime": "2024-01-02", name.split(" ")[0].lower(): str(value)}],
+                "status": "ok"}
+
+    class Shuffled:
+        async def complex_data(self, symbols, intervals, methods, **params):
+            return {"data": [
+                entry("MSFT", "SMA - Simple Moving Average", 200, 4),
+                entry("AAPL", "SMA - Simple Moving Average", 200, 2),
+                entry("MSFT", "SMA - Simple Moving Average", 50, 3),
+                entry("AAPL", "SMA - Simple Moving Average", 50, 1),
+            ], "status": "ok"}
+
+    specs = indicators.parse_specs("sma:50, sma:200, rsi")
+    out = asyncio.run(indicators.complex_tables(Shuffled(), ["AAPL", "msft"], ["1day"], specs, 1))
+
+    values = {sym: {c: table.values[c][0] for c in table.columns} for sym, _, table, _ in out}
+    assert values == {"AAPL": {"sma_50": 1, "sma_200": 2}, "msft": {"sma_50": 3, "sma_200": 4}}
+    assert all(notes == ["rsi: missing from the response"] for *_, notes in out)
@@ -0,0 +1,37 @@
+"""Resampling: where intraday buckets start."""
+
+import pytest
+
+import resample
+from series import Bars
+
+DAY = 86400
+OPEN = 9 * 3600 + 1800  # 09:30
+
+
+def _minutes(days: dict[int, int]) -> Bars:
+    """1min bars for each day, from its first minute after the open to 16:00."""
+    bars = Bars(["open", "high", "low", "close", "volume"], True)
+    for day, late in sorted(days.items()):
+        for t in range(day * DAY + OPEN + late * 60, day * DAY + 16 * 3600, 60):
+            bars.append(t, [1.0, 2.0, 0.5, 1.5, 10.0])
+    return bars
+
+
+def test_session_open_is_the_usual_first_bar():
+    bars = _minutes({19000: 0, 19001: 3, 19002: 0})
+    assert resample.session_open(bars.ts) == OPEN
+    assert resample.session_open(Bars([], True).ts) is None
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_a_late_first_trade_still_buckets_from_the_open(monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(resample, "np", None)
+    bars = _minutes({19000: 0, 19001: 3})
+
+    hourly = resample.resample(bars, "1h", resample.session_open(bars.ts))
+
+    second = [t - 19001 * DAY for t in hourly.ts if t >= 19001 * DAY]
+    assert second == [OPEN + h * 3600 for h in range(7)]
+    assert hourly.values["volume"][7] == 57 * 10.0  # 09:33-10:29
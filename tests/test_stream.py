@@ -0,0 +1,91 @@
+"""PriceFeed against a local WebSocket stand-in that replays upstream messages."""
+
+import asyncio
+import json
+
+import pytest
+
+import stream
+
+websockets = pytest.importorskip("websockets")
+
+# What the upstream sends after {"action": "subscribe"}, in order — with the
+# odd payloads a proxy or a protocol change could put on the wire.
+REPLAY = [
+    {"event": "subscribe-status", "status": "ok",
+     "success": [{"symbol": "AAPL", "exchange": "NASDAQ"}, "EUR/USD"],
+     "fails": [{"symbol": "NOPE"}]},
+    ["not", "an", "event"],
+    "a bare string",
+    {"event": "subscribe-status", "success": "AAPL", "fails": None},
+    {"event": "price", "symbol": "AAPL", "price": 189.3, "timestamp": 1718000000},
+    {"event": "price", "symbol": "EUR/USD", "price": 1.0712, "timestamp": 1718000001},
+    {"event": "price", "symbol": "AAPL", "price": 189.35, "timestamp": 1718000002},
+]
+
+
+async def _replay(ws):
+    async for raw in ws:
+        message = json.loads(raw)
+        if message.get("action") == "subscribe":
+            for event in REPLAY:
+                await ws.send(json.dumps(event))
+            await ws.send(b"\xff\xfe not json")
+
+
+def test_feed_survives_odd_messages_and_keeps_latest_tick():
+    async def scenario():
+        async with websockets.serve(_replay, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            feed = stream.PriceFeed("test-key", url=f"ws://127.0.0.1:{port}")
+            try:
+                result = await feed.subscribe(["AAPL", "EUR/USD", "NOPE"])
+                for _ in range(100):
+                    if feed.ticks >= 3:
+                        break
+                    await asyncio.sleep(0.02)
+                return result, feed.latest(), feed.connected
+            finally:
+                await feed.close()
+
+    result, latest, connected = asyncio.run(scenario())
+    assert result["AAPL"] is None and result["EUR/USD"] is None
+    assert "not available" in result["NOPE"]
+    assert latest["AAPL"]["price"] == 189.35
+    assert latest["EUR/USD"]["price"] == 1.0712
+    assert latest["NOPE"]["status"] == "error"
+    assert connected
+
+
+def test_heartbeat_without_socket(monkeypatch):
+    monkeypatch.setattr(stream, "HEARTBEAT", 0)
+    feed = stream.PriceFeed("test-key", url="ws://127.0.0.1:9")
+    asyncio.run(asyncio.wait_for(feed._heartbeat(), 1))  # no symbols, no socket: returns quietly
+
+
+def test_unreachable_upstream_fails_pending_watches_and_stops(monkeypatch):
+    monkeypatch.setattr(stream, "RECONNECT_MIN", 0.01)
+    monkeypatch.setattr(stream, "SUBSCRIBE_WAIT", 2)
+
+    async def scenario():
+        feed = stream.PriceFeed("test-key", url="ws://127.0.0.1:9")
+        result = await feed.subscribe(["AAPL"])
+        await asyncio.wait_for(feed._task, 2)
+        return result, feed.latest()
+
+    result, latest = asyncio.run(scenario())
+    assert "cannot connect" in result["AAPL"]
+    assert latest["AAPL"]["status"] == "error"
+
+
+def test_idle_symbols_are_dropped_while_reconnecting(monkeypatch):
+    monkeypatch.setattr(stream, "RECONNECT_MIN", 0.01)
+    monkeypatch.setattr(stream, "IDLE", 0)
+
+    async def scenario():
+        feed = stream.PriceFeed("test-key", url="ws://127.0.0.1:9")
+        feed.watches["AAPL"] = stream._Watch(last_read=0.0, confirmed=True)
+        await asyncio.wait_for(feed._run(), 2)
+        return feed.watches
+
+    assert asyncio.run(scenario()) == {}